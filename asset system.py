@@ -4,11 +4,18 @@ import streamlit as st
 import pandas as pd
 import json
 import os
+import hashlib
+import pickle
+import copy
+import tempfile
 from datetime import datetime
 import io
 import numpy as np
 import re
 import plotly
+import threading
+from collections import Counter, OrderedDict
+from collections.abc import Mapping
 # 添加GitHub存储支持 - 修复GITHUB_AVAILABLE变量定义
 GITHUB_AVAILABLE = False
 try:
@@ -24,6 +31,14 @@ except Exception as e:
     print(f"⚠️ GitHub库导入异常: {e}")
     GITHUB_AVAILABLE = False
 
+# 拼音检索支持（可选依赖 pypinyin）
+PINYIN_AVAILABLE = False
+try:
+    from pypinyin import lazy_pinyin, Style
+    PINYIN_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ pypinyin库导入失败，拼音检索不可用: {e}")
+
 # 显示GitHub可用状态（调试用）
 if not GITHUB_AVAILABLE:
     st.sidebar.warning("⚠️ GitHub功能不可用，使用本地存储")
@@ -46,8 +61,8 @@ def get_github_config():
         print(f"GitHub配置读取失败: {str(e)}")
         return None
 
-def save_data_to_github(data, filename):
-    """保存数据到GitHub"""
+def save_data_to_github(data, filename, cleaned=False):
+    """保存数据到GitHub（cleaned=True 表示数据已经过 clean_data_for_json 清理）"""
     if not GITHUB_AVAILABLE:
         return False
         
@@ -61,7 +76,7 @@ def save_data_to_github(data, filename):
         repo = g.get_repo(config["repo"])
         
         # 清理数据
-        cleaned_data = clean_data_for_json(data)
+        cleaned_data = data if cleaned else clean_data_for_json(data)
         content = json.dumps(cleaned_data, ensure_ascii=False, indent=2)
         
         # 文件路径
@@ -71,7 +86,7 @@ def save_data_to_github(data, filename):
             # 尝试获取现有文件
             file = repo.get_contents(file_path)
             # 更新文件
-            repo.update_file(
+            result = repo.update_file(
                 file_path,
                 f"Update {filename} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
                 content,
@@ -80,13 +95,14 @@ def save_data_to_github(data, filename):
             st.success(f"✅ 数据已保存到GitHub: {filename}")
         except:
             # 文件不存在，创建新文件
-            repo.create_file(
+            result = repo.create_file(
                 file_path,
                 f"Create {filename} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
                 content
             )
             st.success(f"✅ 数据已创建到GitHub: {filename}")
-        
+
+        record_data_version(filename, f"gh-{result['content'].sha}", cleaned_data)
         return True
         
     except Exception as e:
@@ -148,6 +164,7 @@ def load_data_from_github(filename):
                     if content:
                         data = json.loads(content)
                         if isinstance(data, list):
+                            record_data_version(filename, f"gh-{file.sha}", data)
                             st.sidebar.success(f"✅ {filename}: {len(data)} 条记录")
                             return data
                         else:
@@ -168,6 +185,7 @@ def load_data_from_github(filename):
                             if response.status_code == 200:
                                 content = response.text
                                 data = json.loads(content)
+                                record_data_version(filename, f"gh-{file.sha}", data)
                                 st.sidebar.success(f"✅ 通过download_url加载: {len(data)} 条")
                                 return data
                     except Exception as url_error:
@@ -194,6 +212,7 @@ def load_data_from_github(filename):
                         raw_content = base64.b64decode(file_data['content'])
                         content = raw_content.decode('utf-8')
                         data = json.loads(content)
+                        record_data_version(filename, f"gh-{file_data.get('sha')}", data)
                         st.sidebar.success(f"✅ 直接API调用成功: {len(data)} 条")
                         return data
                 else:
@@ -263,6 +282,37 @@ FINANCIAL_DATA_FILE = "financial_data.json"
 PHYSICAL_DATA_FILE = "physical_data.json"
 MAPPING_DATA_FILE = "mapping_data.json"
 
+# 预计算索引包（随数据保存时生成）
+INDEX_BUNDLE_FILE = "index_bundle.pkl"
+
+# 统计快照（保存数据后在后台线程中生成，页面直接加载），快照结构变化时递增版本号
+STATS_SNAPSHOT_FILE = "stats_snapshot.pkl"
+STATS_SNAPSHOT_SCHEMA = 4
+
+# 资产编号提取规则：按顺序尝试，取第一个匹配规则的分组1作为资产编号（去除序号部分）
+# 修改规则后索引包会自动重建
+ASSET_NUMBER_RULES = (
+    r'^([^+]*)\+',        # 包含+号：取+号前的部分
+    r'^([^-]*)-',         # 包含-号：取-号前的部分
+    r'^([^_]*)_',         # 包含_号：取_号前的部分
+    r'^([A-Za-z]+\d+)',   # 字母+数字的主要部分
+)
+
+# 资产编号选择器每页显示的候选数量
+ASSET_PICKER_PAGE_SIZE = 50
+
+# 资产名称搜索每页显示的结果数量
+NAME_SEARCH_PAGE_SIZE = 10
+
+# 单个编号查询结果缓存的最大条数（所有会话共享）
+LOOKUP_CACHE_SIZE = 1024
+
+# 文件批量查询：每块处理的编号数量、页面预览行数
+BATCH_QUERY_CHUNK_SIZE = 20000
+BATCH_QUERY_PREVIEW_ROWS = 100
+# 文件批量查询结果临时文件的最大保留个数（所有会话共享，超出时删除最早的文件）
+BATCH_RESULT_CACHE_SIZE = 8
+
 # 页面配置
 st.set_page_config(
     page_title="资产映射关系查询",
@@ -352,25 +402,33 @@ def clean_data_for_json(data):
     except Exception as e:
         st.error(f"❌ 保存数据失败 ({filename}): {str(e)}")
         return False
-def save_data(data, filename):
-    """保存数据 - 优先GitHub存储"""
+def save_data(data, filename, refresh_index=True):
+    """保存数据 - 优先GitHub存储（refresh_index=False 时由调用方负责维护索引包）"""
+    return save_cleaned_data(clean_data_for_json(data), filename, refresh_index)
+
+
+def save_cleaned_data(cleaned_data, filename, refresh_index=True):
+    """保存已经过 clean_data_for_json 清理的数据（与 save_data 相同，不再重复清理）"""
     # 先尝试GitHub存储
-    if save_data_to_github(data, filename):
+    if save_data_to_github(cleaned_data, filename, cleaned=True):
         # GitHub保存成功，同时保存本地备份
         try:
-            cleaned_data = clean_data_for_json(data)
             with open(filename, 'w', encoding='utf-8') as f:
                 json.dump(cleaned_data, f, ensure_ascii=False, indent=2)
+            if refresh_index:
+                refresh_index_bundle(filename, cleaned_data)
         except:
             pass  # 本地备份失败不影响主流程
         return True
     
     # GitHub失败，尝试本地存储
     try:
-        cleaned_data = clean_data_for_json(data)
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(cleaned_data, f, ensure_ascii=False, indent=2)
+        record_data_version(filename, get_file_signature(filename), cleaned_data)
         st.warning("⚠️ 数据已保存到本地（GitHub不可用）")
+        if refresh_index:
+            refresh_index_bundle(filename, cleaned_data)
         return True
     except Exception as e:
         st.error(f"❌ 保存失败: {str(e)}")
@@ -388,11 +446,14 @@ def load_data(filename):
         if os.path.exists(filename):
             with open(filename, 'r', encoding='utf-8') as f:
                 data = json.load(f)
+                record_data_version(filename, get_file_signature(filename), data)
                 st.info(f"📁 从本地加载数据: {filename} ({len(data)} 条记录)")
                 return data
+        record_data_version(filename, None, [])
         return []
     except Exception as e:
         st.error(f"❌ 加载数据失败: {str(e)}")
+        record_data_version(filename, None, [])
         return []
 
 def parse_excel_file(uploaded_file, sheet_name=None):
@@ -424,35 +485,2250 @@ def create_data_index(data, key_field):
     return index
 
 
+def _build_csr(source_ids, target_ids, source_count):
+    """按源id构建CSR邻接数组（offsets, neighbors, edge_order），组内保持原始出现顺序"""
+    edge_order = np.argsort(source_ids, kind="stable")
+    neighbors = target_ids[edge_order].astype(np.int32)
+    counts = np.bincount(source_ids, minlength=source_count)
+    offsets = np.zeros(source_count + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, neighbors, edge_order
+
+
+class MappingIndex:
+    """
+    映射关系索引（多对多，CSR压缩存储）
+    - 编码统一驻留为 int32 id：financial_codes / physical_codes
+    - 双向邻接数组：offsets[i]:offsets[i+1] 区间为第 i 个编码的对端 id
+    - edge_counts 记录每条边对应的映射记录数，支持按记录增量增删
+    - 增量新增的边先进入 delta 层，由写入方在发布前合并（compact）回 CSR；
+      edges / join / 视图遍历等读取路径要求已合并，且不修改索引（多个会话共享同一实例）
+    """
+
+    FINANCIAL_KEY = "资产编号+序号"
+    PHYSICAL_KEY = "固定资产编码"
+    COMPACT_THRESHOLD = 5000
+    _STATE_FIELDS = ("financial_codes", "physical_codes", "edge_financial", "edge_physical", "edge_counts",
+                     "fin_offsets", "fin_neighbors", "fin_edge_order",
+                     "phy_offsets", "phy_neighbors", "phy_edge_order")
+
+    def __init__(self, financial_codes, physical_codes, edge_financial, edge_physical, edge_counts=None):
+        self.financial_codes = pd.Index(financial_codes, dtype=object)
+        self.physical_codes = pd.Index(physical_codes, dtype=object)
+        self.edge_financial = np.asarray(edge_financial, dtype=np.int32)
+        self.edge_physical = np.asarray(edge_physical, dtype=np.int32)
+        if edge_counts is None:
+            edge_counts = np.ones(len(self.edge_financial), dtype=np.int32)
+        self.edge_counts = np.asarray(edge_counts, dtype=np.int32)
+
+        self.fin_offsets, self.fin_neighbors, self.fin_edge_order = _build_csr(
+            self.edge_financial, self.edge_physical, len(self.financial_codes))
+        self.phy_offsets, self.phy_neighbors, self.phy_edge_order = _build_csr(
+            self.edge_physical, self.edge_financial, len(self.physical_codes))
+        self._reset_delta()
+
+    def _reset_delta(self):
+        self._delta_counts = {}  # (财务编号, 实物编码) -> 映射记录数（仅 CSR 中不存在的边）
+        self._delta_f2p = {}
+        self._delta_p2f = {}
+        self._dead_edges = int((self.edge_counts == 0).sum())
+
+    @classmethod
+    def from_records(cls, mapping_data):
+        """从映射记录一次性向量化构建索引（去除空值和重复边）"""
+        df = pd.DataFrame(mapping_data or [], columns=[cls.FINANCIAL_KEY, cls.PHYSICAL_KEY])
+        financial_col = df[cls.FINANCIAL_KEY].fillna("").astype(str).str.strip()
+        physical_col = df[cls.PHYSICAL_KEY].fillna("").astype(str).str.strip()
+
+        valid = (financial_col != "") & (physical_col != "")
+        return cls._from_pairs(financial_col[valid], physical_col[valid])
+
+    @classmethod
+    def _from_pairs(cls, financial_col, physical_col, pair_counts=None):
+        # 编码驻留：按首次出现顺序分配 id
+        fin_ids, financial_codes = pd.factorize(financial_col)
+        phy_ids, physical_codes = pd.factorize(physical_col)
+        if pair_counts is None:
+            pair_counts = np.ones(len(fin_ids), dtype=np.int64)
+
+        # 重复边合并计数，保留首次出现的位置以维持原始顺序
+        edge_keys = fin_ids.astype(np.int64) * max(len(physical_codes), 1) + phy_ids
+        _, first_positions, inverse = np.unique(edge_keys, return_index=True, return_inverse=True)
+        edge_counts = np.bincount(inverse.ravel(), weights=pair_counts, minlength=len(first_positions))
+        order = np.argsort(first_positions, kind="stable")
+        first_positions = first_positions[order]
+
+        return cls(financial_codes, physical_codes,
+                   fin_ids[first_positions], phy_ids[first_positions], edge_counts[order])
+
+    def to_state(self):
+        """导出为仅含 pandas/numpy 对象的字典，便于持久化"""
+        self.compact()
+        return {name: getattr(self, name) for name in self._STATE_FIELDS}
+
+    @classmethod
+    def from_state(cls, state):
+        index = cls.__new__(cls)
+        for name in cls._STATE_FIELDS:
+            setattr(index, name, state[name])
+        index._reset_delta()
+        return index
+
+    # ---------- 单点查询 ----------
+    def _lookup(self, codes_index, code):
+        try:
+            return codes_index.get_loc(str(code).strip())
+        except KeyError:
+            return -1
+
+    def _live_neighbors(self, cid, offsets, neighbors, edge_order):
+        lo, hi = offsets[cid], offsets[cid + 1]
+        ids = neighbors[lo:hi]
+        if self._dead_edges:
+            ids = ids[self.edge_counts[edge_order[lo:hi]] > 0]
+        return ids
+
+    def physical_of(self, financial_code):
+        """财务编号 -> 对应的实物编码列表"""
+        code = str(financial_code).strip()
+        fid = self._lookup(self.financial_codes, code)
+        result = []
+        if fid >= 0:
+            ids = self._live_neighbors(fid, self.fin_offsets, self.fin_neighbors, self.fin_edge_order)
+            result = self.physical_codes[ids].tolist()
+        return result + self._delta_f2p.get(code, [])
+
+    def financial_of(self, physical_code):
+        """实物编码 -> 对应的财务编号列表"""
+        code = str(physical_code).strip()
+        pid = self._lookup(self.physical_codes, code)
+        result = []
+        if pid >= 0:
+            ids = self._live_neighbors(pid, self.phy_offsets, self.phy_neighbors, self.phy_edge_order)
+            result = self.financial_codes[ids].tolist()
+        return result + self._delta_p2f.get(code, [])
+
+    def has_financial(self, financial_code):
+        code = str(financial_code).strip()
+        if code in self._delta_f2p:
+            return True
+        fid = self._lookup(self.financial_codes, code)
+        return fid >= 0 and len(self._live_neighbors(
+            fid, self.fin_offsets, self.fin_neighbors, self.fin_edge_order)) > 0
+
+    def has_physical(self, physical_code):
+        code = str(physical_code).strip()
+        if code in self._delta_p2f:
+            return True
+        pid = self._lookup(self.physical_codes, code)
+        return pid >= 0 and len(self._live_neighbors(
+            pid, self.phy_offsets, self.phy_neighbors, self.phy_edge_order)) > 0
+
+    # ---------- 增量维护 ----------
+    def _find_edge(self, financial_code, physical_code):
+        fid = self._lookup(self.financial_codes, financial_code)
+        pid = self._lookup(self.physical_codes, physical_code)
+        if fid < 0 or pid < 0:
+            return -1
+        lo, hi = self.fin_offsets[fid], self.fin_offsets[fid + 1]
+        hits = np.flatnonzero(self.fin_neighbors[lo:hi] == pid)
+        return int(self.fin_edge_order[lo + hits[0]]) if len(hits) else -1
+
+    def add_pairs(self, pairs):
+        """新增映射记录对应的边（按记录计数）"""
+        for financial_code, physical_code in pairs:
+            edge = self._find_edge(financial_code, physical_code)
+            if edge >= 0:
+                if self.edge_counts[edge] == 0:
+                    self._dead_edges -= 1
+                self.edge_counts[edge] += 1
+                continue
+
+            pair = (financial_code, physical_code)
+            if pair not in self._delta_counts:
+                self._delta_counts[pair] = 0
+                self._delta_f2p.setdefault(financial_code, []).append(physical_code)
+                self._delta_p2f.setdefault(physical_code, []).append(financial_code)
+            self._delta_counts[pair] += 1
+        self._maybe_compact()
+
+    def drop_pairs(self, pairs):
+        """删除映射记录对应的边；同一对编码的记录全部删除后该边才失效"""
+        for financial_code, physical_code in pairs:
+            pair = (financial_code, physical_code)
+            if pair in self._delta_counts:
+                self._delta_counts[pair] -= 1
+                if self._delta_counts[pair] <= 0:
+                    del self._delta_counts[pair]
+                    for delta, key, value in ((self._delta_f2p, financial_code, physical_code),
+                                              (self._delta_p2f, physical_code, financial_code)):
+                        delta[key].remove(value)
+                        if not delta[key]:
+                            del delta[key]
+                continue
+
+            edge = self._find_edge(financial_code, physical_code)
+            if edge >= 0 and self.edge_counts[edge] > 0:
+                self.edge_counts[edge] -= 1
+                if self.edge_counts[edge] == 0:
+                    self._dead_edges += 1
+        self._maybe_compact()
+
+    def copy(self):
+        """可独立增量修改的副本：CSR 数组只读共享，原地修改的边计数和 delta 层复制一份"""
+        index = copy.copy(self)
+        index.edge_counts = self.edge_counts.copy()
+        index._delta_counts = dict(self._delta_counts)
+        index._delta_f2p = {code: list(codes) for code, codes in self._delta_f2p.items()}
+        index._delta_p2f = {code: list(codes) for code, codes in self._delta_p2f.items()}
+        return index
+
+    def _maybe_compact(self):
+        if len(self._delta_counts) + self._dead_edges > max(self.COMPACT_THRESHOLD, len(self.edge_counts) // 10):
+            self.compact()
+
+    def compact(self):
+        """将 delta 层和失效边合并回 CSR 数组"""
+        if not self._delta_counts and not self._dead_edges:
+            return
+        alive = self.edge_counts > 0
+        delta_pairs = list(self._delta_counts.items())
+        financial_col = np.concatenate([
+            self.financial_codes.values[self.edge_financial[alive]],
+            np.array([pair[0] for pair, _ in delta_pairs], dtype=object)])
+        physical_col = np.concatenate([
+            self.physical_codes.values[self.edge_physical[alive]],
+            np.array([pair[1] for pair, _ in delta_pairs], dtype=object)])
+        pair_counts = np.concatenate([
+            self.edge_counts[alive], np.array([count for _, count in delta_pairs], dtype=np.int64)])
+
+        rebuilt = self._from_pairs(financial_col, physical_col, pair_counts)
+        self.__dict__.update(rebuilt.__dict__)
+
+    # ---------- 批量连接 ----------
+    def edges(self):
+        """全部映射边（去重后）的 DataFrame，用于批量 merge"""
+        return pd.DataFrame({
+            self.FINANCIAL_KEY: self.financial_codes[self.edge_financial],
+            self.PHYSICAL_KEY: self.physical_codes[self.edge_physical],
+        })
+
+    def _join(self, codes, financial_side):
+        if financial_side:
+            codes_index, offsets, neighbors = self.financial_codes, self.fin_offsets, self.fin_neighbors
+            target_codes, target_name = self.physical_codes, self.PHYSICAL_KEY
+        else:
+            codes_index, offsets, neighbors = self.physical_codes, self.phy_offsets, self.phy_neighbors
+            target_codes, target_name = self.financial_codes, self.FINANCIAL_KEY
+
+        codes = pd.Index([str(c).strip() for c in codes], dtype=object)
+        ids = codes_index.get_indexer(codes)
+        hit = ids >= 0
+        query_positions = np.flatnonzero(hit)
+        starts = offsets[ids[hit]]
+        counts = offsets[ids[hit] + 1] - starts
+
+        # 向量化展开每个查询编码的邻接区间
+        repeat_positions = np.repeat(query_positions, counts)
+        run_starts = np.repeat(starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+        neighbor_ids = neighbors[run_starts + np.arange(counts.sum())]
+
+        return pd.DataFrame({
+            "查询序号": repeat_positions,
+            "查询编号": codes[repeat_positions],
+            target_name: target_codes[neighbor_ids],
+        })
+
+    def join_physical(self, financial_codes):
+        """批量：财务编号列表 -> (查询序号, 查询编号, 固定资产编码) 对"""
+        return self._join(financial_codes, financial_side=True)
+
+    def join_financial(self, physical_codes):
+        """批量：实物编码列表 -> (查询序号, 查询编号, 资产编号+序号) 对"""
+        return self._join(physical_codes, financial_side=False)
+
+    # ---------- 兼容视图 ----------
+    @property
+    def financial_to_physical(self):
+        return _MappingView(self, financial_side=True)
+
+    @property
+    def physical_to_financial(self):
+        return _MappingView(self, financial_side=False)
+
+    @property
+    def edge_count(self):
+        return int((self.edge_counts > 0).sum()) + len(self._delta_counts)
+
+    @property
+    def nbytes(self):
+        """数值数组占用字节数（不含编码字符串本身）"""
+        return sum(arr.nbytes for arr in (
+            self.edge_financial, self.edge_physical, self.edge_counts,
+            self.fin_offsets, self.fin_neighbors, self.fin_edge_order,
+            self.phy_offsets, self.phy_neighbors, self.phy_edge_order))
+
+
+class _MappingView(Mapping):
+    """MappingIndex 的只读字典视图，兼容原 dict[str, list] 的用法"""
+
+    def __init__(self, index, financial_side=True):
+        self._index = index
+        self._financial_side = financial_side
+
+    def __getitem__(self, code):
+        neighbors = self._index.physical_of(code) if self._financial_side else self._index.financial_of(code)
+        if not neighbors:
+            raise KeyError(code)
+        return neighbors
+
+    def __contains__(self, code):
+        if self._financial_side:
+            return self._index.has_financial(code)
+        return self._index.has_physical(code)
+
+    def get(self, code, default=None):
+        neighbors = self._index.physical_of(code) if self._financial_side else self._index.financial_of(code)
+        return neighbors if neighbors else default
+
+    def __iter__(self):
+        return iter(self._index.financial_codes if self._financial_side else self._index.physical_codes)
+
+    def __len__(self):
+        return len(self._index.financial_codes if self._financial_side else self._index.physical_codes)
+
+
+def build_mapping_index(mapping_data):
+    """构建映射关系索引（MappingIndex）"""
+    return MappingIndex.from_records(mapping_data)
+
+
 def create_mapping_index(mapping_data):
     """
     创建映射索引
-    返回两个字典：
+    返回两个只读字典视图（底层为同一个 MappingIndex）：
     - financial_to_physical_mapping: '资产编号+序号' -> ['固定资产编码'列表]
     - physical_to_financial_mapping: '固定资产编码' -> ['资产编号+序号'列表]
     """
-    financial_to_physical_mapping = {}  # 财务系统主键到实物台账主键的映射
-    physical_to_financial_mapping = {}  # 实物台账主键到财务系统主键的映射
+    mapping_index = build_mapping_index(mapping_data)
+    return mapping_index.financial_to_physical, mapping_index.physical_to_financial
+
+
+# ========== 预计算索引包 ==========
+_ASSET_NUMBER_PATTERNS = [re.compile(rule) for rule in ASSET_NUMBER_RULES]
+
+
+def extract_asset_number(full_code):
+    """按 ASSET_NUMBER_RULES 从'资产编号+序号'中提取资产编号（去除序号部分）"""
+    full_code = str(full_code).strip()
+    for pattern in _ASSET_NUMBER_PATTERNS:
+        match = pattern.match(full_code)
+        if match:
+            return match.group(1).strip()
+    # 如果无法智能提取，使用原始编号
+    return full_code
+
+
+class AssetNumberIndex:
+    """
+    资产编号前缀索引：资产编号 -> ['资产编号+序号'列表]
+    - 排序后的编号列表按需生成并缓存，子串搜索在拼接后的小写文本上一次扫描完成
+    - rules 记录构建时使用的提取规则，规则变化后需重建
+    """
+
+    def __init__(self, groups, rules=None):
+        self.groups = groups
+        self.rules = tuple(ASSET_NUMBER_RULES) if rules is None else tuple(rules)
+        self._reset_sorted()
+
+    def _reset_sorted(self):
+        self._sorted_numbers = None
+        self._search_table = None  # (拼接后的小写文本, 各编号起始位置)
+        self._ranked_search = None
+
+    @classmethod
+    def from_codes(cls, full_codes):
+        groups = {}
+        for full_code in full_codes:
+            if full_code:
+                groups.setdefault(extract_asset_number(full_code), []).append(full_code)
+        return cls(groups)
+
+    def to_state(self):
+        return {"groups": self.groups, "rules": self.rules}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state["groups"], state["rules"])
+
+    def is_current(self):
+        """是否按当前 ASSET_NUMBER_RULES 构建"""
+        return self.rules == tuple(ASSET_NUMBER_RULES)
+
+    def get(self, asset_number, default=None):
+        return self.groups.get(asset_number, default)
+
+    def __contains__(self, asset_number):
+        return asset_number in self.groups
+
+    def __len__(self):
+        return len(self.groups)
+
+    @property
+    def sorted_numbers(self):
+        """排序后的资产编号列表"""
+        if self._sorted_numbers is None:
+            self._sorted_numbers = sorted(self.groups)
+        return self._sorted_numbers
+
+    def search(self, term):
+        """按子串筛选资产编号（不区分大小写），结果保持排序顺序"""
+        numbers = self.sorted_numbers
+        term = term.lower()
+        if not term:
+            return numbers
+
+        search_table = self._search_table
+        if search_table is None:
+            lowered = [number.lower() for number in numbers]
+            lengths = np.fromiter((len(number) + 1 for number in lowered), dtype=np.int64, count=len(lowered))
+            search_table = ("\n".join(lowered), np.cumsum(lengths) - lengths)
+            self._search_table = search_table
+        search_text, search_starts = search_table
+
+        hits = [match.start() for match in re.finditer(re.escape(term), search_text)]
+        if not hits:
+            return []
+        hit_ids = np.unique(np.searchsorted(search_starts, hits, side="right") - 1)
+        return [numbers[i] for i in hit_ids]
+
+    def search_page(self, term, page=1, page_size=ASSET_PICKER_PAGE_SIZE):
+        """
+        分页返回匹配的资产编号：以搜索词开头的编号排在前面，其余保持排序顺序
+        返回 (当前页编号列表, 匹配总数)；最近一次搜索结果会被缓存，翻页时不重复扫描
+        """
+        ranked_search = self._ranked_search
+        if ranked_search is None or ranked_search[0] != term:
+            matches = self.search(term)
+            lowered_term = term.lower()
+            if lowered_term:
+                prefix_matches = [number for number in matches if number.lower().startswith(lowered_term)]
+                if len(prefix_matches) < len(matches):
+                    prefix_set = set(prefix_matches)
+                    matches = prefix_matches + [number for number in matches if number not in prefix_set]
+            ranked_search = (term, matches)
+            self._ranked_search = ranked_search
+
+        matches = ranked_search[1]
+        start = (max(page, 1) - 1) * page_size
+        return matches[start:start + page_size], len(matches)
+
+    # ---------- 增量维护 ----------
+    def copy(self):
+        """可独立增量修改的副本"""
+        return AssetNumberIndex({number: list(codes) for number, codes in self.groups.items()}, self.rules)
+
+    def add(self, full_code):
+        group = self.groups.setdefault(extract_asset_number(full_code), [])
+        if not group:
+            self._reset_sorted()
+        group.append(full_code)
+
+    def remove(self, full_code):
+        asset_number = extract_asset_number(full_code)
+        group = self.groups.get(asset_number, [])
+        if full_code in group:
+            group.remove(full_code)
+        if not group:
+            self.groups.pop(asset_number, None)
+            self._reset_sorted()
+
+
+def index_key(value):
+    """统一主键格式：转为字符串并去除首尾空白，空值返回空字符串"""
+    if value is None:
+        return ""
+    return str(value).strip()
+
+
+class KeyIndex:
+    """
+    多值主键索引：保留每个主键对应的全部行号，并统计重复次数
+    - keys: 主键驻留表（pd.Index），row_ids: 每行的主键 id（空主键为 -1）
+    - 主键 -> 行号列表采用 CSR 结构，按需构建；追加/删除行只修改 row_ids
+    """
+
+    def __init__(self, keys, row_ids):
+        self.keys = keys
+        self.row_ids = row_ids
+        self._reset_groups()
+
+    def _reset_groups(self):
+        self._group_arrays = None
+
+    @staticmethod
+    def _factorize(key_values):
+        row_ids, keys = pd.factorize(pd.Series([k or None for k in key_values], dtype=object))
+        return pd.Index(keys, dtype=object), row_ids.astype(np.int64)
+
+    @classmethod
+    def from_keys(cls, key_values):
+        return cls(*cls._factorize(key_values))
+
+    @classmethod
+    def from_records(cls, data, key_field):
+        return cls.from_keys([index_key(record.get(key_field)) for record in data])
+
+    def to_state(self):
+        self.compact()
+        return {"keys": self.keys.tolist(), "row_ids": self.row_ids}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(pd.Index(state["keys"], dtype=object), state["row_ids"])
+
+    def _groups(self):
+        # 一次性赋值缓存，并发读取时不会看到只构建了一半的分组数组
+        group_arrays = self._group_arrays
+        if group_arrays is None:
+            positions = np.flatnonzero(self.row_ids >= 0)
+            offsets, rows, _ = _build_csr(self.row_ids[positions], positions, len(self.keys))
+            group_arrays = (offsets, rows, np.diff(offsets))
+            self._group_arrays = group_arrays
+        return group_arrays
+
+    def _key_id(self, key):
+        try:
+            return self.keys.get_loc(key)
+        except (KeyError, TypeError):
+            return -1
+
+    # ---------- 单键查询 ----------
+    def positions(self, key):
+        """主键对应的全部行号（按出现顺序）"""
+        key_id = self._key_id(key)
+        if key_id < 0:
+            return np.empty(0, dtype=np.int32)
+        offsets, rows, _ = self._groups()
+        return rows[offsets[key_id]:offsets[key_id + 1]]
+
+    def count(self, key):
+        key_id = self._key_id(key)
+        return int(self._groups()[2][key_id]) if key_id >= 0 else 0
+
+    def first(self, key):
+        rows = self.positions(key)
+        return int(rows[0]) if len(rows) else None
+
+    def last(self, key):
+        rows = self.positions(key)
+        return int(rows[-1]) if len(rows) else None
+
+    def last_positions(self, keys):
+        """批量：每个主键最后一次出现的行号（与 _RecordIndex 取值一致），不存在时为 -1"""
+        offsets, rows, counts = self._groups()
+        key_ids = self.keys.get_indexer(keys)
+        found = key_ids >= 0
+        found[found] = counts[key_ids[found]] > 0
+        positions = np.full(len(key_ids), -1, dtype=np.int64)
+        positions[found] = rows[offsets[key_ids[found] + 1] - 1]
+        return positions
+
+    def __contains__(self, key):
+        return self.count(key) > 0
+
+    def __iter__(self):
+        counts = self._groups()[2]
+        return iter(self.keys[counts > 0])
+
+    def __len__(self):
+        return int(np.count_nonzero(self._groups()[2]))
+
+    @property
+    def row_count(self):
+        return len(self.row_ids)
+
+    # ---------- 重复统计 ----------
+    @property
+    def duplicate_counts(self):
+        """重复主键 -> 出现次数"""
+        counts = self._groups()[2]
+        duplicated = np.flatnonzero(counts > 1)
+        return dict(zip(self.keys[duplicated], counts[duplicated].tolist()))
+
+    def _candidate_rows(self, rows):
+        if rows is None:
+            return np.arange(len(self.row_ids))
+        return np.asarray(rows, dtype=np.int64)
+
+    def rows_of_keys(self, keys, include_blank=False):
+        """属于给定主键集合的全部行号（升序），include_blank=True 时同时包含空主键的行"""
+        key_ids = self.keys.get_indexer(list(keys))
+        selected = np.isin(self.row_ids, key_ids[key_ids >= 0])
+        if include_blank:
+            selected |= self.row_ids < 0
+        return np.flatnonzero(selected)
+
+    def first_positions(self, rows=None):
+        """
+        每个主键第一次出现的行号（等价于 drop_duplicates(keep='first')，空主键视为同一组）
+        rows: 只在这些行号（升序）范围内去重，默认全部行
+        """
+        rows = self._candidate_rows(rows)
+        _, first = np.unique(self.row_ids[rows], return_index=True)
+        return rows[np.sort(first)]
+
+    def duplicate_positions(self, rows=None):
+        """主键重复的全部行号（等价于 duplicated(keep=False)，空主键视为同一组，出现多次时同样计为重复）"""
+        rows = self._candidate_rows(rows)
+        ids = self.row_ids[rows] + 1  # 空主键（-1）归入第 0 组
+        counts = np.bincount(ids, minlength=len(self.keys) + 1)
+        return rows[counts[ids] > 1]
+
+    # ---------- 增量维护 ----------
+    def copy(self):
+        """可独立增量修改的副本（增量维护只替换数组，不原地修改）"""
+        return copy.copy(self)
+
+    def append(self, key_values):
+        """在末尾追加行"""
+        key_values = [k or None for k in key_values]
+        known = self.keys.get_indexer(key_values)
+        new_keys = pd.unique(pd.Series([k for k, i in zip(key_values, known) if i < 0 and k], dtype=object))
+        if len(new_keys):
+            self.keys = self.keys.append(pd.Index(new_keys, dtype=object))
+            known = self.keys.get_indexer(key_values)
+        self.row_ids = np.concatenate([self.row_ids, known.astype(np.int64)])
+        self._reset_groups()
+
+    def delete(self, positions):
+        """删除指定行号的行，之后的行号自动前移"""
+        self.row_ids = np.delete(self.row_ids, np.asarray(positions, dtype=np.int64))
+        self._reset_groups()
+
+    def compact(self):
+        """移除已无对应行的主键"""
+        counts = self._groups()[2]
+        used = counts > 0
+        if used.all():
+            return
+        remap = np.cumsum(used) - 1
+        self.row_ids = np.where(self.row_ids >= 0, remap[self.row_ids], -1)
+        self.keys = self.keys[used]
+        self._reset_groups()
+
+
+class _RecordIndex(Mapping):
+    """多值主键索引绑定到数据列表后的只读视图，兼容 create_data_index 的 dict 用法（重复主键取最后一条）"""
+
+    def __init__(self, key_index, data):
+        self._key_index = key_index
+        self._data = data
+
+    def __getitem__(self, key):
+        position = self._key_index.last(key)
+        if position is None:
+            raise KeyError(key)
+        return self._data[position]
+
+    def __contains__(self, key):
+        return key in self._key_index
+
+    def __iter__(self):
+        return iter(self._key_index)
+
+    def __len__(self):
+        return len(self._key_index)
+
+    def get_all(self, key):
+        """主键对应的全部记录"""
+        return [self._data[position] for position in self._key_index.positions(key)]
+
+    def count(self, key):
+        return self._key_index.count(key)
+
+
+_HAN_PATTERN = re.compile(r"[\u4e00-\u9fff]")
+
+
+def transliterate_name(name):
+    """
+    名称的拼音检索文本：(全拼, 首字母)，均为小写且去除空白
+    pypinyin 不可用或名称不含汉字时返回空元组
+    """
+    if not PINYIN_AVAILABLE or not _HAN_PATTERN.search(name):
+        return ()
+    full_pinyin = "".join(lazy_pinyin(name))
+    initials = "".join(lazy_pinyin(name, style=Style.FIRST_LETTER))
+    return tuple(re.sub(r"\s+", "", text).lower() for text in (full_pinyin, initials))
+
+
+class NameSearchIndex:
+    """
+    名称 n-gram 倒排索引（字符二元/三元组 -> 名称 id 倒排表，CSR 存储）
+    - 名称统一转小写，相同名称只索引一次，row_name_ids 记录每行对应的名称 id
+    - 每个名称的检索文本为名称本身及其拼音全拼、首字母（需 pypinyin），
+      拼音在构建索引时一次性转换，查询时与汉字走同一条倒排查找路径
+    - 子串查询：对查询词的 n-gram 倒排表求交集，再用子串比较排除误命中
+    - 增量追加的新名称先进入 delta 倒排表，持久化时再合并
+    """
+
+    GRAM_SIZES = (2, 3)
+
+    def __init__(self, names, row_name_ids, name_texts, grams, gram_offsets, gram_postings,
+                 pinyin_enabled=None):
+        self.names = names
+        self.row_name_ids = row_name_ids
+        self.name_texts = name_texts
+        self.grams = grams
+        self.gram_offsets = gram_offsets
+        self.gram_postings = gram_postings
+        self.pinyin_enabled = PINYIN_AVAILABLE if pinyin_enabled is None else pinyin_enabled
+        self._name_lengths = np.fromiter((len(name) for name in names), dtype=np.int64, count=len(names))
+        self._name_ids = None
+        self._delta_postings = {}
+        self._last_search = None
+
+    @staticmethod
+    def name_key(record, name_field):
+        return str(record.get(name_field, '')).lower()
+
+    @classmethod
+    def _name_grams(cls, texts):
+        return {text[i:i + n] for text in texts for n in cls.GRAM_SIZES for i in range(len(text) - n + 1)}
+
+    @classmethod
+    def from_names(cls, names, row_name_ids, name_texts=None, pinyin_enabled=None):
+        if name_texts is None:
+            name_texts = [(name,) + transliterate_name(name) for name in names]
+
+        grams = []
+        gram_name_ids = []
+        for name_id, texts in enumerate(name_texts):
+            name_grams = cls._name_grams(texts)
+            grams.extend(name_grams)
+            gram_name_ids.extend([name_id] * len(name_grams))
+
+        gram_ids, gram_index = pd.factorize(pd.Series(grams, dtype=object))
+        gram_offsets, gram_postings, _ = _build_csr(
+            gram_ids, np.asarray(gram_name_ids, dtype=np.int64), len(gram_index))
+        return cls(list(names), row_name_ids, list(name_texts), pd.Index(gram_index, dtype=object),
+                   gram_offsets, gram_postings, pinyin_enabled)
+
+    @classmethod
+    def from_records(cls, data, name_field):
+        lowered = [cls.name_key(record, name_field) for record in data]
+        row_name_ids, names = pd.factorize(pd.Series(lowered, dtype=object))
+        return cls.from_names(list(names), row_name_ids.astype(np.int64))
+
+    def to_state(self):
+        if self._delta_postings:
+            compacted = NameSearchIndex.from_names(self.names, self.row_name_ids, self.name_texts,
+                                                   self.pinyin_enabled)
+            self.__dict__.update(compacted.__dict__)
+        return {
+            "names": self.names,
+            "row_name_ids": self.row_name_ids,
+            "name_texts": self.name_texts,
+            "grams": self.grams.tolist(),
+            "gram_offsets": self.gram_offsets,
+            "gram_postings": self.gram_postings,
+            "pinyin_enabled": self.pinyin_enabled,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        state = dict(state)
+        state["grams"] = pd.Index(state["grams"], dtype=object)
+        return cls(**state)
+
+    def is_current(self):
+        """是否按当前拼音支持状态构建"""
+        return self.pinyin_enabled == PINYIN_AVAILABLE
+
+    def _postings(self, gram):
+        try:
+            gram_id = self.grams.get_loc(gram)
+            postings = self.gram_postings[self.gram_offsets[gram_id]:self.gram_offsets[gram_id + 1]]
+        except KeyError:
+            postings = None
+
+        delta = self._delta_postings.get(gram)
+        if delta is None:
+            return postings
+        # delta 中的名称 id 均大于已合并部分，拼接后仍保持有序
+        delta = np.asarray(delta, dtype=np.int64)
+        return delta if postings is None else np.concatenate([postings, delta])
+
+    def _contains(self, name_id, term):
+        return any(term in text for text in self.name_texts[name_id])
+
+    def _matching_names(self, term):
+        """检索文本包含查询词的名称 id"""
+        if len(term) < min(self.GRAM_SIZES):
+            # 单字查询无法使用 n-gram，直接扫描去重后的名称
+            return np.array([i for i in range(len(self.names)) if self._contains(i, term)], dtype=np.int64)
+
+        n = max(size for size in self.GRAM_SIZES if size <= len(term))
+        postings = []
+        for gram in {term[i:i + n] for i in range(len(term) - n + 1)}:
+            gram_postings = self._postings(gram)
+            if gram_postings is None:
+                return np.empty(0, dtype=np.int64)
+            postings.append(gram_postings)
+
+        postings.sort(key=len)
+        candidates = postings[0]
+        for gram_postings in postings[1:]:
+            candidates = np.intersect1d(candidates, gram_postings, assume_unique=True)
+            if not len(candidates):
+                break
+
+        if len(term) == n:
+            return candidates.astype(np.int64)
+        return np.array([i for i in candidates if self._contains(i, term)], dtype=np.int64)
+
+    def search(self, term):
+        """
+        返回名称（或其拼音、首字母）包含查询词（不区分大小写）的全部行号
+        排序：完全匹配 > 前缀匹配 > 包含，其次名称越短越靠前，最后按行号
+        """
+        last_search = self._last_search
+        if last_search is not None and last_search[0] == term:
+            return last_search[1]
+
+        lowered_term = term.lower()
+        name_ids = self._matching_names(lowered_term)
+        name_scores = np.full(len(self.names), 2, dtype=np.int8)
+        for name_id in name_ids:
+            texts = self.name_texts[name_id]
+            if lowered_term in texts:
+                name_scores[name_id] = 0
+            elif any(text.startswith(lowered_term) for text in texts):
+                name_scores[name_id] = 1
+
+        rows = np.flatnonzero(np.isin(self.row_name_ids, name_ids))
+        row_names = self.row_name_ids[rows]
+        rows = rows[np.lexsort((rows, self._name_lengths[row_names], name_scores[row_names]))]
+
+        self._last_search = (term, rows)
+        return rows
+
+    # ---------- 增量维护 ----------
+    def copy(self):
+        """可独立增量修改的副本：名称表和 delta 倒排表复制一份，CSR 数组只读共享"""
+        index = copy.copy(self)
+        index.names = list(self.names)
+        index.name_texts = list(self.name_texts)
+        index._name_ids = None if self._name_ids is None else dict(self._name_ids)
+        index._delta_postings = {gram: list(name_ids) for gram, name_ids in self._delta_postings.items()}
+        return index
+
+    def _add_names(self, name_keys):
+        """名称 -> 名称 id，新名称追加到 delta 倒排表"""
+        if self._name_ids is None:
+            self._name_ids = {name: name_id for name_id, name in enumerate(self.names)}
+
+        name_ids = []
+        for name in name_keys:
+            name_id = self._name_ids.get(name)
+            if name_id is None:
+                name_id = len(self.names)
+                texts = (name,) + transliterate_name(name)
+                self.names.append(name)
+                self.name_texts.append(texts)
+                self._name_ids[name] = name_id
+                for gram in self._name_grams(texts):
+                    self._delta_postings.setdefault(gram, []).append(name_id)
+            name_ids.append(name_id)
+
+        self._name_lengths = np.fromiter((len(name) for name in self.names), dtype=np.int64,
+                                         count=len(self.names))
+        self._last_search = None
+        return np.asarray(name_ids, dtype=np.int64)
+
+    def append(self, name_keys):
+        """在末尾追加行（name_keys 为 name_key() 处理后的名称）"""
+        self.row_name_ids = np.concatenate([self.row_name_ids, self._add_names(name_keys)])
+
+    def replace(self, positions, name_keys):
+        """替换指定行号的名称（行号不变）"""
+        row_name_ids = self.row_name_ids.copy()
+        row_name_ids[np.asarray(positions, dtype=np.int64)] = self._add_names(name_keys)
+        self.row_name_ids = row_name_ids
+
+    def delete(self, positions):
+        """删除指定行号的行"""
+        self.row_name_ids = np.delete(self.row_name_ids, np.asarray(positions, dtype=np.int64))
+        self._last_search = None
+
+
+# 台账文件 -> (索引包字段前缀, 主键字段)
+LEDGER_SIDES = {
+    FINANCIAL_DATA_FILE: ("financial", "资产编号+序号"),
+    PHYSICAL_DATA_FILE: ("physical", "固定资产编码"),
+}
+DATASET_FILES = (FINANCIAL_DATA_FILE, PHYSICAL_DATA_FILE, MAPPING_DATA_FILE)
+
+# 台账文件 -> 名称字段（名称检索索引）
+NAME_FIELDS = {
+    FINANCIAL_DATA_FILE: "资产名称",
+    PHYSICAL_DATA_FILE: "固定资产名称",
+}
+
+
+class IndexBundle:
+    """
+    预计算索引包（保存数据时构建并持久化，页面直接加载）
+    - 多值主键索引：financial_keys / physical_keys（KeyIndex，含全部行号与重复次数）
+    - 双向映射索引：mapping（MappingIndex）
+    - 已匹配/未匹配主键集合
+    - 资产编号前缀索引：asset_numbers（AssetNumberIndex）
+    - 名称检索索引（含拼音）：financial_names / physical_names（NameSearchIndex）
+    导入、删除时通过 insert_rows / replace_rows / delete_rows 增量维护
+    """
+
+    def __init__(self, version, counts, financial_keys, physical_keys, mapping,
+                 matched_financial, unmatched_financial, matched_physical, unmatched_physical,
+                 matched_financial_rows, matched_physical_rows, asset_numbers,
+                 financial_names, physical_names):
+        self.version = version
+        self.counts = counts
+        self.financial_keys = financial_keys
+        self.physical_keys = physical_keys
+        self.mapping = mapping
+        self.matched_financial = matched_financial
+        self.unmatched_financial = unmatched_financial
+        self.matched_physical = matched_physical
+        self.unmatched_physical = unmatched_physical
+        self.matched_financial_rows = matched_financial_rows
+        self.matched_physical_rows = matched_physical_rows
+        self.asset_numbers = asset_numbers
+        self.financial_names = financial_names
+        self.physical_names = physical_names
+
+    @classmethod
+    def build(cls, financial_data, physical_data, mapping_data, version=None):
+        mapping = build_mapping_index(mapping_data)
+
+        financial_keys = [index_key(f.get("资产编号+序号")) for f in financial_data]
+        physical_keys = [index_key(p.get("固定资产编码")) for p in physical_data]
+
+        financial_mapped = mapping.financial_codes.get_indexer(financial_keys) >= 0
+        physical_mapped = mapping.physical_codes.get_indexer(physical_keys) >= 0
+
+        matched_financial = {k for k, hit in zip(financial_keys, financial_mapped) if hit}
+        unmatched_financial = {k for k, hit in zip(financial_keys, financial_mapped) if k and not hit}
+        matched_physical = {k for k, hit in zip(physical_keys, physical_mapped) if hit}
+        unmatched_physical = {k for k, hit in zip(physical_keys, physical_mapped) if k and not hit}
+
+        return cls(
+            version=version,
+            counts=(len(financial_data), len(physical_data), len(mapping_data)),
+            financial_keys=KeyIndex.from_keys(financial_keys),
+            physical_keys=KeyIndex.from_keys(physical_keys),
+            mapping=mapping,
+            matched_financial=matched_financial,
+            unmatched_financial=unmatched_financial,
+            matched_physical=matched_physical,
+            unmatched_physical=unmatched_physical,
+            matched_financial_rows=int(financial_mapped.sum()),
+            matched_physical_rows=int(physical_mapped.sum()),
+            asset_numbers=AssetNumberIndex.from_codes(financial_keys),
+            financial_names=NameSearchIndex.from_records(financial_data, NAME_FIELDS[FINANCIAL_DATA_FILE]),
+            physical_names=NameSearchIndex.from_records(physical_data, NAME_FIELDS[PHYSICAL_DATA_FILE]),
+        )
+
+    def to_state(self):
+        """导出为普通字典（持久化时不依赖本脚本中的类定义）"""
+        state = dict(self.__dict__)
+        state["mapping"] = self.mapping.to_state()
+        state["financial_keys"] = self.financial_keys.to_state()
+        state["physical_keys"] = self.physical_keys.to_state()
+        state["asset_numbers"] = self.asset_numbers.to_state()
+        state["financial_names"] = self.financial_names.to_state()
+        state["physical_names"] = self.physical_names.to_state()
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        state = dict(state)
+        state["mapping"] = MappingIndex.from_state(state["mapping"])
+        state["financial_keys"] = KeyIndex.from_state(state["financial_keys"])
+        state["physical_keys"] = KeyIndex.from_state(state["physical_keys"])
+        state["asset_numbers"] = AssetNumberIndex.from_state(state["asset_numbers"])
+        state["financial_names"] = NameSearchIndex.from_state(state["financial_names"])
+        state["physical_names"] = NameSearchIndex.from_state(state["physical_names"])
+        return cls(**state)
+
+    def matches(self, financial_data, physical_data, mapping_data):
+        """检查索引包是否与当前加载的数据一致"""
+        return self.counts == (len(financial_data), len(physical_data), len(mapping_data))
+
+    def is_config_current(self):
+        """是否按当前配置（资产编号规则、拼音支持）构建"""
+        return (self.asset_numbers.is_current() and self.financial_names.is_current()
+                and self.physical_names.is_current())
+
+    def is_current(self, version, counts):
+        """检查索引包是否对应指定数据集版本，且按当前配置构建"""
+        return self.version == version and self.counts == counts and self.is_config_current()
+
+    def financial_index(self, financial_data):
+        return _RecordIndex(self.financial_keys, financial_data)
+
+    def physical_index(self, physical_data):
+        return _RecordIndex(self.physical_keys, physical_data)
+
+    # ---------- 增量维护 ----------
+    def copy(self):
+        """可独立增量修改的副本：增量保存在副本上修改，完成后再替换，其他会话持有的索引包保持不变"""
+        bundle = copy.copy(self)
+        for name in ("financial_keys", "physical_keys", "mapping", "asset_numbers",
+                     "financial_names", "physical_names"):
+            setattr(bundle, name, getattr(self, name).copy())
+        for name in ("matched_financial", "unmatched_financial", "matched_physical", "unmatched_physical"):
+            setattr(bundle, name, set(getattr(self, name)))
+        return bundle
+
+    def compact(self):
+        """发布前合并映射索引的 delta 层（读取路径不再修改索引）"""
+        self.mapping.compact()
+
+    def _is_mapped(self, side, key):
+        if side == "financial":
+            return self.mapping.has_financial(key)
+        return self.mapping.has_physical(key)
+
+    def _set_count(self, filename, delta):
+        counts = list(self.counts)
+        counts[DATASET_FILES.index(filename)] += delta
+        self.counts = tuple(counts)
+
+    def insert_rows(self, filename, records, start_position):
+        """追加记录（行号从 start_position 开始）"""
+        if filename == MAPPING_DATA_FILE:
+            self._apply_mapping_rows(records, add=True)
+            self._set_count(filename, len(records))
+            return True
+
+        side, key_field = LEDGER_SIDES[filename]
+        key_index = getattr(self, f"{side}_keys")
+        if key_index.row_count != start_position:
+            return False
+        matched = getattr(self, f"matched_{side}")
+        unmatched = getattr(self, f"unmatched_{side}")
+
+        keys = [index_key(record.get(key_field)) for record in records]
+        key_index.append(keys)
+        getattr(self, f"{side}_names").append(
+            [NameSearchIndex.name_key(record, NAME_FIELDS[filename]) for record in records])
+        for key in keys:
+            if not key:
+                continue
+            if key in matched or self._is_mapped(side, key):
+                matched.add(key)
+                setattr(self, f"matched_{side}_rows", getattr(self, f"matched_{side}_rows") + 1)
+            else:
+                unmatched.add(key)
+            if side == "financial":
+                self.asset_numbers.add(key)
+
+        self._set_count(filename, len(records))
+        return True
+
+    def replace_rows(self, filename, replaced):
+        """原位替换记录（主键不变）：replaced 为 [(行号, 新记录)] 列表，只需更新名称检索索引"""
+        if filename == MAPPING_DATA_FILE:
+            return False
+        if not replaced:
+            return True
+
+        side, _ = LEDGER_SIDES[filename]
+        getattr(self, f"{side}_names").replace(
+            [position for position, _ in replaced],
+            [NameSearchIndex.name_key(record, NAME_FIELDS[filename]) for _, record in replaced])
+        return True
+
+    def delete_rows(self, filename, deleted):
+        """删除记录：deleted 为 [(原行号, 记录)] 列表"""
+        if filename == MAPPING_DATA_FILE:
+            self._apply_mapping_rows([record for _, record in deleted], add=False)
+            self._set_count(filename, -len(deleted))
+            return True
+
+        side, key_field = LEDGER_SIDES[filename]
+        key_index = getattr(self, f"{side}_keys")
+        matched = getattr(self, f"matched_{side}")
+        unmatched = getattr(self, f"unmatched_{side}")
+
+        deleted_positions = [position for position, _ in deleted]
+        key_index.delete(deleted_positions)
+        getattr(self, f"{side}_names").delete(deleted_positions)
+        deleted_keys = [index_key(record.get(key_field)) for _, record in deleted]
+        matched_deleted = sum(1 for key in deleted_keys if key in matched)
+        setattr(self, f"matched_{side}_rows", getattr(self, f"matched_{side}_rows") - matched_deleted)
+
+        for key in deleted_keys:
+            if not key:
+                continue
+            if key not in key_index:
+                matched.discard(key)
+                unmatched.discard(key)
+
+            if side == "financial":
+                self.asset_numbers.remove(key)
+
+        self._set_count(filename, -len(deleted))
+        return True
+
+    def _apply_mapping_rows(self, records, add):
+        pairs = []
+        for record in records:
+            financial_code = index_key(record.get("资产编号+序号"))
+            physical_code = index_key(record.get("固定资产编码"))
+            if financial_code and physical_code:
+                pairs.append((financial_code, physical_code))
+
+        if add:
+            self.mapping.add_pairs(pairs)
+        else:
+            self.mapping.drop_pairs(pairs)
+
+        for code in {f for f, _ in pairs}:
+            self._refresh_match_state("financial", code)
+        for code in {p for _, p in pairs}:
+            self._refresh_match_state("physical", code)
+
+    def _refresh_match_state(self, side, key):
+        rows = getattr(self, f"{side}_keys").count(key)
+        if not rows:
+            return
+        matched = getattr(self, f"matched_{side}")
+        unmatched = getattr(self, f"unmatched_{side}")
+        mapped = self._is_mapped(side, key)
+        if mapped and key not in matched:
+            matched.add(key)
+            unmatched.discard(key)
+            setattr(self, f"matched_{side}_rows", getattr(self, f"matched_{side}_rows") + rows)
+        elif not mapped and key in matched:
+            matched.discard(key)
+            unmatched.add(key)
+            setattr(self, f"matched_{side}_rows", getattr(self, f"matched_{side}_rows") - rows)
+
+
+def get_file_signature(filename):
+    """文件签名（修改时间+大小），文件不存在时返回 None"""
+    try:
+        stat = os.stat(filename)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+@st.cache_resource(show_spinner=False)
+def get_loaded_datasets():
+    """各数据文件最近一次实际加载/保存的 (数据版本, 数据)（所有会话共享）"""
+    return {}
+
+
+def record_data_version(filename, version, data):
+    """记录数据及其版本：GitHub 数据为文件 blob sha，本地数据为文件签名，无数据时为 None"""
+    get_loaded_datasets()[filename] = (version, data)
+
+
+def _format_data_version(version):
+    if version is None:
+        return "none"
+    if isinstance(version, tuple):
+        return "-".join(map(str, version))
+    return str(version)
+
+
+def get_data_version(filename):
+    """单个数据文件的版本：优先取 load_data / save_data 记录的版本，未加载过时取本地文件签名"""
+    loaded = get_loaded_datasets().get(filename)
+    return _format_data_version(loaded[0] if loaded is not None else get_file_signature(filename))
+
+
+def get_dataset_version():
+    """数据集版本号：三个数据文件版本的组合，数据来源或内容变化后即变化"""
+    return "|".join(get_data_version(f) for f in DATASET_FILES)
+
+
+def _read_local_data(filename):
+    """静默读取本地JSON数据文件"""
+    try:
+        if os.path.exists(filename):
+            with open(filename, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                return data if isinstance(data, list) else []
+    except Exception as e:
+        print(f"本地数据读取失败 ({filename}): {str(e)}")
+    return []
+
+
+def persist_index_bundle(bundle):
+    """将索引包写入本地文件"""
+    try:
+        temp_file = f"{INDEX_BUNDLE_FILE}.tmp"
+        with open(temp_file, 'wb') as f:
+            pickle.dump(bundle.to_state(), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, INDEX_BUNDLE_FILE)
+        return True
+    except Exception as e:
+        print(f"索引包保存失败: {str(e)}")
+        return False
+
+
+def load_index_bundle():
+    """从本地文件加载索引包，失败时返回 None"""
+    try:
+        if os.path.exists(INDEX_BUNDLE_FILE):
+            with open(INDEX_BUNDLE_FILE, 'rb') as f:
+                return IndexBundle.from_state(pickle.load(f))
+    except Exception as e:
+        print(f"索引包加载失败: {str(e)}")
+    return None
+
+
+def _read_saved_datasets(saved_filename, saved_data):
+    """
+    保存后构建索引所用的数据集及其版本，返回 (datasets, version)
+    刚保存的数据集使用内存中的数据；其余数据集使用最近一次加载的数据（与 get_dataset_version 描述的数据一致），
+    从未加载过时读取本地文件，版本取所读文件的签名
+    """
+    loaded = get_loaded_datasets()
+    datasets = {}
+    versions = []
+    for filename in DATASET_FILES:
+        if filename == saved_filename:
+            datasets[filename] = saved_data
+            versions.append(get_data_version(filename))
+        elif filename in loaded:
+            version, datasets[filename] = loaded[filename]
+            versions.append(_format_data_version(version))
+        else:
+            versions.append(_format_data_version(get_file_signature(filename)))
+            datasets[filename] = _read_local_data(filename)
+    return datasets, "|".join(versions)
+
+
+@st.cache_resource(show_spinner=False)
+def get_live_index_bundle():
+    """进程内最新的索引包（所有会话共享，发布后只读）：增量保存在副本上更新后替换，不再反复读写索引包文件"""
+    return {"bundle": None, "lock": threading.Lock()}
+
+
+def set_live_index_bundle(bundle):
+    get_live_index_bundle()["bundle"] = bundle
+
+
+def load_current_index_bundle():
+    """最新的索引包：优先取进程内的索引包，没有时从本地文件加载"""
+    bundle = get_live_index_bundle()["bundle"]
+    return bundle if bundle is not None else load_index_bundle()
+
+
+def refresh_index_bundle(saved_filename, saved_data):
+    """保存数据后重建并持久化索引包，并在后台生成统计快照（其余数据集取最近一次加载的数据，见 _read_saved_datasets）"""
+    try:
+        datasets, version = _read_saved_datasets(saved_filename, saved_data)
+
+        bundle = IndexBundle.build(
+            datasets[FINANCIAL_DATA_FILE],
+            datasets[PHYSICAL_DATA_FILE],
+            datasets[MAPPING_DATA_FILE],
+            version=version
+        )
+        persist_index_bundle(bundle)
+        set_live_index_bundle(bundle)
+        schedule_stats_snapshot(bundle, datasets[FINANCIAL_DATA_FILE], datasets[PHYSICAL_DATA_FILE])
+        return bundle
+    except Exception as e:
+        print(f"索引包构建失败: {str(e)}")
+        return None
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _get_cached_index_bundle(version, counts, _financial_data, _physical_data, _mapping_data):
+    bundle = load_current_index_bundle()
+    if bundle is not None and bundle.is_current(version, counts):
+        return bundle
+
+    # 索引包缺失或过期（例如数据来自GitHub），现场构建并持久化
+    bundle = IndexBundle.build(_financial_data, _physical_data, _mapping_data, version=version)
+    persist_index_bundle(bundle)
+    set_live_index_bundle(bundle)
+    return bundle
+
+
+def get_index_bundle(financial_data, physical_data, mapping_data):
+    """获取当前数据集版本的索引包（进程内缓存 -> 进程内最新索引包 -> 本地文件 -> 现场构建）"""
+    counts = (len(financial_data), len(physical_data), len(mapping_data))
+    return _get_cached_index_bundle(get_dataset_version(), counts,
+                                    financial_data, physical_data, mapping_data)
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _get_cached_key_index(filename, version, count, _data):
+    bundle = load_current_index_bundle()
+    side, key_field = LEDGER_SIDES[filename]
+    if bundle is not None and bundle.version == version and bundle.counts[DATASET_FILES.index(filename)] == count:
+        return getattr(bundle, f"{side}_keys")
+    return KeyIndex.from_records(_data, key_field)
+
+
+def get_key_index(filename, data):
+    """获取单个台账的多值主键索引（优先复用索引包，数据不一致时现场构建）"""
+    return _get_cached_key_index(filename, get_dataset_version(), len(data), data)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _get_cached_ledger_frame(filename, version, count, _data):
+    name_field = NAME_FIELDS[filename]
+    return pd.DataFrame({
+        "名称": [record.get(name_field, '') for record in _data],
+        "价值": np.fromiter((safe_get_value(record, "资产价值") for record in _data), dtype=float, count=count),
+    })
+
+
+def get_ledger_frame(filename, data):
+    """台账列式数据（名称、价值，行号与原数据一致），每个数据集版本计算一次"""
+    return _get_cached_ledger_frame(filename, get_dataset_version(), len(data), data)
+
+
+# 对账汇总取值字段：台账文件 -> (原值, 累计折旧, 净额) 字段，实物台账无净额字段
+RECONCILIATION_VALUE_FIELDS = {
+    FINANCIAL_DATA_FILE: ("资产价值", "累计折旧", "净额"),
+    PHYSICAL_DATA_FILE: ("固定资产原值", "累计折旧", None),
+}
+
+
+def _ledger_value_frame(data, filename):
+    """逐行提取原值/累计折旧/净额（每条记录只遍历一次）"""
+    original_key, depreciation_key, net_key = RECONCILIATION_VALUE_FIELDS[filename]
+    rows = [(safe_get_value(record, original_key, 0),
+             safe_get_value(record, depreciation_key, 0),
+             safe_get_value(record, net_key, 0) if net_key else 0)
+            for record in data]
+    return pd.DataFrame(np.array(rows, dtype=float).reshape(len(rows), 3), columns=["原值", "累计折旧", "净额"])
+
+
+def _group_totals(values, matched_mask, has_net):
+    """按匹配状态一次性汇总：返回 {'all', 'matched', 'unmatched'} -> 原值/折旧/净额/数量"""
+    groups = matched_mask.astype(np.int64)
+    sums = {column: np.bincount(groups, weights=values[column].to_numpy(), minlength=2)
+            for column in values.columns}
+    counts = np.bincount(groups, minlength=2)
+
+    def totals(original, depreciation, net, count):
+        if not has_net or net == 0:  # 无净额（或净额为0）时用原值-累计折旧计算
+            net = max(0, original - depreciation)
+        return {'original': float(original), 'depreciation': float(depreciation),
+                'net': float(net), 'count': int(count)}
+
+    result = {
+        name: totals(sums["原值"][group], sums["累计折旧"][group], sums["净额"][group], counts[group])
+        for name, group in (("unmatched", 0), ("matched", 1))
+    }
+    result["all"] = totals(sums["原值"].sum(), sums["累计折旧"].sum(), sums["净额"].sum(), counts.sum())
+    return result
+
+
+def build_reconciliation(index_bundle, financial_data, physical_data):
+    """
+    对账汇总引擎：一次向量化计算两个台账 全部/已匹配/未匹配 的数量与原值、累计折旧、净额
+    已匹配 = 存在映射关系且对端记录存在
+    """
+    financial_keys, physical_keys = index_bundle.financial_keys, index_bundle.physical_keys
+
+    # 有效映射边：两端主键都存在于台账中
+    edges = index_bundle.mapping.edges()
+    financial_codes = edges[MappingIndex.FINANCIAL_KEY].to_numpy()
+    physical_codes = edges[MappingIndex.PHYSICAL_KEY].to_numpy()
+    valid = (financial_keys.last_positions(financial_codes) >= 0) & (physical_keys.last_positions(physical_codes) >= 0)
 
-    for mapping in mapping_data:
-        financial_key = str(mapping.get("资产编号+序号", "")).strip()  # 财务系统主键
-        physical_key = str(mapping.get("固定资产编码", "")).strip()    # 实物台账主键
+    financial_matched = np.isin(financial_keys.row_ids, financial_keys.keys.get_indexer(financial_codes[valid]))
+    physical_matched = np.isin(physical_keys.row_ids, physical_keys.keys.get_indexer(physical_codes[valid]))
 
-        if (pd.notna(financial_key) and pd.notna(physical_key) and
-                str(financial_key).strip() and str(physical_key).strip()):
-            # 财务系统到实物台账的映射
-            if financial_key not in financial_to_physical_mapping:
-                financial_to_physical_mapping[financial_key] = []
-            if physical_key not in financial_to_physical_mapping[financial_key]:
-                financial_to_physical_mapping[financial_key].append(physical_key)
+    financial_values = _ledger_value_frame(financial_data, FINANCIAL_DATA_FILE)
+    physical_values = _ledger_value_frame(physical_data, PHYSICAL_DATA_FILE)
 
-            # 实物台账到财务系统的映射
-            if physical_key not in physical_to_financial_mapping:
-                physical_to_financial_mapping[physical_key] = []
-            if financial_key not in physical_to_financial_mapping[physical_key]:
-                physical_to_financial_mapping[physical_key].append(financial_key)
+    physical_totals = _group_totals(physical_values, physical_matched, has_net=False)
+    # 实物未匹配价值按编码去重（每个编码取第一条记录）
+    unmatched_first = physical_keys.first_positions(np.flatnonzero(~physical_matched))
+    physical_totals["unmatched"]["deduped_original"] = float(physical_values["原值"].to_numpy()[unmatched_first].sum())
 
-    return financial_to_physical_mapping, physical_to_financial_mapping
+    return {
+        "financial": _group_totals(financial_values, financial_matched, has_net=True),
+        "physical": physical_totals,
+        "financial_matched": financial_matched,
+        "physical_matched": physical_matched,
+        "financial_values": financial_values,
+        "physical_values": physical_values,
+    }
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _get_cached_reconciliation(version, counts, _index_bundle, _financial_data, _physical_data):
+    return build_reconciliation(_index_bundle, _financial_data, _physical_data)
+
+
+def get_reconciliation(index_bundle, financial_data, physical_data):
+    """当前数据集版本的对账汇总（每个版本计算一次，统计页各标签页共用）"""
+    return _get_cached_reconciliation(get_dataset_version(), index_bundle.counts,
+                                      index_bundle, financial_data, physical_data)
+
+
+# 对应关系汇总：台账文件 -> (列名前缀, 部门字段)
+MAPPING_SUMMARY_SIDES = {
+    FINANCIAL_DATA_FILE: ("财务", "部门名称"),
+    PHYSICAL_DATA_FILE: ("实物", "存放部门"),
+}
+MISSING_RECORD_LABEL = "数据缺失"
+
+
+def _summary_side_columns(data, filename, rows):
+    """按行号取出一端台账的名称/价值/部门/保管人列，记录缺失（行号为 -1）时填充缺失标记"""
+    prefix, dept_field = MAPPING_SUMMARY_SIDES[filename]
+    ledger = get_ledger_frame(filename, data)
+    found = rows >= 0
+    found_rows = rows[found]
+
+    names = np.full(len(rows), MISSING_RECORD_LABEL, dtype=object)
+    names[found] = ledger["名称"].to_numpy()[found_rows]
+    values = np.zeros(len(rows), dtype=float)
+    values[found] = ledger["价值"].to_numpy()[found_rows]
+    depts = np.full(len(rows), MISSING_RECORD_LABEL, dtype=object)
+    depts[found] = [data[row].get(dept_field, "") for row in found_rows.tolist()]
+    keepers = np.full(len(rows), MISSING_RECORD_LABEL, dtype=object)
+    keepers[found] = [data[row].get("保管人", "") for row in found_rows.tolist()]
+
+    return found, {f"{prefix}资产名称": names, f"{prefix}资产价值": values,
+                   f"{prefix}部门": depts, f"{prefix}保管人": keepers}
+
+
+def build_mapping_summary(index_bundle, financial_data, physical_data):
+    """
+    对应关系汇总（向量化连接）：映射边 ⋈ 财务台账 ⋈ 实物台账
+    - 映射边已去除空编号和重复对，保持首次出现顺序
+    - 编号有重复记录时取最后一条（与记录索引一致）
+    - 任一端记录缺失时状态为"数据异常"，缺失端显示"数据缺失"、价值差异记0
+    """
+    edges = index_bundle.mapping.edges()
+    financial_codes = edges["资产编号+序号"].to_numpy(dtype=object)
+    physical_codes = edges["固定资产编码"].to_numpy(dtype=object)
+    financial_found, financial_columns = _summary_side_columns(
+        financial_data, FINANCIAL_DATA_FILE, index_bundle.financial_keys.last_positions(financial_codes))
+    physical_found, physical_columns = _summary_side_columns(
+        physical_data, PHYSICAL_DATA_FILE, index_bundle.physical_keys.last_positions(physical_codes))
+    normal = financial_found & physical_found
+
+    return pd.DataFrame({
+        "资产编号+序号": financial_codes,
+        **financial_columns,
+        "实物台账编号": physical_codes,
+        **physical_columns,
+        "价值差异": np.where(normal, financial_columns["财务资产价值"] - physical_columns["实物资产价值"], 0.0),
+        "状态": np.where(normal, "正常匹配", "数据异常").astype(object),
+    })
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _get_cached_mapping_summary(version, counts, _index_bundle, _financial_data, _physical_data):
+    return build_mapping_summary(_index_bundle, _financial_data, _physical_data)
+
+
+def get_mapping_summary(index_bundle, financial_data, physical_data):
+    """当前数据集版本的对应关系汇总（只读，每个版本连接一次）"""
+    return _get_cached_mapping_summary(get_dataset_version(), index_bundle.counts,
+                                       index_bundle, financial_data, physical_data)
+
+
+# 明细视图：台账文件 -> (名称字段, 部门字段, 对应编号列)
+DETAIL_VIEW_FIELDS = {
+    FINANCIAL_DATA_FILE: ("资产名称", "部门名称", "对应实物编号"),
+    PHYSICAL_DATA_FILE: ("固定资产名称", "存放部门", "对应财务编号"),
+}
+FILTER_CACHE_SIZE = 64
+
+
+def build_detail_frame(data, filename, index_bundle):
+    """明细视图基础表：原始字段 + 匹配状态 + 对应编号（批量连接映射索引，一次完成）"""
+    side, key_field = LEDGER_SIDES[filename]
+    counterpart_column = DETAIL_VIEW_FIELDS[filename][2]
+    df = pd.DataFrame(data)
+    if key_field not in df.columns:
+        return df
+
+    if side == "financial":
+        pairs = index_bundle.mapping.join_physical(df[key_field].tolist())
+        other_key = MappingIndex.PHYSICAL_KEY
+    else:
+        pairs = index_bundle.mapping.join_financial(df[key_field].tolist())
+        other_key = MappingIndex.FINANCIAL_KEY
+    mapped_rows, joined_codes = _join_sorted_groups(pairs["查询序号"].to_numpy(),
+                                                    pairs[other_key].to_numpy(dtype=object))
+
+    matched = np.zeros(len(df), dtype=bool)
+    matched[mapped_rows] = True
+    counterparts = np.full(len(df), "无", dtype=object)
+    counterparts[mapped_rows] = joined_codes
+    df["匹配状态"] = np.where(matched, "已匹配", "未匹配").astype(object)
+    df[counterpart_column] = counterparts
+    return df
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _get_cached_detail_frame(filename, version, counts, _index_bundle, _data):
+    return build_detail_frame(_data, filename, _index_bundle)
+
+
+def get_detail_frame(filename, index_bundle, data):
+    """明细视图基础表（只读共享，每个数据集版本构建一次）"""
+    return _get_cached_detail_frame(filename, get_dataset_version(), index_bundle.counts, index_bundle, data)
+
+
+@st.cache_resource(show_spinner=False)
+def get_filter_cache():
+    """明细视图筛选流水线的阶段结果缓存（行号数组，进程级共享）"""
+    return LRUCache(FILTER_CACHE_SIZE)
+
+
+def filter_detail_rows(filename, base_df, dept_filter, match_filter, search_term):
+    """
+    明细视图筛选流水线：基础表 → 部门 → 匹配状态 → 搜索，返回符合条件的行号（升序）
+    每个阶段按 (数据集版本, 截至本阶段的筛选参数) 缓存，参数变化时只重算变化的阶段及其后续阶段
+    """
+    name_field, dept_field, _ = DETAIL_VIEW_FIELDS[filename]
+    key_field = LEDGER_SIDES[filename][1]
+    version = get_dataset_version()
+    cache = get_filter_cache()
+    stage_key = (filename, version, len(base_df))
+
+    def dept_stage():
+        if dept_filter == "全部":
+            return np.arange(len(base_df))
+        if dept_field not in base_df.columns:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero((base_df[dept_field] == dept_filter).to_numpy(dtype=bool))
+
+    stage_key += ("部门", dept_filter)
+    rows = cache.get_or_compute(stage_key, dept_stage)
+
+    if match_filter != "全部":
+        def match_stage(rows=rows):
+            return rows[base_df["匹配状态"].to_numpy()[rows] == match_filter]
+
+        stage_key += ("匹配状态", match_filter)
+        rows = cache.get_or_compute(stage_key, match_stage)
+
+    if search_term:
+        def search_stage(rows=rows):
+            columns = [col for col in (name_field, key_field) if col in base_df.columns]
+            search_index = get_search_index(f"{filename}#明细", version, base_df, columns)
+            hit = np.zeros(len(base_df), dtype=bool)
+            hit[search_index.search(search_term)] = True
+            return rows[hit[rows]]
+
+        stage_key += ("搜索", search_term)
+        rows = cache.get_or_compute(stage_key, search_stage)
+
+    return rows
+
+
+# 非核算资产之外视为核算资产的“是否核算”取值
+ACCOUNTING_FLAGS = ["是", "Y", "y", "Yes", "YES", "1", "True", "true"]
+
+
+def build_physical_value_columns(physical_data):
+    """实物台账估值所需的列：固定资产原值（数值，按 safe_get_value 兼容原值/资产原值等字段名）、是否核算"""
+    has_accounting_field = any("是否核算" in record for record in physical_data)
+    values = np.fromiter((safe_get_value(record, "固定资产原值") for record in physical_data),
+                         dtype=float, count=len(physical_data))
+    if has_accounting_field:
+        accounting = pd.Series([record.get("是否核算", "") for record in physical_data], dtype=object)
+        accounting = accounting.astype(str).str.strip().isin(ACCOUNTING_FLAGS).to_numpy()
+    else:
+        accounting = np.ones(len(physical_data), dtype=bool)
+    return {"values": values, "accounting": accounting, "has_accounting_field": has_accounting_field}
+
+
+def compute_physical_valuation(columns, key_index, rows=None):
+    """
+    实物台账估值（向量化）：rows 为参与计算的行号（升序），默认全部记录
+    - raw_*：全部记录，核算筛选后
+    - dedup_*：先按固定资产编码去重（保留第一条），再核算筛选
+    - accounting_dedup_*：先核算筛选，再去重（数据统计页口径）
+    只累计大于0的原值，小于0的原值计为异常记录
+    """
+    values, accounting = columns["values"], columns["accounting"]
+    rows = np.arange(len(values)) if rows is None else np.asarray(rows, dtype=np.int64)
+
+    def summarize(positions):
+        kept_values = values[positions[accounting[positions]]]
+        positive = kept_values > 0
+        return (float(kept_values[positive].sum()), int(positive.sum()),
+                int((kept_values < 0).sum()), len(positions) - len(kept_values))
+
+    deduped_rows = key_index.first_positions(rows)
+    accounting_rows = rows[accounting[rows]]
+    accounting_deduped_rows = key_index.first_positions(accounting_rows)
+
+    raw_total, raw_valid, error_count, raw_non_accounting = summarize(rows)
+    dedup_total, dedup_valid, _, dedup_non_accounting = summarize(deduped_rows)
+    accounting_dedup_total, accounting_dedup_valid, _, _ = summarize(accounting_deduped_rows)
+
+    return {
+        "has_accounting_field": columns["has_accounting_field"],
+        "record_count": len(rows),
+        "deduped_count": len(deduped_rows),
+        "duplicate_count": len(rows) - len(deduped_rows),
+        "error_count": error_count,
+        "raw_total": raw_total,
+        "raw_valid": raw_valid,
+        "raw_non_accounting": raw_non_accounting,
+        "dedup_total": dedup_total,
+        "dedup_valid": dedup_valid,
+        "dedup_non_accounting": dedup_non_accounting,
+        "accounting_count": len(accounting_rows),
+        "accounting_deduped_count": len(accounting_deduped_rows),
+        "accounting_dedup_total": accounting_dedup_total,
+        "accounting_dedup_valid": accounting_dedup_valid,
+    }
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _get_cached_physical_value_columns(version, count, _physical_data):
+    return build_physical_value_columns(_physical_data)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _get_cached_physical_valuation(version, count, _physical_data):
+    columns = _get_cached_physical_value_columns(version, count, _physical_data)
+    return compute_physical_valuation(columns, get_key_index(PHYSICAL_DATA_FILE, _physical_data))
+
+
+def get_physical_valuation(physical_data, rows=None):
+    """
+    实物台账估值（核算筛选 + 按编码去重），列数据每个数据集版本提取一次
+    rows 为筛选后的行号（升序）；不传时返回全部记录的估值（按版本缓存）
+    """
+    version, count = get_dataset_version(), len(physical_data)
+    if rows is None:
+        return _get_cached_physical_valuation(version, count, physical_data)
+    columns = _get_cached_physical_value_columns(version, count, physical_data)
+    return compute_physical_valuation(columns, get_key_index(PHYSICAL_DATA_FILE, physical_data), rows)
+
+
+def _snapshot_physical_valuation(index_bundle, physical_data):
+    """统计快照中的实物资产价值：只统计核算资产，并按固定资产编码去重（保留第一条）"""
+    if not any("固定资产编码" in record for record in physical_data):
+        return {
+            "total_value": sum(safe_get_value(p, "资产价值") for p in physical_data),
+            "original_count": len(physical_data),
+            "deduped_count": len(physical_data),
+            "duplicate_count": 0,
+            "non_accounting_count": 0,
+        }
+
+    valuation = compute_physical_valuation(build_physical_value_columns(physical_data), index_bundle.physical_keys)
+    return {
+        "total_value": valuation["accounting_dedup_total"],
+        "original_count": valuation["record_count"],
+        "deduped_count": valuation["accounting_deduped_count"],
+        "duplicate_count": valuation["accounting_count"] - valuation["accounting_deduped_count"],
+        "non_accounting_count": valuation["record_count"] - valuation["accounting_count"],
+    }
+
+
+# 资产立方体维度：台账文件 -> (部门字段, 分类字段)
+DEPARTMENT_FIELDS = {
+    FINANCIAL_DATA_FILE: ("部门名称", "资产分类"),
+    PHYSICAL_DATA_FILE: ("存放部门", "固定资产类型"),
+}
+CUBE_DIMENSIONS = ["部门", "分类", "匹配状态"]
+CUBE_MEASURES = ["资产数量", "总价值", "累计折旧", "净额", "已匹配"]
+
+
+def build_asset_cube(data, filename, values, matched_mask):
+    """
+    资产立方体：部门 × 分类 × 匹配状态 预聚合的 资产数量/原值/累计折旧/净额/已匹配数量
+    空部门/分类保留为缺失值；净额逐行取值，实物台账按 原值-累计折旧 计算
+    """
+    department_field, category_field = DEPARTMENT_FIELDS[filename]
+    matched_mask = np.asarray(matched_mask, dtype=bool)
+    net = values["净额"] if filename == FINANCIAL_DATA_FILE else values["原值"] - values["累计折旧"]
+    frame = pd.DataFrame({
+        "部门": pd.Series([record.get(department_field) for record in data], dtype=object),
+        "分类": pd.Series([record.get(category_field) for record in data], dtype=object),
+        "匹配状态": np.where(matched_mask, "已匹配", "未匹配"),
+        "资产数量": 1,
+        "总价值": values["原值"].to_numpy(),
+        "累计折旧": values["累计折旧"].to_numpy(),
+        "净额": net.to_numpy(),
+        "已匹配": matched_mask.astype(np.int64),
+    })
+    return rollup_cube(frame, by=CUBE_DIMENSIONS)
+
+
+def rollup_cube(cube, by=("部门",), filters=None):
+    """
+    在立方体上切片（filters: 维度 -> 取值）并上卷到指定维度，重新计算匹配率
+    by 为空时返回单行合计
+    """
+    for dimension, value in (filters or {}).items():
+        cube = cube[cube[dimension].isna()] if pd.isna(value) else cube[cube[dimension] == value]
+    if by:
+        result = cube.groupby(list(by), sort=False, dropna=False)[CUBE_MEASURES].sum().reset_index()
+    else:
+        result = cube[CUBE_MEASURES].sum().to_frame().T
+    result["匹配率"] = np.where(result["资产数量"] > 0, result["已匹配"] / result["资产数量"].clip(lower=1) * 100, 0.0)
+    return result
+
+
+def department_filter_options(cube):
+    """浏览页部门筛选：排序后的部门列表，以及含资产数量、匹配率的显示标签"""
+    summary = rollup_cube(cube)
+    labels = {
+        department: f"{department}（{count:,} 项，匹配率 {rate:.0f}%）"
+        for department, count, rate in zip(summary["部门"], summary["资产数量"], summary["匹配率"])
+        if isinstance(department, str) and department.strip()
+    }
+    return sorted(labels), labels
+
+
+def build_stats_snapshot(index_bundle, financial_data, physical_data, reconciliation=None):
+    """
+    统计快照：匹配数量、价值汇总、实物去重/核算筛选后的价值、资产立方体
+    只包含汇总结果（普通 dict / DataFrame），随数据集版本持久化
+    """
+    if reconciliation is None:
+        reconciliation = build_reconciliation(index_bundle, financial_data, physical_data)
+
+    return {
+        "schema": STATS_SNAPSHOT_SCHEMA,
+        "version": index_bundle.version,
+        "counts": index_bundle.counts,
+        "financial": reconciliation["financial"],
+        "physical": reconciliation["physical"],
+        "physical_valuation": _snapshot_physical_valuation(index_bundle, physical_data),
+        # 部门 × 分类 × 匹配状态 立方体（两个台账），图表、多维分析和浏览页部门筛选共用
+        "cubes": {
+            "financial": build_asset_cube(financial_data, FINANCIAL_DATA_FILE,
+                                          reconciliation["financial_values"], reconciliation["financial_matched"]),
+            "physical": build_asset_cube(physical_data, PHYSICAL_DATA_FILE,
+                                         reconciliation["physical_values"], reconciliation["physical_matched"]),
+        },
+    }
+
+
+def persist_stats_snapshot(snapshot):
+    """将统计快照写入本地文件"""
+    try:
+        temp_file = f"{STATS_SNAPSHOT_FILE}.{threading.get_ident()}.tmp"
+        with open(temp_file, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, STATS_SNAPSHOT_FILE)
+        return True
+    except Exception as e:
+        print(f"统计快照保存失败: {str(e)}")
+        return False
+
+
+def load_stats_snapshot():
+    """从本地文件加载统计快照，失败时返回 None"""
+    try:
+        if os.path.exists(STATS_SNAPSHOT_FILE):
+            with open(STATS_SNAPSHOT_FILE, 'rb') as f:
+                return pickle.load(f)
+    except Exception as e:
+        print(f"统计快照加载失败: {str(e)}")
+    return None
+
+
+@st.cache_resource(show_spinner=False)
+def get_stats_snapshot_jobs():
+    """后台统计快照任务（所有会话共享）：latest 为最近一次保存的 (数据集版本, 线程)"""
+    return {"lock": threading.Lock(), "latest": None}
+
+
+def schedule_stats_snapshot(bundle, financial_data, physical_data):
+    """保存数据后在后台线程中计算并持久化统计快照，保存本身不等待；任务依次执行，已被更新的保存取代时跳过"""
+    jobs = get_stats_snapshot_jobs()
+
+    def build():
+        with jobs["lock"]:
+            if jobs["latest"][0] != bundle.version:
+                return
+            try:
+                persist_stats_snapshot(build_stats_snapshot(bundle, financial_data, physical_data))
+            except Exception as e:
+                print(f"统计快照构建失败: {str(e)}")
+
+    thread = threading.Thread(target=build, daemon=True)
+    jobs["latest"] = (bundle.version, thread)
+    thread.start()
+
+
+def wait_for_stats_snapshot(version):
+    """该数据集版本的后台快照任务仍在运行时等待其完成"""
+    latest = get_stats_snapshot_jobs()["latest"]
+    if latest is not None and latest[0] == version:
+        latest[1].join()
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _get_cached_stats_snapshot(version, counts, _index_bundle, _financial_data, _physical_data):
+    wait_for_stats_snapshot(version)
+    snapshot = load_stats_snapshot()
+    if (snapshot is not None and snapshot.get("schema") == STATS_SNAPSHOT_SCHEMA
+            and snapshot["version"] == version and snapshot["counts"] == counts):
+        return snapshot
+
+    # 快照缺失或过期（例如数据来自GitHub、后台任务失败），现场计算并持久化
+    snapshot = build_stats_snapshot(_index_bundle, _financial_data, _physical_data,
+                                    get_reconciliation(_index_bundle, _financial_data, _physical_data))
+    persist_stats_snapshot(snapshot)
+    return snapshot
+
+
+def get_stats_snapshot(index_bundle, financial_data, physical_data):
+    """当前数据集版本的统计快照（进程内缓存 -> 后台任务/本地文件 -> 现场计算）"""
+    return _get_cached_stats_snapshot(index_bundle.version, index_bundle.counts,
+                                      index_bundle, financial_data, physical_data)
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _get_cached_unmatched_rows(side, version, counts, _index_bundle):
+    key_index = getattr(_index_bundle, f"{side}_keys")
+    # 空编号的记录不可能出现在映射中，同样列为未匹配
+    return key_index.rows_of_keys(getattr(_index_bundle, f"unmatched_{side}"), include_blank=True)
+
+
+def get_unmatched_rows(side, index_bundle):
+    """未匹配记录的行号（升序，含空编号记录），每个索引包版本计算一次"""
+    return _get_cached_unmatched_rows(side, index_bundle.version, index_bundle.counts, index_bundle)
+
+
+def get_unmatched_records(side, index_bundle, data):
+    """未匹配记录（保持原顺序）"""
+    return [data[position] for position in get_unmatched_rows(side, index_bundle)]
+
+
+SEARCH_FIELD_SEPARATOR = "\x1f"
+
+
+class TextSearchIndex:
+    """
+    跨列全文检索索引：每行所有字段的文本（与 astype(str) 一致）拼接成一列小写文本
+    构建一次后，每次搜索只需对这一列做一次向量化子串匹配
+    """
+
+    def __init__(self, df, columns=None):
+        self.row_count = len(df)
+        columns = [df[col].astype(str).fillna("") for col in (df.columns if columns is None else columns)]
+        if columns and self.row_count:
+            text = columns[0].str.cat(columns[1:], sep=SEARCH_FIELD_SEPARATOR) if len(columns) > 1 else columns[0]
+            self.text = text.str.lower().reset_index(drop=True)
+        else:
+            self.text = pd.Series([""] * self.row_count, dtype=str)
+
+    def search(self, term):
+        """返回任一字段包含搜索词（不区分大小写、按字面匹配）的行位置"""
+        term = str(term).lower()
+        if not term:
+            return np.arange(self.row_count)
+        return np.flatnonzero(self.text.str.contains(term, regex=False).to_numpy(dtype=bool))
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _get_cached_search_index(name, signature, row_count, columns, _df):
+    return TextSearchIndex(_df, list(columns))
+
+
+def get_search_index(name, signature, df, columns=None):
+    """按 (数据名, 数据版本) 缓存的跨列搜索索引（默认检索全部列），数据版本不变时只构建一次"""
+    columns = tuple(df.columns if columns is None else columns)
+    return _get_cached_search_index(name, signature, len(df), columns, df)
+
+
+def uploaded_file_signature(uploaded_file):
+    """上传文件的内容签名（SHA-1），不同会话上传的同名同大小文件不会共用缓存"""
+    return hashlib.sha1(uploaded_file.getvalue()).hexdigest()
+
+
+def search_frame(df, search_index, term):
+    """用搜索索引筛选 DataFrame（保持原行顺序）"""
+    return df.iloc[search_index.search(term)]
+
+
+def _join_sorted_groups(group_ids, values):
+    """按组拼接字符串（group_ids 已升序），返回 (组id数组, 拼接结果列表)"""
+    if not len(group_ids):
+        return group_ids, []
+    boundaries = np.flatnonzero(np.diff(group_ids)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(group_ids)]))
+    values = [str(value) for value in values]
+    joined = [", ".join(values[start:end]) for start, end in zip(starts.tolist(), ends.tolist())]
+    return group_ids[starts], joined
+
+
+def batch_query(codes, financial_side, index_bundle, financial_data, physical_data, own_positions=None):
+    """
+    批量查询（向量化连接）：查询编号 ⋈ 主键索引 ⋈ 映射 ⋈ 对端台账，按查询编号聚合对端名称和价值
+    结果列与逐条查询一致，行顺序与输入顺序一致
+    own_positions: 已计算好的查询编号在本端台账中的行号（可选）
+    """
+    if financial_side:
+        own_keys, other_keys = index_bundle.financial_keys, index_bundle.physical_keys
+        own_frame = get_ledger_frame(FINANCIAL_DATA_FILE, financial_data)
+        other_frame = get_ledger_frame(PHYSICAL_DATA_FILE, physical_data)
+        pairs = index_bundle.mapping.join_physical(codes)
+        own_label, other_label, other_key = "财务", "实物", MappingIndex.PHYSICAL_KEY
+        other_code_column = "对应实物编号"
+    else:
+        own_keys, other_keys = index_bundle.physical_keys, index_bundle.financial_keys
+        own_frame = get_ledger_frame(PHYSICAL_DATA_FILE, physical_data)
+        other_frame = get_ledger_frame(FINANCIAL_DATA_FILE, financial_data)
+        pairs = index_bundle.mapping.join_financial(codes)
+        own_label, other_label, other_key = "实物", "财务", MappingIndex.FINANCIAL_KEY
+        other_code_column = "对应财务编号"
+
+    codes = np.asarray(codes, dtype=object)
+    query_count = len(codes)
+
+    # 查询编号 ⋈ 主键索引
+    if own_positions is None:
+        own_positions = own_keys.last_positions(codes)
+    found = own_positions >= 0
+
+    # ⋈ 映射（只保留查询编号本身存在的记录）
+    pair_queries = pairs["查询序号"].to_numpy()
+    pair_codes = pairs[other_key].to_numpy(dtype=object)
+    keep = found[pair_queries]
+    pair_queries, pair_codes = pair_queries[keep], pair_codes[keep]
+    mapped = np.bincount(pair_queries, minlength=query_count) > 0
+
+    # ⋈ 对端台账，按查询编号聚合
+    other_positions = other_keys.last_positions(pair_codes)
+    other_found = other_positions >= 0
+    other_values = np.bincount(pair_queries[other_found],
+                               weights=other_frame["价值"].to_numpy()[other_positions[other_found]],
+                               minlength=query_count)
+    code_queries, joined_codes = _join_sorted_groups(pair_queries, pair_codes)
+    name_queries, joined_names = _join_sorted_groups(
+        pair_queries[other_found], other_frame["名称"].to_numpy(dtype=object)[other_positions[other_found]])
+
+    own_names = np.full(query_count, "未找到", dtype=object)
+    own_names[found] = own_frame["名称"].to_numpy(dtype=object)[own_positions[found]]
+    own_values = np.zeros(query_count)
+    own_values[found] = own_frame["价值"].to_numpy()[own_positions[found]]
+    missing_text = np.where(found, "未映射", "未找到")
+    other_codes = missing_text.astype(object)
+    other_codes[code_queries] = joined_codes
+    other_names = missing_text.astype(object)
+    other_names[mapped] = ""
+    other_names[name_queries] = joined_names
+
+    return pd.DataFrame({
+        "查询编号": codes,
+        f"{own_label}资产名称": own_names,
+        f"{own_label}资产价值": own_values,
+        other_code_column: other_codes,
+        f"{other_label}资产名称": other_names,
+        f"{other_label}资产价值": np.where(mapped, other_values, 0.0),
+        "状态": np.where(found, np.where(mapped, "已映射", "未映射"), "不存在"),
+    })
+
+
+def batch_query_mixed(codes, index_bundle, financial_data, physical_data):
+    """
+    混合编号批量查询：每个编号同时在财务、实物主键索引中查找，自动识别编号类型
+    （财务编号 / 实物编号 / 两者均匹配 / 未知），再分别连接映射和对端台账
+    两者均匹配的编号输出两行（财务在前），结果按输入顺序排列
+    """
+    codes = np.asarray(codes, dtype=object)
+    financial_positions = index_bundle.financial_keys.last_positions(codes)
+    physical_positions = index_bundle.physical_keys.last_positions(codes)
+    is_financial = financial_positions >= 0
+    is_physical = physical_positions >= 0
+
+    code_types = np.select([is_financial & is_physical, is_financial, is_physical],
+                           ["两者均匹配", "财务编号", "实物编号"], default="未知")
+
+    financial_rows = batch_query(codes[is_financial], True, index_bundle, financial_data, physical_data,
+                                 own_positions=financial_positions[is_financial])
+    financial_rows = financial_rows.rename(columns={"对应实物编号": "实物编号"})
+    financial_rows["财务编号"] = financial_rows["查询编号"]
+    financial_rows["查询序号"] = np.flatnonzero(is_financial)
+
+    physical_rows = batch_query(codes[is_physical], False, index_bundle, financial_data, physical_data,
+                                own_positions=physical_positions[is_physical])
+    physical_rows = physical_rows.rename(columns={"对应财务编号": "财务编号"})
+    physical_rows["实物编号"] = physical_rows["查询编号"]
+    physical_rows["查询序号"] = np.flatnonzero(is_physical)
+
+    unknown = ~(is_financial | is_physical)
+    unknown_rows = pd.DataFrame({
+        "查询编号": codes[unknown],
+        "财务编号": "未找到",
+        "财务资产名称": "未找到",
+        "财务资产价值": 0.0,
+        "实物编号": "未找到",
+        "实物资产名称": "未找到",
+        "实物资产价值": 0.0,
+        "状态": "不存在",
+        "查询序号": np.flatnonzero(unknown),
+    })
+
+    result = pd.concat([financial_rows, physical_rows, unknown_rows], ignore_index=True)
+    result = result.sort_values("查询序号", kind="mergesort").reset_index(drop=True)
+    result["编号类型"] = code_types[result["查询序号"].to_numpy(dtype=np.int64)]
+    return result[["查询编号", "编号类型", "财务编号", "财务资产名称", "财务资产价值",
+                   "实物编号", "实物资产名称", "实物资产价值", "状态"]]
+
+
+# 批量查询模式
+BATCH_QUERY_MODES = ["资产编号+序号", "实物台账编号", "自动识别（混合编号）"]
+
+
+def run_batch_query(codes, query_mode, index_bundle, financial_data, physical_data):
+    """按查询模式执行批量查询"""
+    if query_mode == "自动识别（混合编号）":
+        return batch_query_mixed(codes, index_bundle, financial_data, physical_data)
+    return batch_query(codes, query_mode == "资产编号+序号", index_bundle, financial_data, physical_data)
+
+
+def batch_query_to_file(codes, query_mode, index_bundle, financial_data, physical_data,
+                        progress_callback=None):
+    """
+    分块批量查询，结果逐块写入临时CSV文件（不在内存中保留完整结果表）
+    文件登记在有界的结果缓存中，超出 BATCH_RESULT_CACHE_SIZE 个时自动删除最早的文件
+    返回 (文件路径, 状态统计, 预览DataFrame)
+    """
+    status_counts = Counter()
+    preview_df = None
+    fd, result_path = tempfile.mkstemp(prefix="batch_query_", suffix=".csv")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8-sig", newline="") as f:
+            for start in range(0, len(codes), BATCH_QUERY_CHUNK_SIZE):
+                chunk_df = run_batch_query(codes[start:start + BATCH_QUERY_CHUNK_SIZE], query_mode,
+                                           index_bundle, financial_data, physical_data)
+                chunk_df.to_csv(f, index=False, header=(start == 0))
+                status_counts.update(chunk_df["状态"].value_counts().to_dict())
+                if preview_df is None:
+                    preview_df = chunk_df.head(BATCH_QUERY_PREVIEW_ROWS)
+                if progress_callback:
+                    progress_callback(min(start + BATCH_QUERY_CHUNK_SIZE, len(codes)), len(codes))
+    except Exception:
+        _remove_export_file(result_path)
+        raise
+    get_batch_result_cache().get_or_compute(result_path, lambda: result_path)
+    return result_path, dict(status_counts), preview_df
+
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def read_codes_file(file_name, file_bytes):
+    """读取上传的编号文件（CSV/Excel），所有列按文本读取"""
+    if file_name.lower().endswith(".csv"):
+        return pd.read_csv(io.BytesIO(file_bytes), dtype=str, encoding="utf-8-sig")
+    return pd.read_excel(io.BytesIO(file_bytes), dtype=str)
+
+
+class LRUCache:
+    """线程安全的有界 LRU 缓存，统计命中率；on_evict 在条目被淘汰或移除时回调（例如删除临时文件）"""
+
+    def __init__(self, max_size, on_evict=None):
+        self.max_size = max_size
+        self.on_evict = on_evict
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+
+        value = compute()
+        evicted = []
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                evicted.append(self._items.popitem(last=False)[1])
+        if self.on_evict:
+            for old_value in evicted:
+                self.on_evict(old_value)
+        return value
+
+    def discard(self, key):
+        """移除指定条目（不存在时忽略）"""
+        with self._lock:
+            value = self._items.pop(key, None)
+        if value is not None and self.on_evict:
+            self.on_evict(value)
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats_text(self):
+        return (f"⚡ 查询缓存命中率 {self.hit_rate * 100:.1f}%（命中 {self.hits} / 共 {self.hits + self.misses} 次），"
+                f"已缓存 {len(self)}/{self.max_size} 条")
+
+
+@st.cache_resource(show_spinner=False)
+def get_lookup_cache():
+    """单个编号对账结果缓存（进程级，所有会话共享）"""
+    return LRUCache(LOOKUP_CACHE_SIZE)
+
+
+@st.cache_resource(show_spinner=False)
+def get_batch_result_cache():
+    """文件批量查询结果临时文件（进程级，有界）：会话结束或刷新页面后遗留的文件在淘汰时删除"""
+    return LRUCache(BATCH_RESULT_CACHE_SIZE, on_evict=_remove_export_file)
+
+
+def reconcile_code(code, financial_side, index_bundle, financial_data, physical_data):
+    """
+    单个编号的对账结果：本端记录（含重复记录）、映射的对端记录及价值汇总
+    本端记录不存在时返回 None
+    """
+    if financial_side:
+        own_index = index_bundle.financial_index(financial_data)
+        other_index = index_bundle.physical_index(physical_data)
+        counterpart_codes = index_bundle.mapping.financial_to_physical.get(code, [])
+    else:
+        own_index = index_bundle.physical_index(physical_data)
+        other_index = index_bundle.financial_index(financial_data)
+        counterpart_codes = index_bundle.mapping.physical_to_financial.get(code, [])
+
+    record = own_index.get(code)
+    if not record:
+        return None
+
+    counterparts = []
+    counterpart_total = 0.0
+    valid_count = 0
+    for counterpart_code in counterpart_codes:
+        counterpart_record = other_index.get(counterpart_code)
+        counterpart_value = safe_get_value(counterpart_record, "资产价值") if counterpart_record else 0
+        counterparts.append((counterpart_code, counterpart_record, counterpart_value))
+        if counterpart_record:
+            counterpart_total += counterpart_value
+            valid_count += 1
+
+    duplicate_records = own_index.get_all(code)
+    return {
+        "record": record,
+        "duplicate_records": duplicate_records if len(duplicate_records) > 1 else [],
+        "value": safe_get_value(record, "资产价值"),
+        "counterparts": counterparts,
+        "counterpart_total": counterpart_total,
+        "valid_count": valid_count,
+    }
+
+
+def lookup_reconciliation(code, financial_side, index_bundle, financial_data, physical_data):
+    """带缓存的单个编号对账（按 编号 + 数据集版本 缓存）"""
+    cache_key = (financial_side, code, index_bundle.version, index_bundle.counts)
+    return get_lookup_cache().get_or_compute(
+        cache_key, lambda: reconcile_code(code, financial_side, index_bundle, financial_data, physical_data))
+
+
+def save_data_incremental(data, filename, base_length, apply_delta):
+    """
+    保存数据并增量更新进程内最新的索引包：在副本上应用增量，完成后在锁内替换
+    apply_delta(bundle) 返回 False、抛出异常或索引包与保存前数据不一致时，回退为全量重建
+    增量更新后的索引包只保存在进程内，索引包文件由全量重建时写入（重启后版本不一致会自动重建）
+    """
+    base_version = get_dataset_version()
+    cleaned_data = clean_data_for_json(data)
+    if not save_cleaned_data(cleaned_data, filename, refresh_index=False):
+        return False
+
+    live = get_live_index_bundle()
+    with live["lock"]:
+        base_bundle = load_current_index_bundle()
+        try:
+            if (base_bundle is not None and base_bundle.version == base_version
+                    and base_bundle.counts[DATASET_FILES.index(filename)] == base_length
+                    and base_bundle.is_config_current()):
+                bundle = base_bundle.copy()
+                if apply_delta(bundle):
+                    bundle.compact()
+                    bundle.version = get_dataset_version()
+                    live["bundle"] = bundle
+                    datasets, version = _read_saved_datasets(filename, cleaned_data)
+                    if version == bundle.version:
+                        schedule_stats_snapshot(bundle, datasets[FINANCIAL_DATA_FILE], datasets[PHYSICAL_DATA_FILE])
+                    return True
+        except Exception as e:
+            print(f"索引包增量更新失败，改为全量重建: {str(e)}")
+
+        refresh_index_bundle(filename, cleaned_data)
+    return True
+
+
+def append_records(existing_data, new_records, filename):
+    """追加导入：保存合并后的数据并增量更新索引，返回合并后的数据"""
+    combined_data = existing_data + new_records
+    save_data_incremental(
+        combined_data, filename, len(existing_data),
+        lambda bundle: bundle.insert_rows(filename, new_records, len(existing_data)))
+    return combined_data
+
+
+def upsert_records(existing_data, new_records, filename, key_field):
+    """更新导入：按主键更新已有记录、追加新记录，返回更新后的数据"""
+    existing_dict = {record.get(key_field): record for record in existing_data}
+    # 原数据存在重复或空主键时，合并后行号会整体变化，只能全量重建
+    rows_collapsed = len(existing_dict) != len(existing_data)
+
+    for record in new_records:
+        existing_dict[record[key_field]] = record
+    updated_data = list(existing_dict.values())
+
+    def apply_delta(bundle):
+        if rows_collapsed:
+            return False
+        # 未合并时前 len(existing_data) 行与原数据行号一一对应：被替换的行原位更新，其余为追加
+        base_length = len(existing_data)
+        replaced = [(position, record) for position, record in enumerate(updated_data[:base_length])
+                    if record is not existing_data[position]]
+        return (bundle.replace_rows(filename, replaced)
+                and bundle.insert_rows(filename, updated_data[base_length:], base_length))
+
+    save_data_incremental(updated_data, filename, len(existing_data), apply_delta)
+    return updated_data
+
+
+def delete_records(data, filename, should_delete):
+    """删除满足条件的记录并增量更新索引，返回删除条数"""
+    kept_data = []
+    deleted = []
+    for position, record in enumerate(data):
+        if should_delete(record):
+            deleted.append((position, record))
+        else:
+            kept_data.append(record)
+
+    save_data_incremental(
+        kept_data, filename, len(data),
+        lambda bundle: bundle.delete_rows(filename, deleted))
+    return len(deleted)
 
 
 def safe_get_value(record, key, default=0):
@@ -664,6 +2940,200 @@ def auto_detect_and_convert_numeric_fields(data):
 
 
 # ========== 页面函数 ==========
+def page_selector(total_count, page_size, key, reset_token=None):
+    """
+    分页页码选择器，返回当前页的 (起始, 结束) 下标
+    reset_token 变化时（例如搜索词改变）自动回到第1页
+    """
+    total_pages = max(1, (total_count + page_size - 1) // page_size)
+    token_key = f"{key}_token"
+    if st.session_state.get(token_key) != reset_token:
+        st.session_state[token_key] = reset_token
+        st.session_state[key] = 1
+    if st.session_state.get(key, 1) > total_pages:
+        st.session_state[key] = total_pages
+
+    if total_pages > 1:
+        page = st.number_input(f"页码 (共 {total_pages} 页)", min_value=1, max_value=total_pages,
+                               step=1, key=key)
+    else:
+        page = 1
+
+    start = (int(page) - 1) * page_size
+    return start, min(start + page_size, total_count)
+
+
+def tab_selector(labels, key):
+    """
+    标签页选择器：外观与 st.tabs 类似，只返回当前选中的标签
+    调用方只渲染选中标签页的内容（st.tabs 每次重跑都会执行全部标签页）
+    """
+    return st.radio("标签页", labels, key=key, horizontal=True, label_visibility="collapsed")
+
+
+PAGE_SIZE_OPTIONS = [50, 100, 200, 500]
+UNSORTED_LABEL = "（原始顺序）"
+CURRENCY_FORMAT = "¥%,.2f"
+PERCENT_FORMAT = "%.1f%%"
+
+
+def number_column_config(currency_columns=(), percent_columns=()):
+    """数值列的显示配置：列保持数值类型，由表格组件按金额/百分比格式显示"""
+    config = {col: st.column_config.NumberColumn(format=CURRENCY_FORMAT) for col in currency_columns}
+    config.update({col: st.column_config.NumberColumn(format=PERCENT_FORMAT) for col in percent_columns})
+    return config
+
+
+def _sorted_positions(df, sort_column, descending, numeric=False):
+    """按单列计算排序后的行位置（只排序该列，不复制整张表）"""
+    column = df[sort_column].reset_index(drop=True)
+    if numeric:
+        column = pd.to_numeric(column, errors="coerce")
+    try:
+        ordered = column.sort_values(ascending=not descending, kind="stable", na_position="last")
+    except TypeError:
+        # 混合类型列（数字与文本并存）退化为按文本排序
+        ordered = column.astype(str).sort_values(ascending=not descending, kind="stable")
+    return ordered.index.to_numpy()
+
+
+def paginated_dataframe(df, key, height=None, currency_columns=(), **dataframe_kwargs):
+    """
+    服务端分页表格：排序与分页在服务端完成，只把当前页发送到浏览器
+    currency_columns 中的列转为数值后按金额格式显示，返回当前页数据
+    """
+    total_count = len(df)
+    currency_columns = [col for col in currency_columns if col in df.columns]
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        sort_column = st.selectbox("排序字段", [UNSORTED_LABEL] + list(df.columns), key=f"{key}_sort")
+    with col2:
+        descending = st.radio("排序方向", ["升序", "降序"], key=f"{key}_order", horizontal=True) == "降序"
+    with col3:
+        page_size = st.selectbox("每页行数", PAGE_SIZE_OPTIONS, index=1, key=f"{key}_size")
+
+    sorting = sort_column != UNSORTED_LABEL and sort_column in df.columns
+    start, end = page_selector(total_count, page_size, key=f"{key}_page",
+                               reset_token=(sort_column, descending, page_size, total_count))
+
+    if sorting:
+        positions = _sorted_positions(df, sort_column, descending, numeric=sort_column in currency_columns)
+        window = df.iloc[positions[start:end]]
+    else:
+        window = df.iloc[start:end]
+
+    if currency_columns:
+        window = window.assign(**{col: pd.to_numeric(window[col], errors="coerce") for col in currency_columns})
+        dataframe_kwargs["column_config"] = {**number_column_config(currency_columns),
+                                             **dataframe_kwargs.get("column_config", {})}
+    if height:
+        dataframe_kwargs["height"] = height
+    st.dataframe(window, use_container_width=True, **dataframe_kwargs)
+    if total_count:
+        st.caption(f"显示第 {start + 1}-{end} 条，共 {total_count} 条")
+    return window
+
+
+EXPORT_CACHE_SIZE = 8
+EXPORT_CHUNK_ROWS = 10000
+EXCEL_MAX_ROWS = 1048576
+EXCEL_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def write_excel_file(sheets, path):
+    """
+    流式写出 Excel（openpyxl write_only 模式）：按块逐行写入，写入过程内存占用恒定
+    sheets: {工作表名: DataFrame}；超过 Excel 行数上限时自动续写到 "名称_2" 等新工作表
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    rows_per_sheet = EXCEL_MAX_ROWS - 1  # 每个工作表保留一行表头
+    for sheet_name, frame in sheets.items():
+        header = [str(col) for col in frame.columns]
+        for part, sheet_start in enumerate(range(0, max(len(frame), 1), rows_per_sheet), start=1):
+            worksheet = workbook.create_sheet(sheet_name if part == 1 else f"{sheet_name}_{part}")
+            worksheet.append(header)
+            sheet_end = min(sheet_start + rows_per_sheet, len(frame))
+            for start in range(sheet_start, sheet_end, EXPORT_CHUNK_ROWS):
+                chunk = frame.iloc[start:min(start + EXPORT_CHUNK_ROWS, sheet_end)].astype(object)
+                for row in chunk.where(chunk.notna(), None).itertuples(index=False, name=None):
+                    worksheet.append(row)
+    workbook.save(path)
+
+
+def _remove_export_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+@st.cache_resource(show_spinner=False)
+def get_export_cache():
+    """导出文件缓存（进程级，有界）：键为 (视图, 筛选条件, 数据集版本)，值为临时文件路径"""
+    return LRUCache(EXPORT_CACHE_SIZE, on_evict=_remove_export_file)
+
+
+def get_excel_export(view, filters, build_sheets):
+    """
+    获取导出文件路径：同一视图、筛选条件和数据集版本只生成一次，文件写在临时目录
+    build_sheets: 无参函数，返回 {工作表名: DataFrame}，仅在缓存未命中时调用
+    """
+    export_key = (view, filters, get_dataset_version())
+    cache = get_export_cache()
+
+    def export():
+        fd, path = tempfile.mkstemp(prefix="export_", suffix=".xlsx")
+        os.close(fd)
+        try:
+            write_excel_file(build_sheets(), path)
+        except Exception:
+            _remove_export_file(path)
+            raise
+        return path
+
+    path = cache.get_or_compute(export_key, export)
+    if not os.path.exists(path):  # 临时文件已被清理，重新生成
+        cache.discard(export_key)
+        path = cache.get_or_compute(export_key, export)
+    return path
+
+
+def excel_download_button(label, view, filters, build_sheets, file_prefix, **download_kwargs):
+    """
+    下载按钮：工作簿流式写入缓存的临时文件（写入过程内存占用恒定）
+    注意 st.download_button 每次页面重跑都会把整个文件读入内存交给媒体管理器，下载环节并非恒定内存
+    """
+    path = get_excel_export(view, filters, build_sheets)
+    with open(path, "rb") as export_file:
+        return st.download_button(
+            label=label,
+            data=export_file,
+            file_name=f"{file_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+            mime=EXCEL_MIME,
+            **download_kwargs
+        )
+
+
+def excel_export_button(label, view, filters, build_sheets, file_prefix, key,
+                        download_label="下载Excel文件", **button_kwargs):
+    """
+    导出按钮：点击后生成（或复用缓存的）Excel，并持续显示下载按钮
+    筛选条件或数据变化后需重新点击导出
+    """
+    export_key = (view, filters, get_dataset_version())
+    state_key = f"{key}_prepared"
+    if st.button(label, key=key, **button_kwargs):
+        st.session_state[state_key] = export_key
+    if st.session_state.get(state_key) != export_key:
+        return
+
+    try:
+        excel_download_button(download_label, view, filters, build_sheets, file_prefix, key=f"{key}_download")
+    except Exception as e:
+        st.error(f"导出失败: {str(e)}")
+
 
 def data_import_page():
     """数据导入页面 - 增加删除数据功能"""
@@ -699,13 +3169,13 @@ def data_import_page():
                 # 添加搜索功能
                 search_term = st.text_input("🔍 搜索财务数据（按资产编号或名称）", key="search_financial_current")
                 if search_term:
-                    mask = df_current.astype(str).apply(
-                        lambda x: x.str.contains(search_term, case=False, na=False)).any(axis=1)
-                    df_filtered = df_current[mask]
+                    search_index = get_search_index(FINANCIAL_DATA_FILE, get_data_version(FINANCIAL_DATA_FILE),
+                                                    df_current)
+                    df_filtered = search_frame(df_current, search_index, search_term)
                     st.write(f"搜索结果：{len(df_filtered)} 条记录")
-                    st.dataframe(df_filtered, use_container_width=True, height=400)
                 else:
-                    st.dataframe(df_current, use_container_width=True, height=400)
+                    df_filtered = df_current
+                paginated_dataframe(df_filtered, key="financial_current_table", height=400)
 
                 # 数据统计
                 col1, col2, col3 = st.columns(3)
@@ -806,37 +3276,22 @@ def data_import_page():
 
                         if st.button("🗑️ 执行条件删除", key="financial_condition_delete"):
                             if custom_value:
-                                original_count = len(current_financial)
-                                filtered_data = [
-                                    record for record in current_financial
-                                    if str(record.get(custom_field, "")) != custom_value
-                                ]
-                                save_data(filtered_data, FINANCIAL_DATA_FILE)
-                                deleted_count = original_count - len(filtered_data)
+                                deleted_count = delete_records(
+                                    current_financial, FINANCIAL_DATA_FILE,
+                                    lambda record: str(record.get(custom_field, "")) == custom_value)
                                 st.success(f"✅ 已删除 {deleted_count} 条记录")
                                 st.rerun()
 
                     elif delete_condition != "选择条件..." and st.button("🗑️ 执行条件删除",
                                                                          key="financial_preset_delete"):
-                        original_count = len(current_financial)
                         if delete_condition == "资产价值为0":
-                            filtered_data = [
-                                record for record in current_financial
-                                if safe_convert_to_float(record.get("资产价值", 0)) != 0
-                            ]
+                            should_delete = lambda record: safe_convert_to_float(record.get("资产价值", 0)) == 0
                         elif delete_condition == "资产名称为空":
-                            filtered_data = [
-                                record for record in current_financial
-                                if str(record.get("资产名称", "")).strip() != ""
-                            ]
+                            should_delete = lambda record: str(record.get("资产名称", "")).strip() == ""
                         elif delete_condition == "部门名称为空":
-                            filtered_data = [
-                                record for record in current_financial
-                                if str(record.get("部门名称", "")).strip() != ""
-                            ]
+                            should_delete = lambda record: str(record.get("部门名称", "")).strip() == ""
 
-                        save_data(filtered_data, FINANCIAL_DATA_FILE)
-                        deleted_count = original_count - len(filtered_data)
+                        deleted_count = delete_records(current_financial, FINANCIAL_DATA_FILE, should_delete)
                         st.success(f"✅ 已删除 {deleted_count} 条记录")
                         st.rerun()
 
@@ -853,13 +3308,9 @@ def data_import_page():
                     if st.button("🗑️ 删除指定编号", key="financial_code_delete"):
                         if delete_codes.strip():
                             codes_to_delete = [code.strip() for code in delete_codes.split('\n') if code.strip()]
-                            original_count = len(current_financial)
-                            filtered_data = [
-                                record for record in current_financial
-                                if record.get("资产编号+序号", "") not in codes_to_delete
-                            ]
-                            save_data(filtered_data, FINANCIAL_DATA_FILE)
-                            deleted_count = original_count - len(filtered_data)
+                            deleted_count = delete_records(
+                                current_financial, FINANCIAL_DATA_FILE,
+                                lambda record: record.get("资产编号+序号", "") in codes_to_delete)
                             st.success(f"✅ 已删除 {deleted_count} 条记录")
                             st.rerun()
 
@@ -923,13 +3374,13 @@ def data_import_page():
 
                 search_upload = st.text_input("🔍 搜索上传数据", key="search_financial_upload")
                 if search_upload:
-                    mask = financial_df.astype(str).apply(
-                        lambda x: x.str.contains(search_upload, case=False, na=False)).any(axis=1)
-                    df_filtered = financial_df[mask]
+                    search_index = get_search_index("financial_upload", uploaded_file_signature(financial_file),
+                                                    financial_df)
+                    df_filtered = search_frame(financial_df, search_index, search_upload)
                     st.write(f"搜索结果：{len(df_filtered)} 条记录")
-                    st.dataframe(df_filtered, use_container_width=True, height=500)
                 else:
-                    st.dataframe(financial_df, use_container_width=True, height=500)
+                    df_filtered = financial_df
+                paginated_dataframe(df_filtered, key="financial_upload_table", height=500)
 
                 # 数据质量检查
                 st.subheader("🔍 数据质量检查")
@@ -1020,20 +3471,13 @@ def data_import_page():
 
                         elif import_mode == "追加导入（保留原数据）":
                             existing_data = load_data(FINANCIAL_DATA_FILE)
-                            combined_data = existing_data + processed_data
-                            save_data(combined_data, FINANCIAL_DATA_FILE)
+                            combined_data = append_records(existing_data, processed_data, FINANCIAL_DATA_FILE)
                             st.success(f"✅ 追加导入 {len(processed_data)} 条记录，总计 {len(combined_data)} 条")
 
                         elif import_mode == "更新导入（按编号更新）":
                             existing_data = load_data(FINANCIAL_DATA_FILE)
-                            existing_dict = {record.get("资产编号+序号"): record for record in existing_data}
-
                             # 更新或添加新记录
-                            for record in processed_data:
-                                existing_dict[record[("资产编号+序号")]] = record
-
-                            updated_data = list(existing_dict.values())
-                            save_data(updated_data, FINANCIAL_DATA_FILE)
+                            updated_data = upsert_records(existing_data, processed_data, FINANCIAL_DATA_FILE, "资产编号+序号")
                             st.success(f"✅ 更新导入完成，总计 {len(updated_data)} 条记录")
 
                         st.balloons()
@@ -1041,17 +3485,9 @@ def data_import_page():
                         st.rerun()
 
                 with col2:
-                    if st.button("📥 导出当前数据", use_container_width=True):
-                        output = BytesIO()
-                        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                            financial_df.to_excel(writer, index=False, sheet_name='财务数据')
-
-                        st.download_button(
-                            label="⬇️ 下载Excel文件",
-                            data=output.getvalue(),
-                            file_name=f"财务数据_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
+                    excel_export_button("📥 导出当前数据", "财务数据上传", uploaded_file_signature(financial_file),
+                                        lambda: {'财务数据': financial_df}, "财务数据", key="export_financial_upload",
+                                        download_label="⬇️ 下载Excel文件", use_container_width=True)
 
                 with col3:
                     if st.button("🔄 重新上传", use_container_width=True):
@@ -1075,13 +3511,13 @@ def data_import_page():
 
                 search_term = st.text_input("🔍 搜索实物数据（按编码或名称）", key="search_physical_current")
                 if search_term:
-                    mask = df_current.astype(str).apply(
-                        lambda x: x.str.contains(search_term, case=False, na=False)).any(axis=1)
-                    df_filtered = df_current[mask]
+                    search_index = get_search_index(PHYSICAL_DATA_FILE, get_data_version(PHYSICAL_DATA_FILE),
+                                                    df_current)
+                    df_filtered = search_frame(df_current, search_index, search_term)
                     st.write(f"搜索结果：{len(df_filtered)} 条记录")
-                    st.dataframe(df_filtered, use_container_width=True, height=400)
                 else:
-                    st.dataframe(df_current, use_container_width=True, height=400)
+                    df_filtered = df_current
+                paginated_dataframe(df_filtered, key="physical_current_table", height=400)
 
                 # 数据统计
                 col1, col2, col3 = st.columns(3)
@@ -1092,77 +3528,35 @@ def data_import_page():
                     # ✅ 修复：使用固定资产原值字段计算总价值，支持核算筛选
                     if "固定资产原值" in df_current.columns:
                         try:
-                            # 🆕 新增：检查是否有核算字段
-                            has_accounting_field = "是否核算" in df_current.columns
-
-                            # 原始计算（支持核算筛选）
-                            total_value_raw = 0.0
-                            valid_count_raw = 0
-                            error_count = 0
-                            non_accounting_count = 0  # 非核算资产数量
-
-                            for _, row in df_current.iterrows():
-                                try:
-                                    # 🆕 检查是否核算
-                                    if has_accounting_field:
-                                        accounting_status = str(row.get("是否核算", "")).strip()
-                                        if accounting_status not in ["是", "Y", "y", "Yes", "YES", "1", "True", "true"]:
-                                            non_accounting_count += 1
-                                            continue  # 跳过非核算资产
-
-                                    value = safe_convert_to_float(row.get("固定资产原值", 0))
-                                    if value > 0:
-                                        total_value_raw += value
-                                        valid_count_raw += 1
-                                    elif value == 0:
-                                        pass  # 价值为0的记录
-                                    else:
-                                        error_count += 1
-                                except:
-                                    error_count += 1
-
-                            # 去重计算（支持核算筛选）
-                            df_deduped = df_current.drop_duplicates(subset=['固定资产编码'], keep='first')
-                            total_value_dedup = 0.0
-                            valid_count_dedup = 0
-                            non_accounting_dedup_count = 0
-
-                            for _, row in df_deduped.iterrows():
-                                try:
-                                    # 🆕 检查是否核算
-                                    if has_accounting_field:
-                                        accounting_status = str(row.get("是否核算", "")).strip()
-                                        if accounting_status not in ["是", "Y", "y", "Yes", "YES", "1", "True", "true"]:
-                                            non_accounting_dedup_count += 1
-                                            continue  # 跳过非核算资产
-
-                                    value = safe_convert_to_float(row.get("固定资产原值", 0))
-                                    if value > 0:
-                                        total_value_dedup += value
-                                        valid_count_dedup += 1
-                                except:
-                                    pass
+                            # 核算筛选 + 去重估值（向量化，每个数据集版本计算一次）
+                            valuation = get_physical_valuation(current_physical)
+                            has_accounting_field = valuation["has_accounting_field"]
+                            duplicate_count = valuation["duplicate_count"]
+                            error_count = valuation["error_count"]
 
                             # 显示结果
-                            duplicate_count = len(df_current) - len(df_deduped)
-
                             if duplicate_count > 0:
-                                st.metric("固定资产原值总计", f"¥{total_value_dedup:,.2f}")
+                                st.metric("固定资产原值总计", f"¥{valuation['dedup_total']:,.2f}")
                                 caption_text = f"去重后金额（删除{duplicate_count}条重复）"
-                                if has_accounting_field and non_accounting_dedup_count > 0:
-                                    caption_text += f" | 已排除{non_accounting_dedup_count}条非核算"
+                                if has_accounting_field and valuation["dedup_non_accounting"] > 0:
+                                    caption_text += f" | 已排除{valuation['dedup_non_accounting']}条非核算"
                                 st.caption(caption_text)
                             else:
-                                st.metric("固定资产原值总计", f"¥{total_value_raw:,.2f}")
+                                st.metric("固定资产原值总计", f"¥{valuation['raw_total']:,.2f}")
                                 caption_text = "无重复记录"
-                                if has_accounting_field and non_accounting_count > 0:
-                                    caption_text += f" | 已排除{non_accounting_count}条非核算"
+                                if has_accounting_field and valuation["raw_non_accounting"] > 0:
+                                    caption_text += f" | 已排除{valuation['raw_non_accounting']}条非核算"
                                 st.caption(caption_text)
 
                             # 显示处理统计
-                            effective_valid_count = valid_count_dedup if duplicate_count > 0 else valid_count_raw
-                            effective_total_count = len(df_deduped) if duplicate_count > 0 else len(df_current)
-                            effective_non_accounting = non_accounting_dedup_count if duplicate_count > 0 else non_accounting_count
+                            if duplicate_count > 0:
+                                effective_valid_count = valuation["dedup_valid"]
+                                effective_total_count = valuation["deduped_count"]
+                                effective_non_accounting = valuation["dedup_non_accounting"]
+                            else:
+                                effective_valid_count = valuation["raw_valid"]
+                                effective_total_count = valuation["record_count"]
+                                effective_non_accounting = valuation["raw_non_accounting"]
 
                             if effective_valid_count > 0:
                                 success_rate = (effective_valid_count / (
@@ -1179,41 +3573,6 @@ def data_import_page():
                             else:
                                 st.error("❌ 所有固定资产原值字段都无法转换为有效数字")
 
-                            # 去重计算
-                            df_deduped = df_current.drop_duplicates(subset=['固定资产编码'], keep='first')
-                            total_value_dedup = 0.0
-                            valid_count_dedup = 0
-
-                            for _, row in df_deduped.iterrows():
-                                try:
-                                    value = safe_convert_to_float(row.get("固定资产原值", 0))
-                                    if value > 0:
-                                        total_value_dedup += value
-                                        valid_count_dedup += 1
-                                except:
-                                    pass
-
-                            # 显示结果
-                            duplicate_count = len(df_current) - len(df_deduped)
-
-                            if duplicate_count > 0:
-                                st.metric("固定资产原值总计", f"¥{total_value_dedup:,.2f}")
-                                st.caption(f"去重后金额（删除{duplicate_count}条重复）")
-                            else:
-                                st.metric("固定资产原值总计", f"¥{total_value_raw:,.2f}")
-                                st.caption("无重复记录")
-
-                            # 显示处理统计
-                            if valid_count_raw > 0:
-                                success_rate = (valid_count_raw / len(df_current)) * 100
-                                st.success(
-                                    f"✅ 成功处理 {valid_count_raw}/{len(df_current)} 条记录 ({success_rate:.1f}%)")
-
-                                if error_count > 0:
-                                    st.warning(f"⚠️ {error_count} 条记录的固定资产原值字段无法转换为数字")
-                            else:
-                                st.error("❌ 所有固定资产原值字段都无法转换为有效数字")
-
                                 # 显示调试信息
                                 with st.expander("🔧 固定资产原值字段问题分析"):
                                     st.write("**前5条记录的固定资产原值字段内容：**")
@@ -1286,37 +3645,22 @@ def data_import_page():
 
                         if st.button("🗑️ 执行条件删除", key="physical_condition_delete"):
                             if custom_value:
-                                original_count = len(current_physical)
-                                filtered_data = [
-                                    record for record in current_physical
-                                    if str(record.get(custom_field, "")) != custom_value
-                                ]
-                                save_data(filtered_data, PHYSICAL_DATA_FILE)
-                                deleted_count = original_count - len(filtered_data)
+                                deleted_count = delete_records(
+                                    current_physical, PHYSICAL_DATA_FILE,
+                                    lambda record: str(record.get(custom_field, "")) == custom_value)
                                 st.success(f"✅ 已删除 {deleted_count} 条记录")
                                 st.rerun()
 
                     elif delete_condition != "选择条件..." and st.button("🗑️ 执行条件删除",
                                                                          key="physical_preset_delete"):
-                        original_count = len(current_physical)
                         if delete_condition == "固定资产原值为0":
-                            filtered_data = [
-                                record for record in current_physical
-                                if safe_convert_to_float(record.get("固定资产原值", 0)) != 0
-                            ]
+                            should_delete = lambda record: safe_convert_to_float(record.get("固定资产原值", 0)) == 0
                         elif delete_condition == "固定资产名称为空":
-                            filtered_data = [
-                                record for record in current_physical
-                                if str(record.get("固定资产名称", "")).strip() != ""
-                            ]
+                            should_delete = lambda record: str(record.get("固定资产名称", "")).strip() == ""
                         elif delete_condition == "存放部门为空":
-                            filtered_data = [
-                                record for record in current_physical
-                                if str(record.get("存放部门", "")).strip() != ""
-                            ]
+                            should_delete = lambda record: str(record.get("存放部门", "")).strip() == ""
 
-                        save_data(filtered_data, PHYSICAL_DATA_FILE)
-                        deleted_count = original_count - len(filtered_data)
+                        deleted_count = delete_records(current_physical, PHYSICAL_DATA_FILE, should_delete)
                         st.success(f"✅ 已删除 {deleted_count} 条记录")
                         st.rerun()
 
@@ -1331,13 +3675,9 @@ def data_import_page():
                     if st.button("🗑️ 删除指定编码", key="physical_code_delete"):
                         if delete_codes.strip():
                             codes_to_delete = [code.strip() for code in delete_codes.split('\n') if code.strip()]
-                            original_count = len(current_physical)
-                            filtered_data = [
-                                record for record in current_physical
-                                if record.get("固定资产编码", "") not in codes_to_delete
-                            ]
-                            save_data(filtered_data, PHYSICAL_DATA_FILE)
-                            deleted_count = original_count - len(filtered_data)
+                            deleted_count = delete_records(
+                                current_physical, PHYSICAL_DATA_FILE,
+                                lambda record: record.get("固定资产编码", "") in codes_to_delete)
                             st.success(f"✅ 已删除 {deleted_count} 条记录")
                             st.rerun()
 
@@ -1385,13 +3725,13 @@ def data_import_page():
 
                 search_upload = st.text_input("🔍 搜索上传数据", key="search_physical_upload")
                 if search_upload:
-                    mask = physical_df.astype(str).apply(
-                        lambda x: x.str.contains(search_upload, case=False, na=False)).any(axis=1)
-                    df_filtered = physical_df[mask]
+                    search_index = get_search_index("physical_upload", uploaded_file_signature(physical_file),
+                                                    physical_df)
+                    df_filtered = search_frame(physical_df, search_index, search_upload)
                     st.write(f"搜索结果：{len(df_filtered)} 条记录")
-                    st.dataframe(df_filtered, use_container_width=True, height=500)
                 else:
-                    st.dataframe(physical_df, use_container_width=True, height=500)
+                    df_filtered = physical_df
+                paginated_dataframe(df_filtered, key="physical_upload_table", height=500)
 
                 # 数据质量检查
                 st.subheader("🔍 数据质量检查")
@@ -1491,20 +3831,13 @@ def data_import_page():
 
                         elif import_mode == "追加导入（保留原数据）":
                             existing_data = load_data(PHYSICAL_DATA_FILE)
-                            combined_data = existing_data + processed_data
-                            save_data(combined_data, PHYSICAL_DATA_FILE)
+                            combined_data = append_records(existing_data, processed_data, PHYSICAL_DATA_FILE)
                             st.success(f"✅ 追加导入 {len(processed_data)} 条记录，总计 {len(combined_data)} 条")
 
                         elif import_mode == "更新导入（按编码更新）":
                             existing_data = load_data(PHYSICAL_DATA_FILE)
-                            existing_dict = {record.get("固定资产编码"): record for record in existing_data}
-
                             # 更新或添加新记录
-                            for record in processed_data:
-                                existing_dict[record["固定资产编码"]] = record
-
-                            updated_data = list(existing_dict.values())
-                            save_data(updated_data, PHYSICAL_DATA_FILE)
+                            updated_data = upsert_records(existing_data, processed_data, PHYSICAL_DATA_FILE, "固定资产编码")
                             st.success(f"✅ 更新导入完成，总计 {len(updated_data)} 条记录")
 
                         st.balloons()
@@ -1512,17 +3845,9 @@ def data_import_page():
                         st.rerun()
 
                 with col2:
-                    if st.button("📥 导出当前数据", use_container_width=True):
-                        output = BytesIO()
-                        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                            physical_df.to_excel(writer, index=False, sheet_name='实物数据')
-
-                        st.download_button(
-                            label="⬇️ 下载Excel文件",
-                            data=output.getvalue(),
-                            file_name=f"实物数据_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
+                    excel_export_button("📥 导出当前数据", "实物数据上传", uploaded_file_signature(physical_file),
+                                        lambda: {'实物数据': physical_df}, "实物数据", key="export_physical_upload",
+                                        download_label="⬇️ 下载Excel文件", use_container_width=True)
 
                 with col3:
                     if st.button("🔄 重新上传", use_container_width=True):
@@ -1545,13 +3870,13 @@ def data_import_page():
 
                 search_mapping = st.text_input("🔍 搜索映射关系", key="search_mapping_current")
                 if search_mapping:
-                    mask = df_mapping.astype(str).apply(
-                        lambda x: x.str.contains(search_mapping, case=False, na=False)).any(axis=1)
-                    df_filtered = df_mapping[mask]
+                    search_index = get_search_index(MAPPING_DATA_FILE, get_data_version(MAPPING_DATA_FILE),
+                                                    df_mapping)
+                    df_filtered = search_frame(df_mapping, search_index, search_mapping)
                     st.write(f"搜索结果：{len(df_filtered)} 条记录")
-                    st.dataframe(df_filtered, use_container_width=True, height=400)
                 else:
-                    st.dataframe(df_mapping, use_container_width=True, height=400)
+                    df_filtered = df_mapping
+                paginated_dataframe(df_filtered, key="mapping_current_table", height=400)
 
             # 🗑️ 映射关系删除功能
             st.markdown("---")
@@ -1573,32 +3898,20 @@ def data_import_page():
 
                         if st.button("🗑️ 执行条件删除", key="mapping_condition_delete"):
                             if custom_value:
-                                original_count = len(current_mapping)
-                                filtered_data = [
-                                    record for record in current_mapping
-                                    if str(record.get(custom_field, "")) != custom_value
-                                ]
-                                save_data(filtered_data, MAPPING_DATA_FILE)
-                                deleted_count = original_count - len(filtered_data)
+                                deleted_count = delete_records(
+                                    current_mapping, MAPPING_DATA_FILE,
+                                    lambda record: str(record.get(custom_field, "")) == custom_value)
                                 st.success(f"✅ 已删除 {deleted_count} 条映射关系")
                                 st.rerun()
 
                     elif delete_condition != "选择条件..." and st.button("🗑️ 执行条件删除",
                                                                          key="mapping_preset_delete"):
-                        original_count = len(current_mapping)
                         if delete_condition == "财务编号为空":
-                            filtered_data = [
-                                record for record in current_mapping
-                                if str(record.get("资产编号+序号", "")).strip() != ""
-                            ]
+                            should_delete = lambda record: str(record.get("资产编号+序号", "")).strip() == ""
                         elif delete_condition == "实物编码为空":
-                            filtered_data = [
-                                record for record in current_mapping
-                                if str(record.get("固定资产编码", "")).strip() != ""
-                            ]
+                            should_delete = lambda record: str(record.get("固定资产编码", "")).strip() == ""
 
-                        save_data(filtered_data, MAPPING_DATA_FILE)
-                        deleted_count = original_count - len(filtered_data)
+                        deleted_count = delete_records(current_mapping, MAPPING_DATA_FILE, should_delete)
                         st.success(f"✅ 已删除 {deleted_count} 条映射关系")
                         st.rerun()
 
@@ -1619,21 +3932,12 @@ def data_import_page():
                     if st.button("🗑️ 删除相关映射", key="mapping_code_delete"):
                         if delete_codes.strip():
                             codes_to_delete = [code.strip() for code in delete_codes.split('\n') if code.strip()]
-                            original_count = len(current_mapping)
-
                             if delete_type == "按财务编号":
-                                filtered_data = [
-                                    record for record in current_mapping
-                                    if record.get("资产编号+序号", "") not in codes_to_delete
-                                ]
+                                should_delete = lambda record: record.get("资产编号+序号", "") in codes_to_delete
                             else:
-                                filtered_data = [
-                                    record for record in current_mapping
-                                    if record.get("固定资产编码", "") not in codes_to_delete
-                                ]
+                                should_delete = lambda record: record.get("固定资产编码", "") in codes_to_delete
 
-                            save_data(filtered_data, MAPPING_DATA_FILE)
-                            deleted_count = original_count - len(filtered_data)
+                            deleted_count = delete_records(current_mapping, MAPPING_DATA_FILE, should_delete)
                             st.success(f"✅ 已删除 {deleted_count} 条映射关系")
                             st.rerun()
 
@@ -1678,7 +3982,7 @@ def data_import_page():
                     st.stop()
 
                 st.subheader("📊 映射数据预览")
-                st.dataframe(mapping_df, use_container_width=True, height=400)
+                paginated_dataframe(mapping_df, key="mapping_upload_table", height=400)
 
                 # 导入选项
                 st.markdown("---")
@@ -1715,8 +4019,7 @@ def data_import_page():
 
                         elif import_mode == "追加导入（保留原数据）":
                             existing_data = load_data(MAPPING_DATA_FILE)
-                            combined_data = existing_data + processed_data
-                            save_data(combined_data, MAPPING_DATA_FILE)
+                            combined_data = append_records(existing_data, processed_data, MAPPING_DATA_FILE)
                             st.success(f"✅ 追加导入 {len(processed_data)} 条记录，总计 {len(combined_data)} 条")
 
                         st.balloons()
@@ -1724,17 +4027,9 @@ def data_import_page():
                         st.rerun()
 
                 with col2:
-                    if st.button("📥 导出当前数据", use_container_width=True):
-                        output = BytesIO()
-                        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                            mapping_df.to_excel(writer, index=False, sheet_name='映射数据')
-
-                        st.download_button(
-                            label="⬇️ 下载Excel文件",
-                            data=output.getvalue(),
-                            file_name=f"映射数据_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
+                    excel_export_button("📥 导出当前数据", "映射数据上传", uploaded_file_signature(mapping_file),
+                                        lambda: {'映射数据': mapping_df}, "映射数据", key="export_mapping_upload",
+                                        download_label="⬇️ 下载Excel文件", use_container_width=True)
 
                 with col3:
                     if st.button("🔄 重新上传", use_container_width=True):
@@ -1786,30 +4081,22 @@ def data_import_page():
 
         with col1:
             if st.button("📥 创建完整数据备份", use_container_width=True):
-                try:
-                    backup_data = {
-                        "financial_data": financial_data,
-                        "physical_data": physical_data,
-                        "mapping_data": mapping_data,
-                        "backup_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    }
+                st.session_state["backup_prepared"] = get_dataset_version()
 
-                    # 创建Excel备份文件
-                    output = BytesIO()
-                    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            # 备份文件按数据集版本缓存，数据未变时重复备份直接复用
+            if st.session_state.get("backup_prepared") == get_dataset_version():
+                try:
+                    def backup_sheets():
+                        sheets = {}
                         if financial_data:
-                            pd.DataFrame(financial_data).to_excel(writer, index=False, sheet_name='财务数据')
+                            sheets['财务数据'] = pd.DataFrame(financial_data)
                         if physical_data:
-                            pd.DataFrame(physical_data).to_excel(writer, index=False, sheet_name='实物数据')
+                            sheets['实物数据'] = pd.DataFrame(physical_data)
                         if mapping_data:
-                            pd.DataFrame(mapping_data).to_excel(writer, index=False, sheet_name='映射数据')
+                            sheets['映射数据'] = pd.DataFrame(mapping_data)
+                        return sheets
 
-                    st.download_button(
-                        label="⬇️ 下载完整备份文件",
-                        data=output.getvalue(),
-                        file_name=f"完整数据备份_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
+                    excel_download_button("⬇️ 下载完整备份文件", "完整数据备份", None, backup_sheets, "完整数据备份")
                     st.success("✅ 备份文件已生成，请点击下载")
 
                 except Exception as e:
@@ -2051,10 +4338,12 @@ def mapping_query_page():
             for i, record in enumerate(physical_data[:3]):
                 st.write(f"记录 {i + 1}:")
                 st.json(record)
-    # 创建索引以提高查询效率
-    financial_index = create_data_index(financial_data, "资产编号+序号")
-    physical_index = create_data_index(physical_data, "固定资产编码")
-    financial_to_physical_mapping, physical_to_financial_mapping = create_mapping_index(mapping_data)
+    # 加载预计算索引包以提高查询效率
+    index_bundle = get_index_bundle(financial_data, physical_data, mapping_data)
+    financial_index = index_bundle.financial_index(financial_data)
+    physical_index = index_bundle.physical_index(physical_data)
+    financial_to_physical_mapping = index_bundle.mapping.financial_to_physical
+    physical_to_financial_mapping = index_bundle.mapping.physical_to_financial
 
     # 显示映射统计信息
     st.info(
@@ -2069,59 +4358,55 @@ def mapping_query_page():
     if query_type == "按资产编号选择查询":
         st.subheader("📋 资产编号选择查询")
 
-        # 🔍 提取所有财务资产的资产编号（去除+序号部分）
-        asset_numbers = set()
-        asset_number_to_full_codes = {}  # 资产编号到完整编号+序号的映射
+        # 🔍 资产编号分组（去除+序号部分）及排序列表已在索引包中预计算
+        asset_number_to_full_codes = index_bundle.asset_numbers
+        sorted_asset_numbers = asset_number_to_full_codes.sorted_numbers
 
-        for record in financial_data:
-            full_code = str(record.get('资产编号+序号', '')).strip()
-            if full_code:
-                # 尝试提取资产编号部分（去除序号）
-                asset_number = full_code
+        if not sorted_asset_numbers:
+            st.warning("⚠️ 未找到可用的资产编号")
+            return
 
-                # 🔧 智能提取资产编号（去除序号部分）
-                import re
+        # 🔍 搜索功能（服务端筛选，每页只向页面发送 ASSET_PICKER_PAGE_SIZE 个候选）
+        search_filter = st.text_input(
+            f"🔍 搜索资产编号 (共 {len(sorted_asset_numbers)} 个，可输入部分编号进行筛选)",
+            placeholder="输入编号关键词进行快速筛选...",
+            key="asset_number_search"
+        )
 
-                # 方法1：如果包含+号，取+号前的部分
-                if '+' in full_code:
-                    asset_number = full_code.split('+')[0].strip()
-                # 方法2：如果包含-号，取-号前的部分
-                elif '-' in full_code:
-                    asset_number = full_code.split('-')[0].strip()
-                # 方法3：如果包含_号，取_号前的部分
-                elif '_' in full_code:
-                    asset_number = full_code.split('_')[0].strip()
-                # 方法4：使用正则表达式，提取字母+数字的主要部分
-                else:
-                    # 匹配模式：字母开头，后跟数字，可能有序号
-                    match = re.match(r'^([A-Za-z]+\d+)', full_code)
-                    if match:
-                        asset_number = match.group(1)
-                    else:
-                        # 如果无法智能提取，使用原始编号
-                        asset_number = full_code
+        # 搜索词变化时回到第1页
+        if st.session_state.get("asset_number_search_last") != search_filter:
+            st.session_state["asset_number_search_last"] = search_filter
+            st.session_state["asset_number_page"] = 1
 
-                asset_numbers.add(asset_number)
+        _, match_count = asset_number_to_full_codes.search_page(search_filter, 1)
+        if match_count == 0:
+            st.warning(f"⚠️ 没有找到包含 '{search_filter}' 的资产编号")
+            return
 
-                # 建立资产编号到完整编号的映射
-                if asset_number not in asset_number_to_full_codes:
-                    asset_number_to_full_codes[asset_number] = []
-                asset_number_to_full_codes[asset_number].append(full_code)
+        total_pages = (match_count + ASSET_PICKER_PAGE_SIZE - 1) // ASSET_PICKER_PAGE_SIZE
+        if st.session_state.get("asset_number_page", 1) > total_pages:
+            st.session_state["asset_number_page"] = total_pages
+        if search_filter:
+            st.info(f"🎯 找到 {match_count} 个匹配的资产编号")
 
-        # 排序资产编号列表
-        sorted_asset_numbers = sorted(list(asset_numbers))
+        # 🎯 资产编号选择器
+        col1, col2, col3 = st.columns([2, 1, 1])
 
-        if not sorted_asset_numbers:
-            st.warning("⚠️ 未找到可用的资产编号")
-            return
+        with col3:
+            page = st.number_input(
+                f"页码 (共 {total_pages} 页)",
+                min_value=1,
+                max_value=total_pages,
+                step=1,
+                key="asset_number_page"
+            )
 
-        # 🎯 资产编号选择器
-        col1, col2 = st.columns([2, 1])
+        page_asset_numbers, _ = asset_number_to_full_codes.search_page(search_filter, int(page))
 
         with col1:
             selected_asset_number = st.selectbox(
-                f"选择资产编号 (共 {len(sorted_asset_numbers)} 个)",
-                ["请选择资产编号..."] + sorted_asset_numbers,
+                f"选择资产编号 (第 {int(page)}/{total_pages} 页)",
+                ["请选择资产编号..."] + page_asset_numbers,
                 key="asset_number_selector"
             )
 
@@ -2131,33 +4416,6 @@ def mapping_query_page():
                 related_count = len(asset_number_to_full_codes.get(selected_asset_number, []))
                 st.metric("相关资产数量", f"{related_count} 条")
 
-        # 🔍 搜索功能
-        search_filter = st.text_input(
-            "🔍 搜索资产编号 (可输入部分编号进行筛选)",
-            placeholder="输入编号关键词进行快速筛选...",
-            key="asset_number_search"
-        )
-
-        # 如果有搜索条件，过滤资产编号列表
-        if search_filter:
-            filtered_asset_numbers = [num for num in sorted_asset_numbers
-                                      if search_filter.lower() in num.lower()]
-
-            if filtered_asset_numbers:
-                st.info(f"🎯 找到 {len(filtered_asset_numbers)} 个匹配的资产编号")
-
-                # 显示筛选后的选择器
-                selected_asset_number_filtered = st.selectbox(
-                    "筛选结果中选择:",
-                    ["请选择..."] + filtered_asset_numbers,
-                    key="filtered_asset_selector"
-                )
-
-                if selected_asset_number_filtered != "请选择...":
-                    selected_asset_number = selected_asset_number_filtered
-            else:
-                st.warning(f"⚠️ 没有找到包含 '{search_filter}' 的资产编号")
-
         # 🔍 执行查询
         if selected_asset_number != "请选择资产编号..." and st.button("🔍 查询选定资产编号", type="primary"):
             # 获取该资产编号下的所有完整编号
@@ -2307,10 +4565,19 @@ def mapping_query_page():
 
         if st.button("🔍 查询财务资产"):
             if financial_code:
-                # 查找财务资产记录
-                financial_record = financial_index.get(str(financial_code))
+                # 查找财务资产记录及对应实物资产（结果按编号+数据集版本缓存）
+                lookup = lookup_reconciliation(str(financial_code), True, index_bundle, financial_data, physical_data)
+
+                if lookup:
+                    financial_record = lookup["record"]
+
+                    # 同一编号存在多条财务记录时提示
+                    duplicate_records = lookup["duplicate_records"]
+                    if duplicate_records:
+                        st.warning(f"⚠️ 该资产编号+序号存在 {len(duplicate_records)} 条重复记录，以下显示最后一条")
+                        with st.expander("查看全部重复记录"):
+                            st.dataframe(pd.DataFrame(duplicate_records), use_container_width=True)
 
-                if financial_record:
                     # 显示财务资产信息
                     with st.expander("📊 财务资产详情", expanded=True):
                         col1, col2 = st.columns(2)
@@ -2319,24 +4586,16 @@ def mapping_query_page():
                             st.info(f"**资产名称**: {financial_record.get('资产名称', '')}")
                             st.info(f"**资产分类**: {financial_record.get('资产分类', '')}")
                         with col2:
-                            financial_value = safe_get_value(financial_record, "资产价值")
+                            financial_value = lookup["value"]
                             st.info(f"**资产价值**: ¥{financial_value:,.2f}")
                             st.info(f"**所属部门**: {financial_record.get('部门名称', '')}")
                             st.info(f"**保管人**: {financial_record.get('保管人', '')}")
 
-                    # 查找对应的实物资产（支持多对多）
-                    physical_codes = financial_to_physical_mapping.get(str(financial_code), [])
-
-                    if physical_codes:
-                        st.success(f"✅ 找到 {len(physical_codes)} 个对应的实物资产")
-
-                        # 用于计算总价值
-                        total_physical_value = 0
-                        valid_physical_count = 0
-
-                        for i, physical_code in enumerate(physical_codes, 1):
-                            physical_record = physical_index.get(physical_code)
+                    # 对应的实物资产（支持多对多）
+                    if lookup["counterparts"]:
+                        st.success(f"✅ 找到 {len(lookup['counterparts'])} 个对应的实物资产")
 
+                        for i, (physical_code, physical_record, physical_value) in enumerate(lookup["counterparts"], 1):
                             if physical_record:
                                 # 显示实物资产信息
                                 with st.expander(f"📋 实物资产详情 #{i} - {physical_code}", expanded=True):
@@ -2346,25 +4605,18 @@ def mapping_query_page():
                                         st.info(f"**资产名称**: {physical_record.get('固定资产名称', '')}")
                                         st.info(f"**资产类型**: {physical_record.get('固定资产类型', '')}")
                                     with col2:
-                                        physical_value = safe_get_value(physical_record, "资产价值")
                                         st.info(f"**资产价值**: ¥{physical_value:,.2f}")
                                         st.info(f"**存放部门**: {physical_record.get('存放部门', '')}")
                                         st.info(f"**使用状态**: {physical_record.get('使用状态', '')}")
-
-                                # 累计实物资产价值
-                                physical_value = safe_get_value(physical_record, '资产价值')
-                                total_physical_value += physical_value
-                                valid_physical_count += 1
-
                             else:
                                 st.error(f"❌ 映射的实物资产记录不存在: {physical_code}")
 
                         # 多对多关系的价值比较
+                        total_physical_value = lookup["counterpart_total"]
+                        valid_physical_count = lookup["valid_count"]
                         if valid_physical_count > 0:
                             st.subheader("💰 价值比较分析")
 
-                            financial_value = safe_get_value(financial_record, '资产价值')
-
                             col1, col2, col3 = st.columns(3)
                             with col1:
                                 st.metric("财务系统价值", f"¥{financial_value:,.2f}")
@@ -2400,6 +4652,8 @@ def mapping_query_page():
                         st.warning("⚠️ 该财务资产未找到对应的实物资产")
                 else:
                     st.error("❌ 未找到该资产编号+序号对应的资产")
+
+                st.caption(get_lookup_cache().stats_text())
             else:
                 st.warning("⚠️ 请输入资产编号+序号")
 
@@ -2410,10 +4664,19 @@ def mapping_query_page():
 
         if st.button("🔍 查询实物资产"):
             if physical_code:
-                # 查找实物资产记录
-                physical_record = physical_index.get(str(physical_code))
+                # 查找实物资产记录及对应财务资产（结果按编号+数据集版本缓存）
+                lookup = lookup_reconciliation(str(physical_code), False, index_bundle, financial_data, physical_data)
+
+                if lookup:
+                    physical_record = lookup["record"]
+
+                    # 同一编码存在多条实物记录时提示
+                    duplicate_records = lookup["duplicate_records"]
+                    if duplicate_records:
+                        st.warning(f"⚠️ 该实物台账编号存在 {len(duplicate_records)} 条重复记录，以下显示最后一条")
+                        with st.expander("查看全部重复记录"):
+                            st.dataframe(pd.DataFrame(duplicate_records), use_container_width=True)
 
-                if physical_record:
                     # 显示实物资产信息
                     with st.expander("📋 实物资产详情", expanded=True):
                         col1, col2 = st.columns(2)
@@ -2422,24 +4685,16 @@ def mapping_query_page():
                             st.info(f"**资产名称**: {physical_record.get('固定资产名称', '')}")
                             st.info(f"**资产类型**: {physical_record.get('固定资产类型', '')}")
                         with col2:
-                            physical_value = safe_get_value(physical_record, "资产价值")
+                            physical_value = lookup["value"]
                             st.info(f"**资产价值**: ¥{physical_value:,.2f}")
                             st.info(f"**存放部门**: {physical_record.get('存放部门', '')}")
                             st.info(f"**使用状态**: {physical_record.get('使用状态', '')}")
 
-                    # 查找对应的财务资产（支持多对多）
-                    financial_codes = physical_to_financial_mapping.get(str(physical_code), [])
-
-                    if financial_codes:
-                        st.success(f"✅ 找到 {len(financial_codes)} 个对应的财务资产")
-
-                        # 用于计算总价值
-                        total_financial_value = 0
-                        valid_financial_count = 0
-
-                        for i, financial_code in enumerate(financial_codes, 1):
-                            financial_record = financial_index.get(financial_code)
+                    # 对应的财务资产（支持多对多）
+                    if lookup["counterparts"]:
+                        st.success(f"✅ 找到 {len(lookup['counterparts'])} 个对应的财务资产")
 
+                        for i, (financial_code, financial_record, financial_value) in enumerate(lookup["counterparts"], 1):
                             if financial_record:
                                 # 显示财务资产信息
                                 with st.expander(f"📊 财务资产详情 #{i} - {financial_code}", expanded=True):
@@ -2449,25 +4704,18 @@ def mapping_query_page():
                                         st.info(f"**资产名称**: {financial_record.get('资产名称', '')}")
                                         st.info(f"**资产分类**: {financial_record.get('资产分类', '')}")
                                     with col2:
-                                        financial_value = safe_get_value(financial_record, "资产价值")
                                         st.info(f"**资产价值**: ¥{financial_value:,.2f}")
                                         st.info(f"**所属部门**: {financial_record.get('部门名称', '')}")
                                         st.info(f"**保管人**: {financial_record.get('保管人', '')}")
-
-                                # 累计财务资产价值
-                                financial_value = safe_get_value(financial_record, '资产价值')
-                                total_financial_value += financial_value
-                                valid_financial_count += 1
-
                             else:
                                 st.error(f"❌ 映射的财务资产记录不存在: {financial_code}")
 
                         # 多对多关系的价值比较
+                        total_financial_value = lookup["counterpart_total"]
+                        valid_financial_count = lookup["valid_count"]
                         if valid_financial_count > 0:
                             st.subheader("💰 价值比较分析")
 
-                            physical_value = safe_get_value(physical_record, '资产价值')
-
                             col1, col2, col3 = st.columns(3)
                             with col1:
                                 st.metric("实物资产价值", f"¥{physical_value:,.2f}")
@@ -2503,6 +4751,8 @@ def mapping_query_page():
                         st.warning("⚠️ 该实物资产未找到对应的财务资产")
                 else:
                     st.error("❌ 未找到该实物资产编号对应的资产")
+
+                st.caption(get_lookup_cache().stats_text())
             else:
                 st.warning("⚠️ 请输入实物台账编号")
 
@@ -2510,26 +4760,23 @@ def mapping_query_page():
         st.subheader("🔍 资产名称搜索")
 
         search_term = st.text_input("请输入资产名称关键词", placeholder="例如: 电脑、桌子、空调")
+        if PINYIN_AVAILABLE:
+            st.caption("💡 支持拼音全拼或首字母搜索，例如：bijiben、bjb")
 
         if search_term:
-            # 在财务资产中搜索
-            financial_results = [
-                record for record in financial_data
-                if search_term.lower() in str(record.get('资产名称', '')).lower()
-            ]
-
-            # 在实物资产中搜索
-            physical_results = [
-                record for record in physical_data
-                if search_term.lower() in str(record.get('固定资产名称', '')).lower()
-            ]
+            # 在财务资产、实物资产中搜索（n-gram 倒排索引，支持拼音，结果按相关度排序）
+            financial_results = index_bundle.financial_names.search(search_term)
+            physical_results = index_bundle.physical_names.search(search_term)
 
             col1, col2 = st.columns(2)
 
             with col1:
                 st.subheader(f"📊 财务系统搜索结果 ({len(financial_results)}条)")
-                if financial_results:
-                    for record in financial_results[:10]:  # 限制显示前10条
+                if len(financial_results):
+                    start, end = page_selector(len(financial_results), NAME_SEARCH_PAGE_SIZE,
+                                               key="financial_name_page", reset_token=search_term)
+                    for position in financial_results[start:end]:
+                        record = financial_data[position]
                         with st.expander(f"💰 {record.get('资产名称', '')} - {record.get('资产编号+序号', '')}"):
                             st.write(f"**资产分类**: {record.get('资产分类', '')}")
                             asset_value = safe_get_value(record, "资产价值")
@@ -2547,8 +4794,11 @@ def mapping_query_page():
 
             with col2:
                 st.subheader(f"📋 实物台账搜索结果 ({len(physical_results)}条)")
-                if physical_results:
-                    for record in physical_results[:10]:  # 限制显示前10条
+                if len(physical_results):
+                    start, end = page_selector(len(physical_results), NAME_SEARCH_PAGE_SIZE,
+                                               key="physical_name_page", reset_token=search_term)
+                    for position in physical_results[start:end]:
+                        record = physical_data[position]
                         with st.expander(f"📦 {record.get('固定资产名称', '')} - {record.get('固定资产编码', '')}"):
                             st.write(f"**资产类型**: {record.get('固定资产类型', '')}")
                             asset_value = safe_get_value(record, "资产价值")
@@ -2568,120 +4818,120 @@ def mapping_query_page():
     else:  # 批量查询
         st.subheader("📋 批量查询")
 
-        # 输入多个编号
-        batch_input = st.text_area(
-            "请输入要查询的编号（每行一个）",
-            placeholder="FS001\nFS002\nPA001\nPA002",
-            height=150
-        )
+        input_source = st.radio("编号来源", ["手动输入", "上传文件（CSV/Excel）"], horizontal=True,
+                                key="batch_input_source")
 
-        query_mode = st.radio("查询模式", ["资产编号+序号", "实物台账编号"])
+        if input_source == "手动输入":
+            # 输入多个编号
+            batch_input = st.text_area(
+                "请输入要查询的编号（每行一个）",
+                placeholder="FS001\nFS002\nPA001\nPA002",
+                height=150
+            )
+        else:
+            batch_input = ""
+            codes_file = st.file_uploader(
+                "上传包含编号列的文件",
+                type=['csv', 'xlsx', 'xls'],
+                key="batch_codes_file",
+                help="适用于大批量查询（10万条以上），结果分块处理并生成CSV文件下载"
+            )
 
-        if batch_input and st.button("开始批量查询"):
-            codes = [code.strip() for code in batch_input.split('\n') if code.strip()]
+        query_mode = st.radio("查询模式", BATCH_QUERY_MODES,
+                              help="自动识别：同时在财务、实物台账中查找，适用于混合编号列表")
 
-            if codes:
-                results = []
+        if input_source != "手动输入":
+            if codes_file is not None:
+                try:
+                    codes_df = read_codes_file(codes_file.name, codes_file.getvalue())
+                except Exception as e:
+                    st.error(f"❌ 文件读取失败: {str(e)}")
+                    codes_df = None
 
-                for code in codes:
-                    if query_mode == "资产编号+序号":
-                        financial_record = financial_index.get(str(code))
-                        if financial_record:
-                            physical_codes = financial_to_physical_mapping.get(str(code), [])
-                            if physical_codes:
-                                # 处理多对多关系
-                                physical_names = []
-                                total_physical_value = 0
-                                for pc in physical_codes:
-                                    physical_record = physical_index.get(pc)
-                                    if physical_record:
-                                        physical_names.append(physical_record.get('固定资产名称', ''))
-                                        total_physical_value += safe_get_value(physical_record, '资产价值')
-
-                                results.append({
-                                    "查询编号": code,
-                                    "财务资产名称": financial_record.get('资产名称', ''),
-                                    "财务资产价值": safe_get_value(financial_record, '资产价值'),
-                                    "对应实物编号": ', '.join(physical_codes),
-                                    "实物资产名称": ', '.join(physical_names),
-                                    "实物资产价值": total_physical_value,
-                                    "状态": "已映射"
-                                })
-                            else:
-                                results.append({
-                                    "查询编号": code,
-                                    "财务资产名称": financial_record.get('资产名称', ''),
-                                    "财务资产价值": safe_get_value(financial_record, '资产价值'),
-                                    "对应实物编号": "未映射",
-                                    "实物资产名称": "未映射",
-                                    "实物资产价值": 0,
-                                    "状态": "未映射"
-                                })
-                        else:
-                            results.append({
-                                "查询编号": code,
-                                "财务资产名称": "未找到",
-                                "财务资产价值": 0,
-                                "对应实物编号": "未找到",
-                                "实物资产名称": "未找到",
-                                "实物资产价值": 0,
-                                "状态": "不存在"
-                            })
+                if codes_df is not None and len(codes_df.columns) > 0:
+                    code_column = st.selectbox("选择编号所在列", codes_df.columns.tolist(), key="batch_code_column")
+                    codes = [code.strip() for code in codes_df[code_column].dropna() if code.strip()]
+                    st.info(f"📄 共读取 {len(codes)} 个编号")
 
-                    else:  # 实物台账编号
-                        physical_record = physical_index.get(str(code))
-                        if physical_record:
-                            financial_codes = physical_to_financial_mapping.get(str(code), [])
-                            if financial_codes:
-                                # 处理多对多关系
-                                financial_names = []
-                                total_financial_value = 0
-                                for fc in financial_codes:
-                                    financial_record = financial_index.get(fc)
-                                    if financial_record:
-                                        financial_names.append(financial_record.get('资产名称', ''))
-                                        total_financial_value += safe_get_value(financial_record, '资产价值')
-
-                                results.append({
-                                    "查询编号": code,
-                                    "实物资产名称": physical_record.get('固定资产名称', ''),
-                                    "实物资产价值": safe_get_value(physical_record, '资产价值'),
-                                    "对应财务编号": ', '.join(financial_codes),
-                                    "财务资产名称": ', '.join(financial_names),
-                                    "财务资产价值": total_financial_value,
-                                    "状态": "已映射"
-                                })
-                            else:
-                                results.append({
-                                    "查询编号": code,
-                                    "实物资产名称": physical_record.get('固定资产名称', ''),
-                                    "实物资产价值": safe_get_value(physical_record, '资产价值'),
-                                    "对应财务编号": "未映射",
-                                    "财务资产名称": "未映射",
-                                    "财务资产价值": 0,
-                                    "状态": "未映射"
-                                })
-                        else:
-                            results.append({
-                                "查询编号": code,
-                                "实物资产名称": "未找到",
-                                "实物资产价值": 0,
-                                "对应财务编号": "未找到",
-                                "财务资产名称": "未找到",
-                                "财务资产价值": 0,
-                                "状态": "不存在"
-                            })
+                    if codes and st.button("开始批量查询", key="batch_file_query"):
+                        progress_bar = st.progress(0.0)
+                        status_text = st.empty()
+
+                        def update_progress(done, total):
+                            progress_bar.progress(done / total)
+                            status_text.text(f"正在查询... {done}/{total}")
+
+                        try:
+                            previous_result = st.session_state.pop("batch_query_result", None)
+                            if previous_result:
+                                get_batch_result_cache().discard(previous_result["path"])
+
+                            result_path, status_counts, preview_df = batch_query_to_file(
+                                codes, query_mode, index_bundle,
+                                financial_data, physical_data, progress_callback=update_progress)
+                            st.session_state["batch_query_result"] = {
+                                "path": result_path,
+                                "total": len(codes),
+                                "status_counts": status_counts,
+                                "preview": preview_df,
+                                "file_name": f"批量查询结果_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                            }
+                            status_text.text(f"✅ 查询完成，共 {len(codes)} 条")
+                        except Exception as e:
+                            st.error(f"❌ 批量查询失败: {str(e)}")
+
+            # 显示最近一次文件查询结果
+            batch_result = st.session_state.get("batch_query_result")
+            if batch_result and os.path.exists(batch_result["path"]):
+                st.subheader(f"📊 批量查询结果 (共{batch_result['total']}条)")
+
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("已映射", batch_result["status_counts"].get("已映射", 0))
+                with col2:
+                    st.metric("未映射", batch_result["status_counts"].get("未映射", 0))
+                with col3:
+                    st.metric("不存在", batch_result["status_counts"].get("不存在", 0))
+
+                st.caption(f"预览前 {len(batch_result['preview'])} 条，完整结果请下载CSV文件")
+                st.dataframe(batch_result["preview"], use_container_width=True)
+
+                with open(batch_result["path"], "rb") as result_file:
+                    st.download_button(
+                        label="📥 下载完整查询结果CSV",
+                        data=result_file,
+                        file_name=batch_result["file_name"],
+                        mime="text/csv",
+                        key="download_batch_result"
+                    )
+
+        elif batch_input:
+            if st.button("开始批量查询"):
+                codes = [code.strip() for code in batch_input.split('\n') if code.strip()]
+                st.session_state["manual_batch_result"] = {
+                    "input": batch_input,
+                    "query_mode": query_mode,
+                    "codes": tuple(codes),
+                    "df": run_batch_query(codes, query_mode, index_bundle, financial_data, physical_data)
+                    if codes else None,
+                }
+
+            # 显示最近一次查询结果（输入或查询模式变化后需重新查询）
+            manual_result = st.session_state.get("manual_batch_result")
+            if (manual_result and manual_result["df"] is not None
+                    and manual_result["input"] == batch_input and manual_result["query_mode"] == query_mode):
+                df = manual_result["df"]
 
                 # 显示结果
-                if results:
-                    df = pd.DataFrame(results)
-                    st.subheader(f"📊 批量查询结果 (共{len(results)}条)")
+                if len(df):
+                    st.subheader(f"📊 批量查询结果 (共{len(df)}条)")
                     st.dataframe(df, use_container_width=True)
 
                     # 统计信息
-                    mapped_count = len([r for r in results if r["状态"] == "已映射"])
-                    unmapped_count = len([r for r in results if r["状态"] == "未映射"])
-                    not_found_count = len([r for r in results if r["状态"] == "不存在"])
+                    status_counts = df["状态"].value_counts()
+                    mapped_count = int(status_counts.get("已映射", 0))
+                    unmapped_count = int(status_counts.get("未映射", 0))
+                    not_found_count = int(status_counts.get("不存在", 0))
 
                     col1, col2, col3 = st.columns(3)
                     with col1:
@@ -2691,20 +4941,13 @@ def mapping_query_page():
                     with col3:
                         st.metric("不存在", not_found_count)
 
-                    # 导出功能
-                    if st.button("📥 导出查询结果"):
-                        try:
-                            output = io.BytesIO()
-                            df.to_excel(output, index=False, engine='openpyxl')
-                            output.seek(0)
-                            st.download_button(
-                                label="下载Excel文件",
-                                data=output,
-                                file_name=f"批量查询结果_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                            )
-                        except Exception as e:
-                            st.error(f"导出失败: {str(e)}")
+                    if "编号类型" in df.columns:
+                        type_counts = df.drop_duplicates(subset=["查询编号"])["编号类型"].value_counts()
+                        st.caption("编号类型识别：" + "，".join(f"{name} {count} 个" for name, count in type_counts.items()))
+
+                    # 导出功能（点击导出后才生成Excel；同一查询复用缓存文件）
+                    excel_export_button("📥 导出查询结果", "批量查询结果", (query_mode, manual_result["codes"]),
+                                        lambda: {'Sheet1': df}, "批量查询结果", key="export_batch_query")
 
 
 def data_statistics_page():
@@ -2728,56 +4971,39 @@ def data_statistics_page():
         st.warning(f"⚠️ 请先导入：{', '.join(missing)}")
         return
 
-    # ========== 创建数据索引 ==========
-    financial_index = create_data_index(financial_data, "资产编号+序号")
-    physical_index = create_data_index(physical_data, "固定资产编码")
-    financial_to_physical_mapping, physical_to_financial_mapping = create_mapping_index(mapping_data)
+    # ========== 加载数据索引 ==========
+    index_bundle = get_index_bundle(financial_data, physical_data, mapping_data)
 
     # ========== 预计算统计数据 ==========
+    # 统计快照（保存数据时在后台生成，数据未变化时直接加载，三个标签页共用）
+    snapshot = get_stats_snapshot(index_bundle, financial_data, physical_data)
+    financial_totals = snapshot["financial"]
+    physical_totals = snapshot["physical"]
+
     # 计算匹配数量
-    matched_financial = len(
-        [f for f in financial_data if str(f.get("资产编号+序号", "")).strip() in financial_to_physical_mapping])
-    matched_physical = len(
-        [p for p in physical_data if str(p.get("固定资产编码", "")).strip() in physical_to_financial_mapping])
+    matched_financial = financial_totals["matched"]["count"]
+    matched_physical = physical_totals["matched"]["count"]
 
     # 计算价值
-    financial_total_value = sum(safe_get_value(f, "资产价值") for f in financial_data)
-
-    # 处理实物资产价值计算（去重和核算筛选）
-    physical_df = pd.DataFrame(physical_data)
-    if len(physical_df) > 0 and "固定资产编码" in physical_df.columns:
-        if "是否核算" in physical_df.columns:
-            accounting_mask = physical_df["是否核算"].astype(str).str.strip().isin(
-                ["是", "Y", "y", "Yes", "YES", "1", "True", "true"])
-            physical_df_accounting = physical_df[accounting_mask]
-            non_accounting_count = len(physical_df) - len(physical_df_accounting)
-            physical_df_deduped = physical_df_accounting.drop_duplicates(subset=['固定资产编码'], keep='first')
-            physical_duplicate_count = len(physical_df_accounting) - len(physical_df_deduped)
-        else:
-            physical_df_deduped = physical_df.drop_duplicates(subset=['固定资产编码'], keep='first')
-            physical_duplicate_count = len(physical_df) - len(physical_df_deduped)
-            non_accounting_count = 0
+    financial_total_value = financial_totals["all"]["original"]
 
-        physical_total_value = sum(
-            safe_get_value(row.to_dict(), "固定资产原值") for _, row in physical_df_deduped.iterrows())
+    # 实物资产价值（去重和核算筛选）
+    physical_valuation = snapshot["physical_valuation"]
+    physical_total_value = physical_valuation["total_value"]
+    physical_duplicate_count = physical_valuation["duplicate_count"]
+    non_accounting_count = physical_valuation["non_accounting_count"]
 
-        # 保存统计信息
-        st.session_state['physical_duplicate_count'] = physical_duplicate_count
-        st.session_state['physical_deduped_count'] = len(physical_df_deduped)
-        st.session_state['physical_original_count'] = len(physical_df)
-    else:
-        physical_total_value = sum(safe_get_value(p, "资产价值") for p in physical_data)
-        physical_duplicate_count = 0
-        non_accounting_count = 0
-        st.session_state['physical_duplicate_count'] = 0
-        st.session_state['physical_deduped_count'] = len(physical_data)
-        st.session_state['physical_original_count'] = len(physical_data)
+    # 页面底部汇总使用的指标
+    matched_count = matched_financial
+    financial_match_rate = (matched_financial / len(financial_data) * 100) if financial_data else 0
+    total_diff = financial_total_value - physical_total_value
 
     # ========== 主要内容区域 ==========
-    tab_summary, tab_analysis, tab_charts = st.tabs(["📊 统计概览", "🔍 差异分析", "📈 可视化分析"])
+    # 只计算和渲染选中的标签页
+    selected_tab = tab_selector(["📊 统计概览", "🔍 差异分析", "📈 可视化分析"], key="stats_tab")
 
     # ========== Tab 1: 统计概览 ==========
-    with tab_summary:
+    if selected_tab == "📊 统计概览":
         # 基础统计
         st.subheader("📋 基础统计信息")
         col1, col2, col3, col4 = st.columns(4)
@@ -2787,9 +5013,9 @@ def data_statistics_page():
             st.caption(f"已匹配: {matched_financial:,}")
 
         with col2:
-            deduped_count = st.session_state.get('physical_deduped_count', len(physical_data))
-            original_count = st.session_state.get('physical_original_count', len(physical_data))
-            duplicate_count = st.session_state.get('physical_duplicate_count', 0)
+            deduped_count = physical_valuation["deduped_count"]
+            original_count = physical_valuation["original_count"]
+            duplicate_count = physical_duplicate_count
 
             st.metric("实物资产总数", f"{deduped_count:,}")
             if duplicate_count > 0:
@@ -2814,7 +5040,6 @@ def data_statistics_page():
         col1, col2 = st.columns(2)
 
         with col1:
-            financial_match_rate = (matched_financial / len(financial_data) * 100) if financial_data else 0
             st.metric("财务资产匹配率", f"{financial_match_rate:.1f}%")
 
             progress_val = financial_match_rate / 100
@@ -2855,7 +5080,6 @@ def data_statistics_page():
             st.metric("实物资产总价值", f"¥{physical_total_value:,.2f}")
 
         with col3:
-            total_diff = financial_total_value - physical_total_value
             diff_color = "normal"
             if abs(total_diff) > 100000:
                 diff_color = "inverse"
@@ -2870,509 +5094,380 @@ def data_statistics_page():
                 st.caption("🟢 差异较小")
 
     # ========== Tab 2: 差异分析 ==========
-    with tab_analysis:
+    if selected_tab == "🔍 差异分析":
         st.subheader("🔍 价值差异详细分析")
 
-        # 数据验证
-        if not all([financial_data, physical_data, mapping_data]):
-            st.warning("⚠️ 缺少必要数据，无法进行差异分析")
-            return
-
-        # 计算差异数据
-        with st.spinner("正在计算差异数据..."):
-            # 创建匹配集合
-            matched_financial_codes = set()
-            matched_physical_codes = set()
-
-            # 遍历映射数据获取匹配的编码
-            for mapping_record in mapping_data:
-                financial_code = str(mapping_record.get("资产编号+序号", "")).strip()
-                physical_code = str(mapping_record.get("固定资产编码", "")).strip()
-
-                if financial_code and physical_code:
-                    if financial_code in financial_index and physical_code in physical_index:
-                        matched_financial_codes.add(financial_code)
-                        matched_physical_codes.add(physical_code)
-
-            # 分类资产数据
-            matched_financial = [f for f in financial_data
-                                 if str(f.get("资产编号+序号", "")).strip() in matched_financial_codes]
-            matched_physical = [p for p in physical_data
-                                if str(p.get("固定资产编码", "")).strip() in matched_physical_codes]
-
-            unmatched_financial = [f for f in financial_data
-                                   if str(f.get("资产编号+序号", "")).strip() not in matched_financial_codes]
-            unmatched_physical = [p for p in physical_data
-                                  if str(p.get("固定资产编码", "")).strip() not in matched_physical_codes]
-
-            # 计算汇总数据
-            def calculate_totals(data_list, is_financial=True):
-                if is_financial:
-                    original_key = "资产价值"
-                    depreciation_key = "累计折旧"
-                    net_key = "净额"
-                else:
-                    original_key = "固定资产原值"
-                    depreciation_key = "累计折旧"
-                    net_key = None
-
-                total_original = sum(safe_get_value(item, original_key, 0) for item in data_list)
-                total_depreciation = sum(safe_get_value(item, depreciation_key, 0) for item in data_list)
-
-                if is_financial:
-                    total_net = sum(safe_get_value(item, net_key, 0) for item in data_list)
-                    if total_net == 0:  # 如果净额为0，用原值-累计折旧计算
-                        total_net = max(0, total_original - total_depreciation)
-                else:
-                    total_net = max(0, total_original - total_depreciation)
-
-                return {
-                    'original': total_original,
-                    'depreciation': total_depreciation,
-                    'net': total_net,
-                    'count': len(data_list)
-                }
-
-            # 计算各类汇总
-            total_financial = calculate_totals(financial_data, True)
-            total_physical = calculate_totals(physical_data, False)
-            matched_financial_totals = calculate_totals(matched_financial, True)
-            matched_physical_totals = calculate_totals(matched_physical, False)
-            unmatched_financial_totals = calculate_totals(unmatched_financial, True)
-            unmatched_physical_totals = calculate_totals(unmatched_physical, False)
-
-        # ========== 1. 总体差异对比 ==========
-        with tab_analysis:
-            st.subheader("🔍 价值差异详细分析")
-
-            # 数据验证
-            if not all([financial_data, physical_data, mapping_data]):
-                st.warning("⚠️ 缺少必要数据，无法进行差异分析")
+        # 汇总数据直接取自对账汇总引擎
+        total_financial = financial_totals["all"]
+        total_physical = physical_totals["all"]
+        matched_financial_totals = financial_totals["matched"]
+        matched_physical_totals = physical_totals["matched"]
+        unmatched_financial_totals = financial_totals["unmatched"]
+        unmatched_physical_totals = physical_totals["unmatched"]
+
+        # ========== 1. 总体差异对比（横向展示） ==========
+        st.markdown("### 💰 总体差异对比")
+
+        # 创建总体对比表格
+        total_comparison_data = {
+            "项目": ["资产原值", "累计折旧", "资产净额"],
+            "财务系统": [
+                f"¥{total_financial['original']:,.2f}",
+                f"¥{total_financial['depreciation']:,.2f}",
+                f"¥{total_financial['net']:,.2f}"
+            ],
+            "实物系统": [
+                f"¥{total_physical['original']:,.2f}",
+                f"¥{total_physical['depreciation']:,.2f}",
+                f"¥{total_physical['net']:,.2f}"
+            ],
+            "差异金额": [
+                f"¥{total_financial['original'] - total_physical['original']:,.2f}",
+                f"¥{total_financial['depreciation'] - total_physical['depreciation']:,.2f}",
+                f"¥{total_financial['net'] - total_physical['net']:,.2f}"
+            ]
+        }
+
+        total_comparison_df = pd.DataFrame(total_comparison_data)
+        st.dataframe(total_comparison_df, use_container_width=True, hide_index=True)
+
+        # 总体差异状态
+        total_original_diff = total_financial['original'] - total_physical['original']
+        total_depreciation_diff = total_financial['depreciation'] - total_physical['depreciation']
+        total_net_diff = total_financial['net'] - total_physical['net']
+
+        def get_status_emoji(diff_value):
+            if abs(diff_value) > 1000000:
+                return "🔴 重大差异"
+            elif abs(diff_value) > 100000:
+                return "🟡 中等差异"
+            elif abs(diff_value) > 1000:
+                return "🟠 轻微差异"
             else:
-                # 计算差异数据
-                with st.spinner("正在计算差异数据..."):
-                    # 创建匹配集合
-                    matched_financial_codes = set()
-                    matched_physical_codes = set()
-
-                    # 遍历映射数据获取匹配的编码
-                    for mapping_record in mapping_data:
-                        financial_code = str(mapping_record.get("资产编号+序号", "")).strip()
-                        physical_code = str(mapping_record.get("固定资产编码", "")).strip()
-
-                        if financial_code and physical_code:
-                            if financial_code in financial_index and physical_code in physical_index:
-                                matched_financial_codes.add(financial_code)
-                                matched_physical_codes.add(physical_code)
-
-                    # 分类资产数据
-                    matched_financial = [f for f in financial_data
-                                         if str(f.get("资产编号+序号", "")).strip() in matched_financial_codes]
-                    matched_physical = [p for p in physical_data
-                                        if str(p.get("固定资产编码", "")).strip() in matched_physical_codes]
-
-                    unmatched_financial = [f for f in financial_data
-                                           if str(f.get("资产编号+序号", "")).strip() not in matched_financial_codes]
-                    unmatched_physical = [p for p in physical_data
-                                          if str(p.get("固定资产编码", "")).strip() not in matched_physical_codes]
-
-                    # 定义匹配数量变量
-                    matched_count = len(matched_financial)
-
-                    # 计算汇总数据
-                    def calculate_totals(data_list, is_financial=True):
-                        if is_financial:
-                            original_key = "资产价值"
-                            depreciation_key = "累计折旧"
-                            net_key = "净额"
-                        else:
-                            original_key = "固定资产原值"
-                            depreciation_key = "累计折旧"
-                            net_key = None
-
-                        total_original = sum(safe_get_value(item, original_key, 0) for item in data_list)
-                        total_depreciation = sum(safe_get_value(item, depreciation_key, 0) for item in data_list)
-
-                        if is_financial:
-                            total_net = sum(safe_get_value(item, net_key, 0) for item in data_list)
-                            if total_net == 0:  # 如果净额为0，用原值-累计折旧计算
-                                total_net = max(0, total_original - total_depreciation)
-                        else:
-                            total_net = max(0, total_original - total_depreciation)
-
-                        return {
-                            'original': total_original,
-                            'depreciation': total_depreciation,
-                            'net': total_net,
-                            'count': len(data_list)
-                        }
-
-                    # 计算各类汇总
-                    total_financial = calculate_totals(financial_data, True)
-                    total_physical = calculate_totals(physical_data, False)
-                    matched_financial_totals = calculate_totals(matched_financial, True)
-                    matched_physical_totals = calculate_totals(matched_physical, False)
-                    unmatched_financial_totals = calculate_totals(unmatched_financial, True)
-                    unmatched_physical_totals = calculate_totals(unmatched_physical, False)
-
-                # ========== 1. 总体差异对比（横向展示） ==========
-                st.markdown("### 💰 总体差异对比")
-
-                # 创建总体对比表格
-                total_comparison_data = {
-                    "项目": ["资产原值", "累计折旧", "资产净额"],
-                    "财务系统": [
-                        f"¥{total_financial['original']:,.2f}",
-                        f"¥{total_financial['depreciation']:,.2f}",
-                        f"¥{total_financial['net']:,.2f}"
-                    ],
-                    "实物系统": [
-                        f"¥{total_physical['original']:,.2f}",
-                        f"¥{total_physical['depreciation']:,.2f}",
-                        f"¥{total_physical['net']:,.2f}"
-                    ],
-                    "差异金额": [
-                        f"¥{total_financial['original'] - total_physical['original']:,.2f}",
-                        f"¥{total_financial['depreciation'] - total_physical['depreciation']:,.2f}",
-                        f"¥{total_financial['net'] - total_physical['net']:,.2f}"
-                    ]
-                }
-
-                total_comparison_df = pd.DataFrame(total_comparison_data)
-                st.dataframe(total_comparison_df, use_container_width=True, hide_index=True)
-
-                # 总体差异状态
-                total_original_diff = total_financial['original'] - total_physical['original']
-                total_depreciation_diff = total_financial['depreciation'] - total_physical['depreciation']
-                total_net_diff = total_financial['net'] - total_physical['net']
-
-                def get_status_emoji(diff_value):
-                    if abs(diff_value) > 1000000:
-                        return "🔴 重大差异"
-                    elif abs(diff_value) > 100000:
-                        return "🟡 中等差异"
-                    elif abs(diff_value) > 1000:
-                        return "🟠 轻微差异"
-                    else:
-                        return "🟢 基本一致"
-
-                col_status1, col_status2, col_status3 = st.columns(3)
-                with col_status1:
-                    st.info(f"**原值差异状态**: {get_status_emoji(total_original_diff)}")
-                with col_status2:
-                    st.info(f"**折旧差异状态**: {get_status_emoji(total_depreciation_diff)}")
-                with col_status3:
-                    st.info(f"**净额差异状态**: {get_status_emoji(total_net_diff)}")
-
-                st.divider()
-
-                # ========== 2. 已匹配资产分析（横向展示） ==========
-                st.markdown("### 🎯 已匹配资产分析")
-
-                # 已匹配差异计算
-                matched_original_diff = matched_financial_totals['original'] - matched_physical_totals['original']
-                matched_depreciation_diff = matched_financial_totals['depreciation'] - matched_physical_totals[
-                    'depreciation']
-                matched_net_diff = matched_financial_totals['net'] - matched_physical_totals['net']
-
-                # 已匹配对比表格
-                matched_comparison_data = {
-                    "项目": ["资产原值", "累计折旧", "资产净额"],
-                    "财务系统": [
-                        f"¥{matched_financial_totals['original']:,.2f}",
-                        f"¥{matched_financial_totals['depreciation']:,.2f}",
-                        f"¥{matched_financial_totals['net']:,.2f}"
-                    ],
-                    "实物系统": [
-                        f"¥{matched_physical_totals['original']:,.2f}",
-                        f"¥{matched_physical_totals['depreciation']:,.2f}",
-                        f"¥{matched_physical_totals['net']:,.2f}"
-                    ],
-                    "差异金额": [
-                        f"¥{matched_original_diff:,.2f}",
-                        f"¥{matched_depreciation_diff:,.2f}",
-                        f"¥{matched_net_diff:,.2f}"
-                    ],
-                    "占总资产比例": [
-                        f"{(matched_financial_totals['original'] / total_financial['original'] * 100):.1f}%" if
-                        total_financial['original'] > 0 else "0%",
-                        f"{(matched_financial_totals['depreciation'] / total_financial['depreciation'] * 100):.1f}%" if
-                        total_financial['depreciation'] > 0 else "0%",
-                        f"{(matched_financial_totals['net'] / total_financial['net'] * 100):.1f}%" if total_financial[
-                                                                                                          'net'] > 0 else "0%"
-                    ]
-                }
+                return "🟢 基本一致"
 
-                matched_comparison_df = pd.DataFrame(matched_comparison_data)
-                st.dataframe(matched_comparison_df, use_container_width=True, hide_index=True)
-
-                # 已匹配资产基本信息
-                col_matched1, col_matched2, col_matched3 = st.columns(3)
-                with col_matched1:
-                    st.metric("已匹配资产数量", f"{matched_financial_totals['count']:,} 项")
-                with col_matched2:
-                    overall_match_rate = (matched_count / len(financial_data) * 100) if financial_data else 0
-                    st.metric("总体匹配率", f"{overall_match_rate:.1f}%")
-                with col_matched3:
-                    st.metric("已匹配资产占比",
-                              f"{(matched_financial_totals['original'] / total_financial['original'] * 100):.1f}%" if
-                              total_financial['original'] > 0 else "0%")
-
-                st.divider()
-
-                # ========== 3. 未匹配资产分析（横向展示） ==========
-                st.markdown("### ⚠️ 未匹配资产分析")
-
-                # 未匹配对比表格
-                unmatched_comparison_data = {
-                    "资产类型": ["未匹配财务资产", "未匹配实物资产"],
-                    "资产原值": [
-                        f"¥{unmatched_financial_totals['original']:,.2f}",
-                        f"¥{unmatched_physical_totals['original']:,.2f}"
-                    ],
-                    "累计折旧": [
-                        f"¥{unmatched_financial_totals['depreciation']:,.2f}",
-                        f"¥{unmatched_physical_totals['depreciation']:,.2f}"
-                    ],
-                    "资产净额": [
-                        f"¥{unmatched_financial_totals['net']:,.2f}",
-                        f"¥{unmatched_physical_totals['net']:,.2f}"
-                    ],
-                    "资产数量": [
-                        f"{unmatched_financial_totals['count']:,} 项",
-                        f"{unmatched_physical_totals['count']:,} 项"
-                    ],
-                    "占比": [
-                        f"{(unmatched_financial_totals['original'] / total_financial['original'] * 100):.1f}%" if
-                        total_financial['original'] > 0 else "0%",
-                        f"{(unmatched_physical_totals['original'] / total_physical['original'] * 100):.1f}%" if
-                        total_physical['original'] > 0 else "0%"
-                    ]
-                }
+        col_status1, col_status2, col_status3 = st.columns(3)
+        with col_status1:
+            st.info(f"**原值差异状态**: {get_status_emoji(total_original_diff)}")
+        with col_status2:
+            st.info(f"**折旧差异状态**: {get_status_emoji(total_depreciation_diff)}")
+        with col_status3:
+            st.info(f"**净额差异状态**: {get_status_emoji(total_net_diff)}")
 
-                unmatched_comparison_df = pd.DataFrame(unmatched_comparison_data)
-                st.dataframe(unmatched_comparison_df, use_container_width=True, hide_index=True)
+        st.divider()
 
-                # 未匹配资产差异分析
-                unmatched_original_diff = unmatched_financial_totals['original'] - unmatched_physical_totals['original']
-                unmatched_depreciation_diff = unmatched_financial_totals['depreciation'] - unmatched_physical_totals[
-                    'depreciation']
-                unmatched_net_diff = unmatched_financial_totals['net'] - unmatched_physical_totals['net']
+        # ========== 2. 已匹配资产分析（横向展示） ==========
+        st.markdown("### 🎯 已匹配资产分析")
+
+        # 已匹配差异计算
+        matched_original_diff = matched_financial_totals['original'] - matched_physical_totals['original']
+        matched_depreciation_diff = matched_financial_totals['depreciation'] - matched_physical_totals[
+            'depreciation']
+        matched_net_diff = matched_financial_totals['net'] - matched_physical_totals['net']
+
+        # 已匹配对比表格
+        matched_comparison_data = {
+            "项目": ["资产原值", "累计折旧", "资产净额"],
+            "财务系统": [
+                f"¥{matched_financial_totals['original']:,.2f}",
+                f"¥{matched_financial_totals['depreciation']:,.2f}",
+                f"¥{matched_financial_totals['net']:,.2f}"
+            ],
+            "实物系统": [
+                f"¥{matched_physical_totals['original']:,.2f}",
+                f"¥{matched_physical_totals['depreciation']:,.2f}",
+                f"¥{matched_physical_totals['net']:,.2f}"
+            ],
+            "差异金额": [
+                f"¥{matched_original_diff:,.2f}",
+                f"¥{matched_depreciation_diff:,.2f}",
+                f"¥{matched_net_diff:,.2f}"
+            ],
+            "占总资产比例": [
+                f"{(matched_financial_totals['original'] / total_financial['original'] * 100):.1f}%" if
+                total_financial['original'] > 0 else "0%",
+                f"{(matched_financial_totals['depreciation'] / total_financial['depreciation'] * 100):.1f}%" if
+                total_financial['depreciation'] > 0 else "0%",
+                f"{(matched_financial_totals['net'] / total_financial['net'] * 100):.1f}%" if total_financial[
+                                                                                                  'net'] > 0 else "0%"
+            ]
+        }
+
+        matched_comparison_df = pd.DataFrame(matched_comparison_data)
+        st.dataframe(matched_comparison_df, use_container_width=True, hide_index=True)
+
+        # 已匹配资产基本信息
+        col_matched1, col_matched2, col_matched3 = st.columns(3)
+        with col_matched1:
+            st.metric("已匹配资产数量", f"{matched_financial_totals['count']:,} 项")
+        with col_matched2:
+            overall_match_rate = (matched_count / len(financial_data) * 100) if financial_data else 0
+            st.metric("总体匹配率", f"{overall_match_rate:.1f}%")
+        with col_matched3:
+            st.metric("已匹配资产占比",
+                      f"{(matched_financial_totals['original'] / total_financial['original'] * 100):.1f}%" if
+                      total_financial['original'] > 0 else "0%")
 
-                st.markdown("#### 📊 未匹配资产差异")
-                col_unmatched1, col_unmatched2, col_unmatched3 = st.columns(3)
+        st.divider()
 
-                with col_unmatched1:
-                    st.metric("原值差异", f"¥{unmatched_original_diff:,.2f}",
-                              help="财务未匹配 - 实物未匹配")
-                with col_unmatched2:
-                    st.metric("折旧差异", f"¥{unmatched_depreciation_diff:,.2f}",
-                              help="财务未匹配 - 实物未匹配")
-                with col_unmatched3:
-                    st.metric("净额差异", f"¥{unmatched_net_diff:,.2f}",
-                              help="财务未匹配 - 实物未匹配")
+        # ========== 3. 未匹配资产分析（横向展示） ==========
+        st.markdown("### ⚠️ 未匹配资产分析")
+
+        # 未匹配对比表格
+        unmatched_comparison_data = {
+            "资产类型": ["未匹配财务资产", "未匹配实物资产"],
+            "资产原值": [
+                f"¥{unmatched_financial_totals['original']:,.2f}",
+                f"¥{unmatched_physical_totals['original']:,.2f}"
+            ],
+            "累计折旧": [
+                f"¥{unmatched_financial_totals['depreciation']:,.2f}",
+                f"¥{unmatched_physical_totals['depreciation']:,.2f}"
+            ],
+            "资产净额": [
+                f"¥{unmatched_financial_totals['net']:,.2f}",
+                f"¥{unmatched_physical_totals['net']:,.2f}"
+            ],
+            "资产数量": [
+                f"{unmatched_financial_totals['count']:,} 项",
+                f"{unmatched_physical_totals['count']:,} 项"
+            ],
+            "占比": [
+                f"{(unmatched_financial_totals['original'] / total_financial['original'] * 100):.1f}%" if
+                total_financial['original'] > 0 else "0%",
+                f"{(unmatched_physical_totals['original'] / total_physical['original'] * 100):.1f}%" if
+                total_physical['original'] > 0 else "0%"
+            ]
+        }
+
+        unmatched_comparison_df = pd.DataFrame(unmatched_comparison_data)
+        st.dataframe(unmatched_comparison_df, use_container_width=True, hide_index=True)
+
+        # 未匹配资产差异分析
+        unmatched_original_diff = unmatched_financial_totals['original'] - unmatched_physical_totals['original']
+        unmatched_depreciation_diff = unmatched_financial_totals['depreciation'] - unmatched_physical_totals[
+            'depreciation']
+        unmatched_net_diff = unmatched_financial_totals['net'] - unmatched_physical_totals['net']
+
+        st.markdown("#### 📊 未匹配资产差异")
+        col_unmatched1, col_unmatched2, col_unmatched3 = st.columns(3)
+
+        with col_unmatched1:
+            st.metric("原值差异", f"¥{unmatched_original_diff:,.2f}",
+                      help="财务未匹配 - 实物未匹配")
+        with col_unmatched2:
+            st.metric("折旧差异", f"¥{unmatched_depreciation_diff:,.2f}",
+                      help="财务未匹配 - 实物未匹配")
+        with col_unmatched3:
+            st.metric("净额差异", f"¥{unmatched_net_diff:,.2f}",
+                      help="财务未匹配 - 实物未匹配")
 
-                st.divider()
+        st.divider()
 
-                # ========== 4. 可视化图表 ==========
-                st.markdown("### 📊 差异可视化分析")
+        # ========== 4. 可视化图表 ==========
+        st.markdown("### 📊 差异可视化分析")
 
-                # 创建图表数据
-                chart_col1, chart_col2 = st.columns(2)
+        # 创建图表数据
+        chart_col1, chart_col2 = st.columns(2)
 
-                with chart_col1:
-                    st.markdown("#### 📈 匹配状态分布")
+        with chart_col1:
+            st.markdown("#### 📈 匹配状态分布")
 
-                    # 准备匹配状态数据
-                    financial_match_data = pd.DataFrame({
-                        "状态": ["已匹配", "未匹配"],
-                        "数量": [matched_count, len(unmatched_financial)],
-                        "金额": [matched_financial_totals['original'], unmatched_financial_totals['original']]
-                    })
+            # 准备匹配状态数据
+            financial_match_data = pd.DataFrame({
+                "状态": ["已匹配", "未匹配"],
+                "数量": [matched_count, unmatched_financial_totals['count']],
+                "金额": [matched_financial_totals['original'], unmatched_financial_totals['original']]
+            })
 
-                    physical_match_data = pd.DataFrame({
-                        "状态": ["已匹配", "未匹配"],
-                        "数量": [len(matched_physical), len(unmatched_physical)],
-                        "金额": [matched_physical_totals['original'], unmatched_physical_totals['original']]
-                    })
+            physical_match_data = pd.DataFrame({
+                "状态": ["已匹配", "未匹配"],
+                "数量": [matched_physical_totals['count'], unmatched_physical_totals['count']],
+                "金额": [matched_physical_totals['original'], unmatched_physical_totals['original']]
+            })
 
-                    # 尝试使用plotly绘图
-                    try:
-                        import plotly.express as px
-                        import plotly.graph_objects as go
-                        from plotly.subplots import make_subplots
-
-                        # 创建子图
-                        fig = make_subplots(
-                            rows=1, cols=2,
-                            subplot_titles=('财务资产匹配状态', '实物资产匹配状态'),
-                            specs=[[{"type": "pie"}, {"type": "pie"}]]
-                        )
+            # 尝试使用plotly绘图
+            try:
+                import plotly.express as px
+                import plotly.graph_objects as go
+                from plotly.subplots import make_subplots
+
+                # 创建子图
+                fig = make_subplots(
+                    rows=1, cols=2,
+                    subplot_titles=('财务资产匹配状态', '实物资产匹配状态'),
+                    specs=[[{"type": "pie"}, {"type": "pie"}]]
+                )
 
-                        # 财务资产饼图
-                        fig.add_trace(
-                            go.Pie(
-                                labels=financial_match_data["状态"],
-                                values=financial_match_data["金额"],
-                                name="财务资产",
-                                marker_colors=['#2E8B57', '#DC143C']
-                            ),
-                            row=1, col=1
-                        )
+                # 财务资产饼图
+                fig.add_trace(
+                    go.Pie(
+                        labels=financial_match_data["状态"],
+                        values=financial_match_data["金额"],
+                        name="财务资产",
+                        marker_colors=['#2E8B57', '#DC143C']
+                    ),
+                    row=1, col=1
+                )
 
-                        # 实物资产饼图
-                        fig.add_trace(
-                            go.Pie(
-                                labels=physical_match_data["状态"],
-                                values=physical_match_data["金额"],
-                                name="实物资产",
-                                marker_colors=['#4682B4', '#FF6347']
-                            ),
-                            row=1, col=2
-                        )
+                # 实物资产饼图
+                fig.add_trace(
+                    go.Pie(
+                        labels=physical_match_data["状态"],
+                        values=physical_match_data["金额"],
+                        name="实物资产",
+                        marker_colors=['#4682B4', '#FF6347']
+                    ),
+                    row=1, col=2
+                )
 
-                        fig.update_layout(height=400, showlegend=True)
-                        st.plotly_chart(fig, use_container_width=True)
+                fig.update_layout(height=400, showlegend=True)
+                st.plotly_chart(fig, use_container_width=True)
 
-                    except ImportError:
-                        # 使用streamlit原生图表
-                        st.write("**财务资产匹配状态**")
-                        fin_chart_data = pd.DataFrame({
-                            '已匹配': [matched_financial_totals['original']],
-                            '未匹配': [unmatched_financial_totals['original']]
-                        })
-                        st.bar_chart(fin_chart_data)
+            except ImportError:
+                # 使用streamlit原生图表
+                st.write("**财务资产匹配状态**")
+                fin_chart_data = pd.DataFrame({
+                    '已匹配': [matched_financial_totals['original']],
+                    '未匹配': [unmatched_financial_totals['original']]
+                })
+                st.bar_chart(fin_chart_data)
 
-                        st.write("**实物资产匹配状态**")
-                        phy_chart_data = pd.DataFrame({
-                            '已匹配': [matched_physical_totals['original']],
-                            '未匹配': [unmatched_physical_totals['original']]
-                        })
-                        st.bar_chart(phy_chart_data)
+                st.write("**实物资产匹配状态**")
+                phy_chart_data = pd.DataFrame({
+                    '已匹配': [matched_physical_totals['original']],
+                    '未匹配': [unmatched_physical_totals['original']]
+                })
+                st.bar_chart(phy_chart_data)
 
-                with chart_col2:
-                    st.markdown("#### 📊 差异对比分析")
+        with chart_col2:
+            st.markdown("#### 📊 差异对比分析")
 
-                    # 准备差异对比数据
-                    diff_comparison_data = pd.DataFrame({
-                        "差异类型": ["资产原值", "累计折旧", "资产净额"],
-                        "总体差异": [total_original_diff, total_depreciation_diff, total_net_diff],
-                        "已匹配差异": [matched_original_diff, matched_depreciation_diff, matched_net_diff],
-                        "未匹配差异": [unmatched_original_diff, unmatched_depreciation_diff, unmatched_net_diff]
-                    })
+            # 准备差异对比数据
+            diff_comparison_data = pd.DataFrame({
+                "差异类型": ["资产原值", "累计折旧", "资产净额"],
+                "总体差异": [total_original_diff, total_depreciation_diff, total_net_diff],
+                "已匹配差异": [matched_original_diff, matched_depreciation_diff, matched_net_diff],
+                "未匹配差异": [unmatched_original_diff, unmatched_depreciation_diff, unmatched_net_diff]
+            })
 
-                    try:
-                        # 差异对比柱状图
-                        fig_diff = px.bar(
-                            diff_comparison_data,
-                            x="差异类型",
-                            y=["总体差异", "已匹配差异", "未匹配差异"],
-                            title="各类差异对比分析",
-                            barmode="group",
-                            color_discrete_map={
-                                "总体差异": "#FF6B6B",
-                                "已匹配差异": "#4ECDC4",
-                                "未匹配差异": "#45B7D1"
-                            }
-                        )
-                        fig_diff.update_layout(
-                            xaxis_title="差异类型",
-                            yaxis_title="差异金额（元）",
-                            height=400
-                        )
-                        st.plotly_chart(fig_diff, use_container_width=True)
-
-                    except ImportError:
-                        # 使用streamlit原生图表
-                        chart_data = diff_comparison_data.set_index("差异类型")[
-                            ["总体差异", "已匹配差异", "未匹配差异"]]
-                        st.bar_chart(chart_data)
-
-                # 关键指标汇总（横向展示）
-                st.markdown("#### 📊 关键指标汇总")
-
-                key_metrics_data = {
-                    "指标": ["总体匹配率", "总价值差异", "已匹配项目", "待处理项目", "匹配资产占比"],
-                    "数值": [
-                        f"{overall_match_rate:.1f}%",
-                        f"¥{abs(total_original_diff):,.0f}",
-                        f"{matched_count:,} 项",
-                        f"{unmatched_financial_totals['count'] + unmatched_physical_totals['count']:,} 项",
-                        f"{(matched_financial_totals['original'] / total_financial['original'] * 100):.1f}%" if
-                        total_financial['original'] > 0 else "0%"
-                    ]
-                }
+            try:
+                # 差异对比柱状图
+                fig_diff = px.bar(
+                    diff_comparison_data,
+                    x="差异类型",
+                    y=["总体差异", "已匹配差异", "未匹配差异"],
+                    title="各类差异对比分析",
+                    barmode="group",
+                    color_discrete_map={
+                        "总体差异": "#FF6B6B",
+                        "已匹配差异": "#4ECDC4",
+                        "未匹配差异": "#45B7D1"
+                    }
+                )
+                fig_diff.update_layout(
+                    xaxis_title="差异类型",
+                    yaxis_title="差异金额（元）",
+                    height=400
+                )
+                st.plotly_chart(fig_diff, use_container_width=True)
+
+            except ImportError:
+                # 使用streamlit原生图表
+                chart_data = diff_comparison_data.set_index("差异类型")[
+                    ["总体差异", "已匹配差异", "未匹配差异"]]
+                st.bar_chart(chart_data)
+
+        # 关键指标汇总（横向展示）
+        st.markdown("#### 📊 关键指标汇总")
+
+        key_metrics_data = {
+            "指标": ["总体匹配率", "总价值差异", "已匹配项目", "待处理项目", "匹配资产占比"],
+            "数值": [
+                f"{overall_match_rate:.1f}%",
+                f"¥{abs(total_original_diff):,.0f}",
+                f"{matched_count:,} 项",
+                f"{unmatched_financial_totals['count'] + unmatched_physical_totals['count']:,} 项",
+                f"{(matched_financial_totals['original'] / total_financial['original'] * 100):.1f}%" if
+                total_financial['original'] > 0 else "0%"
+            ]
+        }
 
-                key_metrics_df = pd.DataFrame(key_metrics_data)
-                st.dataframe(key_metrics_df, use_container_width=True, hide_index=True)
-
-                # 导出功能
-                st.divider()
-                if st.button("📥 导出差异分析报告", key="export_analysis"):
-                    # 创建导出数据
-                    export_data = []
-
-                    # 总体对比数据
-                    export_data.extend([
-                        {"分类": "总体对比", "项目": "财务资产原值", "金额": total_financial['original']},
-                        {"分类": "总体对比", "项目": "实物资产原值", "金额": total_physical['original']},
-                        {"分类": "总体对比", "项目": "原值差异", "金额": total_original_diff},
-                        {"分类": "总体对比", "项目": "财务累计折旧", "金额": total_financial['depreciation']},
-                        {"分类": "总体对比", "项目": "实物累计折旧", "金额": total_physical['depreciation']},
-                        {"分类": "总体对比", "项目": "折旧差异", "金额": total_depreciation_diff},
-                        {"分类": "总体对比", "项目": "财务资产净额", "金额": total_financial['net']},
-                        {"分类": "总体对比", "项目": "实物资产净额", "金额": total_physical['net']},
-                        {"分类": "总体对比", "项目": "净额差异", "金额": total_net_diff}
-                    ])
-
-                    # 已匹配资产数据
-                    export_data.extend([
-                        {"分类": "已匹配资产", "项目": "财务资产原值", "金额": matched_financial_totals['original']},
-                        {"分类": "已匹配资产", "项目": "实物资产原值", "金额": matched_physical_totals['original']},
-                        {"分类": "已匹配资产", "项目": "原值差异", "金额": matched_original_diff},
-                        {"分类": "已匹配资产", "项目": "财务累计折旧",
-                         "金额": matched_financial_totals['depreciation']},
-                        {"分类": "已匹配资产", "项目": "实物累计折旧", "金额": matched_physical_totals['depreciation']},
-                        {"分类": "已匹配资产", "项目": "折旧差异", "金额": matched_depreciation_diff},
-                        {"分类": "已匹配资产", "项目": "财务资产净额", "金额": matched_financial_totals['net']},
-                        {"分类": "已匹配资产", "项目": "实物资产净额", "金额": matched_physical_totals['net']},
-                        {"分类": "已匹配资产", "项目": "净额差异", "金额": matched_net_diff},
-                        {"分类": "已匹配资产", "项目": "匹配数量", "金额": matched_financial_totals['count']}
-                    ])
-
-                    # 未匹配资产数据
-                    export_data.extend([
-                        {"分类": "未匹配财务资产", "项目": "资产原值", "金额": unmatched_financial_totals['original']},
-                        {"分类": "未匹配财务资产", "项目": "累计折旧",
-                         "金额": unmatched_financial_totals['depreciation']},
-                        {"分类": "未匹配财务资产", "项目": "资产净额", "金额": unmatched_financial_totals['net']},
-                        {"分类": "未匹配财务资产", "项目": "数量", "金额": unmatched_financial_totals['count']},
-                        {"分类": "未匹配实物资产", "项目": "资产原值", "金额": unmatched_physical_totals['original']},
-                        {"分类": "未匹配实物资产", "项目": "累计折旧",
-                         "金额": unmatched_physical_totals['depreciation']},
-                        {"分类": "未匹配实物资产", "项目": "资产净额", "金额": unmatched_physical_totals['net']},
-                        {"分类": "未匹配实物资产", "项目": "数量", "金额": unmatched_physical_totals['count']}
-                    ])
-
-                    export_df = pd.DataFrame(export_data)
-                    csv = export_df.to_csv(index=False, encoding='utf-8-sig')
+        key_metrics_df = pd.DataFrame(key_metrics_data)
+        st.dataframe(key_metrics_df, use_container_width=True, hide_index=True)
 
-                    st.download_button(
-                        label="💾 下载差异分析报告 CSV",
-                        data=csv,
-                        file_name=f"资产差异分析报告_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        mime="text/csv"
-                    )
+        # 导出功能
+        st.divider()
+        if st.button("📥 导出差异分析报告", key="export_analysis"):
+            # 创建导出数据
+            export_data = []
+
+            # 总体对比数据
+            export_data.extend([
+                {"分类": "总体对比", "项目": "财务资产原值", "金额": total_financial['original']},
+                {"分类": "总体对比", "项目": "实物资产原值", "金额": total_physical['original']},
+                {"分类": "总体对比", "项目": "原值差异", "金额": total_original_diff},
+                {"分类": "总体对比", "项目": "财务累计折旧", "金额": total_financial['depreciation']},
+                {"分类": "总体对比", "项目": "实物累计折旧", "金额": total_physical['depreciation']},
+                {"分类": "总体对比", "项目": "折旧差异", "金额": total_depreciation_diff},
+                {"分类": "总体对比", "项目": "财务资产净额", "金额": total_financial['net']},
+                {"分类": "总体对比", "项目": "实物资产净额", "金额": total_physical['net']},
+                {"分类": "总体对比", "项目": "净额差异", "金额": total_net_diff}
+            ])
+
+            # 已匹配资产数据
+            export_data.extend([
+                {"分类": "已匹配资产", "项目": "财务资产原值", "金额": matched_financial_totals['original']},
+                {"分类": "已匹配资产", "项目": "实物资产原值", "金额": matched_physical_totals['original']},
+                {"分类": "已匹配资产", "项目": "原值差异", "金额": matched_original_diff},
+                {"分类": "已匹配资产", "项目": "财务累计折旧",
+                 "金额": matched_financial_totals['depreciation']},
+                {"分类": "已匹配资产", "项目": "实物累计折旧", "金额": matched_physical_totals['depreciation']},
+                {"分类": "已匹配资产", "项目": "折旧差异", "金额": matched_depreciation_diff},
+                {"分类": "已匹配资产", "项目": "财务资产净额", "金额": matched_financial_totals['net']},
+                {"分类": "已匹配资产", "项目": "实物资产净额", "金额": matched_physical_totals['net']},
+                {"分类": "已匹配资产", "项目": "净额差异", "金额": matched_net_diff},
+                {"分类": "已匹配资产", "项目": "匹配数量", "金额": matched_financial_totals['count']}
+            ])
+
+            # 未匹配资产数据
+            export_data.extend([
+                {"分类": "未匹配财务资产", "项目": "资产原值", "金额": unmatched_financial_totals['original']},
+                {"分类": "未匹配财务资产", "项目": "累计折旧",
+                 "金额": unmatched_financial_totals['depreciation']},
+                {"分类": "未匹配财务资产", "项目": "资产净额", "金额": unmatched_financial_totals['net']},
+                {"分类": "未匹配财务资产", "项目": "数量", "金额": unmatched_financial_totals['count']},
+                {"分类": "未匹配实物资产", "项目": "资产原值", "金额": unmatched_physical_totals['original']},
+                {"分类": "未匹配实物资产", "项目": "累计折旧",
+                 "金额": unmatched_physical_totals['depreciation']},
+                {"分类": "未匹配实物资产", "项目": "资产净额", "金额": unmatched_physical_totals['net']},
+                {"分类": "未匹配实物资产", "项目": "数量", "金额": unmatched_physical_totals['count']}
+            ])
+
+            export_df = pd.DataFrame(export_data)
+            csv = export_df.to_csv(index=False, encoding='utf-8-sig')
+
+            st.download_button(
+                label="💾 下载差异分析报告 CSV",
+                data=csv,
+                file_name=f"资产差异分析报告_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                mime="text/csv"
+            )
 
-                    st.success("✅ 报告已准备就绪，点击上方按钮下载")
+            st.success("✅ 报告已准备就绪，点击上方按钮下载")
 
     # ========== Tab 3: 可视化分析 ==========
-    with tab_charts:
+    if selected_tab == "📈 可视化分析":
         st.subheader("📈 可视化分析")
 
-        chart_tab1, chart_tab2, chart_tab3 = st.tabs(["💰 价值分布", "🎯 匹配状态", "🏢 部门分析"])
+        try:
+            import plotly.express as px
+        except ImportError:
+            px = None  # 无 plotly 时各图表回退到 streamlit 原生图表
+
+        chart_tab = tab_selector(["💰 价值分布", "🎯 匹配状态", "🏢 部门分析", "🧊 多维分析"], key="stats_chart_tab")
 
-        with chart_tab1:
+        if chart_tab == "💰 价值分布":
             # 价值对比图
             col_chart1, col_chart2 = st.columns(2)
 
@@ -3398,27 +5493,11 @@ def data_statistics_page():
 
             with col_chart2:
                 # 匹配vs未匹配价值对比
-                unmatched_financial = [f for f in financial_data if
-                                       str(f.get("资产编号+序号", "")).strip() not in financial_to_physical_mapping]
-                unmatched_physical = [p for p in physical_data if
-                                      str(p.get("固定资产编码", "")).strip() not in physical_to_financial_mapping]
-
-                unmatched_financial_value = sum(safe_get_value(f, "资产价值") for f in unmatched_financial)
+                unmatched_financial_value = financial_totals["unmatched"]["original"]
                 matched_financial_value = financial_total_value - unmatched_financial_value
 
-                # 实物资产去重计算
-                if unmatched_physical:
-                    unmatched_physical_df = pd.DataFrame(unmatched_physical)
-                    if "固定资产编码" in unmatched_physical_df.columns:
-                        unmatched_physical_df_deduped = unmatched_physical_df.drop_duplicates(
-                            subset=['固定资产编码'], keep='first')
-                        unmatched_physical_value = sum(
-                            safe_get_value(row.to_dict(), "固定资产原值")
-                            for _, row in unmatched_physical_df_deduped.iterrows())
-                    else:
-                        unmatched_physical_value = sum(safe_get_value(p, "固定资产原值") for p in unmatched_physical)
-                else:
-                    unmatched_physical_value = 0
+                # 实物资产去重计算（每个未匹配编码取第一条记录）
+                unmatched_physical_value = physical_totals["unmatched"]["deduped_original"]
 
                 matched_physical_value = physical_total_value - unmatched_physical_value
 
@@ -3442,7 +5521,7 @@ def data_statistics_page():
                 except:
                     st.bar_chart(match_status_data.set_index("状态"))
 
-        with chart_tab2:
+        if chart_tab == "🎯 匹配状态":
             # 匹配状态分布
             col_dist1, col_dist2 = st.columns(2)
 
@@ -3488,34 +5567,15 @@ def data_statistics_page():
                     st.write("**实物资产匹配状态**")
                     st.dataframe(physical_match_data)
 
-        with chart_tab3:
-            # 部门分析图表
-            # 计算部门统计
-            financial_dept_stats = {}
-            for f in financial_data:
-                dept = f.get("部门名称", "未知部门")
-                if dept not in financial_dept_stats:
-                    financial_dept_stats[dept] = {"count": 0, "value": 0, "matched": 0}
-                financial_dept_stats[dept]["count"] += 1
-                financial_dept_stats[dept]["value"] += safe_get_value(f, "资产价值")
-
-                financial_code = str(f.get("资产编号+序号", "")).strip()
-                if financial_code in financial_to_physical_mapping:
-                    financial_dept_stats[dept]["matched"] += 1
-
-            # 部门价值对比
-            dept_chart_data = []
-            for dept, stats in financial_dept_stats.items():
-                dept_chart_data.append({
-                    "部门": dept,
-                    "总价值": stats["value"],
-                    "资产数量": stats["count"],
-                    "匹配率": (stats["matched"] / stats["count"] * 100) if stats["count"] > 0 else 0
-                })
+        if chart_tab == "🏢 部门分析":
+            # 部门分析图表（资产立方体按部门上卷）
+            dept_ledger = st.radio("台账", ["财务系统", "实物台账"], horizontal=True, key="stats_dept_ledger")
+            dept_cube = snapshot["cubes"]["financial" if dept_ledger == "财务系统" else "physical"]
 
-            if dept_chart_data:
-                dept_df = pd.DataFrame(dept_chart_data)
-                dept_df = dept_df.sort_values("总价值", ascending=False).head(10)  # 显示前10个部门
+            if len(dept_cube):
+                dept_summary = rollup_cube(dept_cube, by=("部门",))
+                dept_summary["部门"] = dept_summary["部门"].fillna("未知部门")
+                dept_df = dept_summary.sort_values("总价值", ascending=False).head(10)  # 显示前10个部门
 
                 col_dept1, col_dept2 = st.columns(2)
 
@@ -3554,15 +5614,20 @@ def data_statistics_page():
 
                 # 部门详细统计表
                 st.markdown("#### 📊 部门统计详情")
-                dept_detail_df = dept_df.copy()
-                dept_detail_df["总价值"] = dept_detail_df["总价值"].apply(lambda x: f"¥{x:,.2f}")
-                dept_detail_df["匹配率"] = dept_detail_df["匹配率"].apply(lambda x: f"{x:.1f}%")
-
                 st.dataframe(
-                    dept_detail_df[["部门", "资产数量", "总价值", "匹配率"]],
-                    use_container_width=True
+                    dept_df[["部门", "资产数量", "总价值", "匹配率"]],
+                    use_container_width=True,
+                    column_config=number_column_config(["总价值"], ["匹配率"])
                 )
 
+                with st.expander("📂 部门 × 分类明细", expanded=False):
+                    category_detail_df = rollup_cube(dept_cube, by=("部门", "分类")).fillna(
+                        {"部门": "未知部门", "分类": "未分类"}).sort_values(
+                        ["部门", "总价值"], ascending=[True, False])
+                    st.dataframe(category_detail_df[["部门", "分类", "资产数量", "总价值", "匹配率"]],
+                                 use_container_width=True, hide_index=True,
+                                 column_config=number_column_config(["总价值"], ["匹配率"]))
+
                 # 部门匹配率分析
                 st.markdown("#### 🎯 部门匹配率分析")
 
@@ -3590,13 +5655,63 @@ def data_statistics_page():
                 # 显示需要关注的部门
                 if len(low_match_depts) > 0:
                     with st.expander("🔍 低匹配率部门详情", expanded=False):
-                        low_match_display = low_match_depts[["部门", "资产数量", "匹配率"]].copy()
-                        low_match_display["匹配率"] = low_match_display["匹配率"].apply(lambda x: f"{x:.1f}%")
-                        st.dataframe(low_match_display, use_container_width=True)
+                        st.dataframe(low_match_depts[["部门", "资产数量", "匹配率"]], use_container_width=True,
+                                     column_config=number_column_config(percent_columns=["匹配率"]))
                         st.warning("💡 建议优先处理这些部门的资产匹配工作")
 
             else:
                 st.info("暂无部门数据可供分析")
+
+        if chart_tab == "🧊 多维分析":
+            # 在预聚合的资产立方体上切片、上卷，不再扫描台账
+            cube_ledger = st.radio("台账", ["财务系统", "实物台账"], horizontal=True, key="stats_cube_ledger")
+            cube = snapshot["cubes"]["financial" if cube_ledger == "财务系统" else "physical"]
+            missing_labels = {"部门": "未知部门", "分类": "未分类"}
+
+            def cube_label(dimension, value):
+                if pd.isna(value):
+                    return missing_labels.get(dimension, "")
+                return str(value) if str(value).strip() else "（空白）"
+
+            def cube_filter(column, dimension, key):
+                values = rollup_cube(cube, by=(dimension,))[dimension].tolist()
+                options = {cube_label(dimension, value): value for value in values}
+                with column:
+                    choice = st.selectbox(f"{dimension}筛选", ["全部"] + sorted(options), key=key)
+                return {} if choice == "全部" else {dimension: options[choice]}
+
+            col_dims, col_dept, col_category, col_status = st.columns(4)
+            with col_dims:
+                group_by = st.multiselect("汇总维度", CUBE_DIMENSIONS, default=["部门"], key="stats_cube_dims")
+            filters = {}
+            filters.update(cube_filter(col_dept, "部门", "stats_cube_dept"))
+            filters.update(cube_filter(col_category, "分类", "stats_cube_category"))
+            filters.update(cube_filter(col_status, "匹配状态", "stats_cube_status"))
+
+            # 当前切片合计
+            cube_total = rollup_cube(cube, by=(), filters=filters).iloc[0]
+            col_total1, col_total2, col_total3, col_total4 = st.columns(4)
+            with col_total1:
+                st.metric("资产数量", f"{int(cube_total['资产数量']):,} 项")
+            with col_total2:
+                st.metric("资产原值", f"¥{cube_total['总价值']:,.2f}")
+            with col_total3:
+                st.metric("资产净额", f"¥{cube_total['净额']:,.2f}")
+            with col_total4:
+                st.metric("匹配率", f"{cube_total['匹配率']:.1f}%")
+
+            if group_by:
+                cube_view = rollup_cube(cube, by=group_by, filters=filters).sort_values("总价值", ascending=False)
+                for dimension in group_by:
+                    cube_view[dimension] = [cube_label(dimension, value) for value in cube_view[dimension]]
+                if len(group_by) == 1 and len(cube_view):
+                    st.bar_chart(cube_view.set_index(group_by[0])["总价值"].head(20))
+
+                st.dataframe(cube_view.rename(columns={"总价值": "资产原值", "已匹配": "已匹配数量"}),
+                             use_container_width=True, hide_index=True,
+                             column_config=number_column_config(["资产原值", "累计折旧", "净额"], ["匹配率"]))
+            else:
+                st.info("💡 选择汇总维度后可逐级下钻（如 部门 → 分类 → 匹配状态）")
         # ========== 页面底部汇总信息 ==========
     st.divider()
     st.markdown("### 📋 数据统计汇总")
@@ -3608,9 +5723,9 @@ def data_statistics_page():
         st.markdown("#### 📊 数据概况")
         st.write(f"• 财务资产总数：**{len(financial_data):,}** 项")
         st.write(
-            f"• 实物资产总数：**{st.session_state.get('physical_deduped_count', len(physical_data)):,}** 项（去重后）")
+            f"• 实物资产总数：**{physical_valuation['deduped_count']:,}** 项（去重后）")
         st.write(f"• 映射关系总数：**{len(mapping_data):,}** 条")
-        st.write(f"• 整体匹配率：**{overall_match_rate:.1f}%**")
+        st.write(f"• 整体匹配率：**{financial_match_rate:.1f}%**")
 
     with summary_col2:
         st.markdown("#### 💰 价值概况")
@@ -3667,10 +5782,8 @@ def all_data_view_page():
                 st.error("❌ 实物数据格式错误：缺少'固定资产编码'列")
                 st.write("实物数据当前列名：", list(physical_df_check.columns))
                 return
-    # 创建索引
-    financial_index = create_data_index(financial_data, "资产编号+序号")
-    physical_index = create_data_index(physical_data, "固定资产编码")
-    financial_to_physical_mapping, physical_to_financial_mapping = create_mapping_index(mapping_data)
+    # 加载索引
+    index_bundle = get_index_bundle(financial_data, physical_data, mapping_data)
 
     # 选择查看模式
     view_mode = st.selectbox("选择查看模式",
@@ -3679,63 +5792,10 @@ def all_data_view_page():
     if view_mode == "对应关系汇总":
         st.subheader("🔗 完整对应关系汇总")
 
-        # 构建汇总数据 - 修复：处理多对多关系
-        mapping_summary = []
-
-        # 用集合记录已处理的映射关系，避免重复
-        processed_pairs = set()
-
-        for mapping_record in mapping_data:
-            financial_code = str(mapping_record.get("资产编号+序号", "")).strip()
-            physical_code = str(mapping_record.get("固定资产编码", "")).strip()
-
-            # 创建唯一标识符避免重复处理
-            pair_key = f"{financial_code}|{physical_code}"
-            if pair_key in processed_pairs:
-                continue
-            processed_pairs.add(pair_key)
-
-            if financial_code and physical_code:
-                financial_record = financial_index.get(financial_code)
-                physical_record = physical_index.get(physical_code)
-
-                if financial_record and physical_record:
-                    financial_value = safe_get_value(financial_record, "资产价值")
-                    physical_value = safe_get_value(physical_record, "资产价值")
-
-                    mapping_summary.append({
-                        "资产编号+序号": financial_code,
-                        "财务资产名称": financial_record.get("资产名称", ""),
-                        "财务资产价值": financial_value,
-                        "财务部门": financial_record.get("部门名称", ""),
-                        "财务保管人": financial_record.get("保管人", ""),
-                        "实物台账编号": physical_code,
-                        "实物资产名称": physical_record.get("固定资产名称", ""),
-                        "实物资产价值": physical_value,
-                        "实物部门": physical_record.get("存放部门", ""),
-                        "实物保管人": physical_record.get("保管人", ""),
-                        "价值差异": financial_value - physical_value,
-                        "状态": "正常匹配"
-                    })
-                else:
-                    # 记录映射存在但数据缺失的情况
-                    mapping_summary.append({
-                        "资产编号+序号": financial_code,
-                        "财务资产名称": "数据缺失" if not financial_record else financial_record.get("资产名称", ""),
-                        "财务资产价值": 0 if not financial_record else safe_get_value(financial_record, "资产价值"),
-                        "财务部门": "数据缺失" if not financial_record else financial_record.get("部门名称", ""),
-                        "财务保管人": "数据缺失" if not financial_record else financial_record.get("保管人", ""),
-                        "实物台账编号": physical_code,
-                        "实物资产名称": "数据缺失" if not physical_record else physical_record.get("固定资产名称", ""),
-                        "实物资产价值": 0 if not physical_record else safe_get_value(physical_record, "资产价值"),
-                        "实物部门": "数据缺失" if not physical_record else physical_record.get("存放部门", ""),
-                        "实物保管人": "数据缺失" if not physical_record else physical_record.get("保管人", ""),
-                        "价值差异": 0,
-                        "状态": "数据异常"
-                    })
+        # 汇总数据：映射 ⋈ 财务 ⋈ 实物 的向量化连接，每个数据集版本构建一次
+        df = get_mapping_summary(index_bundle, financial_data, physical_data)
 
-        if mapping_summary:
-            df = pd.DataFrame(mapping_summary)
+        if len(df):
 
             # 添加筛选功能
             col1, col2, col3 = st.columns(3)
@@ -3753,7 +5813,7 @@ def all_data_view_page():
                 search_term = st.text_input("搜索资产名称")
 
             # 应用筛选
-            filtered_df = df.copy()
+            filtered_df = df  # 汇总表为缓存共享对象，筛选只生成新视图，不修改原表
 
             if dept_filter != "全部":
                 filtered_df = filtered_df[
@@ -3774,31 +5834,12 @@ def all_data_view_page():
 
             st.info(f"共 {len(filtered_df)} 条记录（总映射关系 {len(df)} 条）")
 
-            # 格式化显示数值
-            display_df = filtered_df.copy()
-            display_df["财务资产价值"] = display_df["财务资产价值"].apply(
-                lambda x: f"¥{x:,.2f}" if isinstance(x, (int, float)) else x)
-            display_df["实物资产价值"] = display_df["实物资产价值"].apply(
-                lambda x: f"¥{x:,.2f}" if isinstance(x, (int, float)) else x)
-            display_df["价值差异"] = display_df["价值差异"].apply(
-                lambda x: f"¥{x:,.2f}" if isinstance(x, (int, float)) else x)
-
-            st.dataframe(display_df, use_container_width=True)
+            paginated_dataframe(filtered_df, key="mapping_summary_table",
+                                currency_columns=["财务资产价值", "实物资产价值", "价值差异"])
 
             # 导出功能
-            if st.button("📥 导出为Excel"):
-                try:
-                    output = io.BytesIO()
-                    filtered_df.to_excel(output, index=False, engine='openpyxl')
-                    output.seek(0)
-                    st.download_button(
-                        label="下载Excel文件",
-                        data=output,
-                        file_name=f"资产对应关系汇总_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
-                except Exception as e:
-                    st.error(f"导出失败: {str(e)}")
+            excel_export_button("📥 导出为Excel", "对应关系汇总", (dept_filter, diff_filter, search_term),
+                                lambda: {'Sheet1': filtered_df}, "资产对应关系汇总", key="export_mapping_summary")
         else:
             st.warning("⚠️ 暂无映射关系数据")
 
@@ -3809,7 +5850,8 @@ def all_data_view_page():
             st.warning("⚠️ 暂无财务系统数据")
             return
 
-        df = pd.DataFrame(financial_data)
+        # 基础表（含匹配状态、对应实物编号），每个数据集版本构建一次
+        df = get_detail_frame(FINANCIAL_DATA_FILE, index_bundle, financial_data)
 
         # 检查必需列是否存在
         if "资产编号+序号" not in df.columns:
@@ -3817,39 +5859,21 @@ def all_data_view_page():
             st.write("当前列名：", list(df.columns))
             return
 
-        # 修复：正确添加匹配状态列
-        df["匹配状态"] = df["资产编号+序号"].astype(str).apply(
-            lambda x: "已匹配" if str(x).strip() in financial_to_physical_mapping else "未匹配")
-
-        # 添加对应实物编号列
-        df["对应实物编号"] = df["资产编号+序号"].astype(str).apply(
-            lambda x: ", ".join(financial_to_physical_mapping.get(str(x).strip(), [])) if str(
-                x).strip() in financial_to_physical_mapping else "无")
-
         # 筛选功能
         col1, col2, col3 = st.columns(3)
         with col1:
             match_filter = st.selectbox("匹配状态", ["全部", "已匹配", "未匹配"])
         with col2:
-            # 部门筛选
-            all_depts = sorted([dept for dept in df["部门名称"].unique() if dept and str(dept).strip()])
-            dept_filter = st.selectbox("按部门筛选", ["全部"] + all_depts, key="financial_dept_filter")
+            # 部门筛选（选项取自资产立方体）
+            asset_cubes = get_stats_snapshot(index_bundle, financial_data, physical_data)["cubes"]
+            all_depts, dept_labels = department_filter_options(asset_cubes["financial"])
+            dept_filter = st.selectbox("按部门筛选", ["全部"] + all_depts, key="financial_dept_filter",
+                                       format_func=lambda dept: dept_labels.get(dept, dept))
         with col3:
             search_term = st.text_input("搜索资产", key="financial_search")
 
-        filtered_df = df.copy()
-
-        if match_filter != "全部":
-            filtered_df = filtered_df[filtered_df["匹配状态"] == match_filter]
-
-        if dept_filter != "全部":
-            filtered_df = filtered_df[filtered_df["部门名称"] == dept_filter]
-
-        if search_term:
-            filtered_df = filtered_df[
-                filtered_df["资产名称"].astype(str).str.contains(search_term, case=False, na=False) |
-                filtered_df["资产编号+序号"].astype(str).str.contains(search_term, case=False, na=False)
-                ]
+        # 筛选流水线：各阶段结果按参数缓存，只重算变化的阶段
+        filtered_df = df.iloc[filter_detail_rows(FINANCIAL_DATA_FILE, df, dept_filter, match_filter, search_term)]
 
         st.info(f"共 {len(filtered_df)} 条记录（总财务资产 {len(df)} 条）")
 
@@ -3858,15 +5882,8 @@ def all_data_view_page():
         default_columns = ["资产编号+序号", "资产名称", "资产分类", "资产价值", "累计折旧", "资产净额", "部门名称", "保管人", "匹配状态", "对应实物编号"]
         display_columns = [col for col in default_columns if col in available_columns]
 
-        # 格式化显示
-        display_df = filtered_df[display_columns].copy()
-        # 格式化所有金额字段
-        for amount_col in ["资产价值", "累计折旧", "资产净额"]:
-            if amount_col in display_df.columns:
-                display_df[amount_col] = display_df[amount_col].apply(
-                    lambda x: f"¥{x:,.2f}" if isinstance(x, (int, float)) else x)
-
-        st.dataframe(display_df, use_container_width=True)
+        paginated_dataframe(filtered_df[display_columns], key="financial_detail_table",
+                            currency_columns=["资产价值", "累计折旧", "资产净额"])
 
         # 统计信息
         col1, col2, col3 = st.columns(3)
@@ -3919,7 +5936,8 @@ def all_data_view_page():
 
             return
 
-        df = pd.DataFrame(physical_data)
+        # 基础表（含匹配状态、对应财务编号），每个数据集版本构建一次
+        df = get_detail_frame(PHYSICAL_DATA_FILE, index_bundle, physical_data)
 
         # 检查必需列是否存在
 
@@ -3941,20 +5959,6 @@ def all_data_view_page():
 
             return
 
-        # 修复：正确添加匹配状态列
-
-        df["匹配状态"] = df["固定资产编码"].astype(str).apply(
-
-            lambda x: "已匹配" if str(x).strip() in physical_to_financial_mapping else "未匹配")
-
-        # 添加对应财务编号列
-
-        df["对应财务编号"] = df["固定资产编码"].astype(str).apply(
-
-            lambda x: ", ".join(physical_to_financial_mapping.get(str(x).strip(), [])) if str(
-
-                x).strip() in physical_to_financial_mapping else "无")
-
         # 筛选功能
 
         col1, col2, col3 = st.columns(3)
@@ -3965,32 +5969,20 @@ def all_data_view_page():
 
         with col2:
 
-            # 部门筛选
+            # 部门筛选（选项取自资产立方体）
 
-            all_depts = sorted([dept for dept in df["存放部门"].unique() if dept and str(dept).strip()])
+            asset_cubes = get_stats_snapshot(index_bundle, financial_data, physical_data)["cubes"]
+            all_depts, dept_labels = department_filter_options(asset_cubes["physical"])
 
-            dept_filter = st.selectbox("按部门筛选", ["全部"] + all_depts, key="physical_dept_filter")
+            dept_filter = st.selectbox("按部门筛选", ["全部"] + all_depts, key="physical_dept_filter",
+                                       format_func=lambda dept: dept_labels.get(dept, dept))
 
         with col3:
 
             search_term = st.text_input("搜索资产", key="physical_search")
 
-        filtered_df = df.copy()
-
-        if match_filter != "全部":
-            filtered_df = filtered_df[filtered_df["匹配状态"] == match_filter]
-
-        if dept_filter != "全部":
-            filtered_df = filtered_df[filtered_df["存放部门"] == dept_filter]
-
-        if search_term:
-            filtered_df = filtered_df[
-
-                filtered_df["固定资产名称"].astype(str).str.contains(search_term, case=False, na=False) |
-
-                filtered_df["固定资产编码"].astype(str).str.contains(search_term, case=False, na=False)
-
-                ]
+        # 筛选流水线：各阶段结果按参数缓存，只重算变化的阶段
+        filtered_df = df.iloc[filter_detail_rows(PHYSICAL_DATA_FILE, df, dept_filter, match_filter, search_term)]
 
         st.info(f"共 {len(filtered_df)} 条记录（总实物资产 {len(df)} 条）")
 
@@ -4006,17 +5998,10 @@ def all_data_view_page():
 
         display_columns = [col for col in default_columns if col in available_columns]
 
-        # ✅ 格式化显示固定资产原值
-
-        display_df = filtered_df[display_columns].copy()
+        # ✅ 金额列保持数值类型，按金额格式显示
 
-        for amount_col in ["固定资产原值", "累计折旧", "资产净值"]:
-            if amount_col in display_df.columns:
-                display_df[amount_col] = display_df[amount_col].apply(
-                    lambda x: f"¥{x:,.2f}" if isinstance(x, (int, float)) else (
-                        f"¥0.00" if pd.isna(x) or x == "" else str(x)))
-
-        st.dataframe(display_df, use_container_width=True)
+        paginated_dataframe(filtered_df[display_columns], key="physical_detail_table",
+                            currency_columns=["固定资产原值", "累计折旧", "资产净值"])
 
         # ✅ 统计信息 - 仅使用固定资产原值字段
 
@@ -4036,61 +6021,18 @@ def all_data_view_page():
 
         # ✅ 关键修复：仅使用固定资产原值字段计算总价值，支持核算筛选
         try:
-            # 🆕 新增：检查是否有核算字段
-            has_accounting_field = "是否核算" in filtered_df.columns
-
-            # 原始计算（包含重复记录，支持核算筛选）
-            total_value_raw = 0.0
-            valid_count = 0
-            error_count = 0
-            non_accounting_count = 0  # 非核算资产数量
-
-            for _, row in filtered_df.iterrows():
-                try:
-                    # 🆕 检查是否核算
-                    if has_accounting_field:
-                        accounting_status = str(row.get("是否核算", "")).strip()
-                        if accounting_status not in ["是", "Y", "y", "Yes", "YES", "1", "True", "true"]:
-                            non_accounting_count += 1
-                            continue  # 跳过非核算资产
-
-                    value = safe_convert_to_float(row.get("固定资产原值", 0))
-                    if value > 0:
-                        total_value_raw += value
-                        valid_count += 1
-                    elif value == 0:
-                        pass  # 价值为0的记录
-                    else:
-                        error_count += 1
-                except:
-                    error_count += 1
-
-            # 去重计算（按固定资产编码去重）
-            df_deduped = filtered_df.drop_duplicates(subset=['固定资产编码'], keep='first')
-
-            # 🆕 新增：对去重后的数据也应用核算筛选
-            total_value_dedup = 0.0
-            valid_count_dedup = 0
-            non_accounting_dedup_count = 0
-
-            for _, row in df_deduped.iterrows():
-                try:
-                    # 🆕 检查是否核算
-                    if has_accounting_field:
-                        accounting_status = str(row.get("是否核算", "")).strip()
-                        if accounting_status not in ["是", "Y", "y", "Yes", "YES", "1", "True", "true"]:
-                            non_accounting_dedup_count += 1
-                            continue  # 跳过非核算资产
-
-                    value = safe_convert_to_float(row.get("固定资产原值", 0))
-                    if value > 0:
-                        total_value_dedup += value
-                        valid_count_dedup += 1
-                except:
-                    pass
+            # 核算筛选 + 去重估值（filtered_df 的索引即原始行号）
+            filtered_rows = filtered_df.index.to_numpy()
+            valuation = get_physical_valuation(physical_data, rows=filtered_rows)
+            has_accounting_field = valuation["has_accounting_field"]
+            total_value_raw, total_value_dedup = valuation["raw_total"], valuation["dedup_total"]
+            valid_count, valid_count_dedup = valuation["raw_valid"], valuation["dedup_valid"]
+            non_accounting_count = valuation["raw_non_accounting"]
+            non_accounting_dedup_count = valuation["dedup_non_accounting"]
+            error_count = valuation["error_count"]
 
             # 显示结果
-            duplicate_count = len(filtered_df) - len(df_deduped)
+            duplicate_count, deduped_count = valuation["duplicate_count"], valuation["deduped_count"]
 
             if duplicate_count > 0:
                 st.metric("固定资产原值总计", f"¥{total_value_dedup:,.2f}")
@@ -4135,7 +6077,7 @@ def all_data_view_page():
 
                 # ✅ 修复：将详细信息移到下方单独显示，避免挤压
                 if duplicate_count > 0:
-                    st.info(f"📊 原始记录: {len(filtered_df)}条 → 去重后: {len(df_deduped)}条")
+                    st.info(f"📊 原始记录: {len(filtered_df)}条 → 去重后: {deduped_count}条")
 
                 # 显示处理统计
                 if valid_count > 0:
@@ -4160,7 +6102,7 @@ def all_data_view_page():
 
                 with stat_col2:
                     st.metric("去重总价值", f"¥{total_value_dedup:,.2f}")
-                    st.caption(f"去重后 {len(df_deduped)} 条记录")
+                    st.caption(f"去重后 {deduped_count} 条记录")
 
                 with stat_col3:
                     if duplicate_count > 0:
@@ -4188,8 +6130,8 @@ def all_data_view_page():
                     st.markdown("### 📋 重复记录分析")
 
                     # 重复记录统计
-                    duplicate_analysis = filtered_df[
-                        filtered_df.duplicated(subset=['固定资产编码'], keep=False)].groupby('固定资产编码').agg({
+                    duplicate_analysis = filtered_df.loc[
+                        index_bundle.physical_keys.duplicate_positions(filtered_rows)].groupby('固定资产编码').agg({
                         '固定资产名称': 'first',
                         '固定资产原值': ['first', 'count'],
                         '存放部门': lambda x: ', '.join(x.unique()) if len(x.unique()) > 1 else x.iloc[0]
@@ -4199,26 +6141,16 @@ def all_data_view_page():
                     duplicate_analysis.columns = ['固定资产编码', '固定资产名称', '固定资产原值', '重复次数',
                                                   '存放部门']
 
-                    # 格式化显示
-                    duplicate_analysis['固定资产原值'] = duplicate_analysis['固定资产原值'].apply(
-                        lambda x: f"¥{x:,.2f}" if isinstance(x, (int, float)) else x)
+                    # 金额列保持数值类型，按金额格式显示
+                    duplicate_analysis['固定资产原值'] = pd.to_numeric(duplicate_analysis['固定资产原值'],
+                                                                 errors="coerce")
 
-                    st.dataframe(duplicate_analysis, use_container_width=True)
+                    st.dataframe(duplicate_analysis, use_container_width=True,
+                                 column_config=number_column_config(['固定资产原值']))
 
-                    if st.button("📥 导出重复记录", key="export_duplicates"):
-                        try:
-                            output = io.BytesIO()
-                            duplicate_analysis.to_excel(output, index=False, engine='openpyxl')
-                            output.seek(0)
-                            st.download_button(
-                                label="下载重复记录Excel",
-                                data=output,
-                                file_name=f"重复记录分析_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                key="download_duplicates"
-                            )
-                        except Exception as e:
-                            st.error(f"导出失败: {str(e)}")
+                    excel_export_button("📥 导出重复记录", "实物重复记录", (match_filter, dept_filter, search_term),
+                                        lambda: {'Sheet1': duplicate_analysis}, "重复记录分析",
+                                        key="export_duplicates", download_label="下载重复记录Excel")
 
                 # 推荐使用的总价值
                 if duplicate_count > 0:
@@ -4271,9 +6203,10 @@ def all_data_view_page():
     else:  # 未匹配资产
         st.subheader("⚠️ 未匹配资产列表")
 
-        tab1, tab2 = st.tabs(["未匹配财务资产", "未匹配实物资产"])
+        # 只计算和渲染选中的标签页
+        unmatched_tab = tab_selector(["未匹配财务资产", "未匹配实物资产"], key="unmatched_tab")
 
-        with tab1:
+        if unmatched_tab == "未匹配财务资产":
             if not financial_data:
                 st.warning("⚠️ 暂无财务系统数据")
             else:
@@ -4283,8 +6216,7 @@ def all_data_view_page():
                     return
 
                 # 修复：正确筛选未匹配的财务资产
-                unmatched_financial = [f for f in financial_data if
-                                       str(f.get("资产编号+序号", "")).strip() not in financial_to_physical_mapping]
+                unmatched_financial = get_unmatched_records("financial", index_bundle, financial_data)
 
                 if unmatched_financial:  # ✅ 添加：判断是否有未匹配数据
                     df = pd.DataFrame(unmatched_financial)  # ✅ 添加：创建DataFrame
@@ -4304,15 +6236,8 @@ def all_data_view_page():
                     default_columns = ["资产编号+序号", "资产名称", "资产分类", "资产价值", "累计折旧", "资产净额", "部门名称", "保管人"]
                     display_columns = [col for col in default_columns if col in available_columns]
 
-                    # 格式化显示
-                    display_df = df[display_columns].copy()
-                    # 格式化所有金额字段
-                    for amount_col in ["资产价值", "累计折旧", "资产净额"]:
-                        if amount_col in display_df.columns:
-                            display_df[amount_col] = display_df[amount_col].apply(
-                                lambda x: f"¥{x:,.2f}" if isinstance(x, (int, float)) else x)
-
-                    st.dataframe(display_df, use_container_width=True)
+                    paginated_dataframe(df[display_columns], key="unmatched_financial_table",
+                                        currency_columns=["资产价值", "累计折旧", "资产净额"])
 
                     # 统计信息
                     col1, col2, col3, col4 = st.columns(4)
@@ -4396,7 +6321,7 @@ def all_data_view_page():
                                 st.metric("未匹配资产净值总计", "计算错误")
                                 st.caption(f"错误: {str(e)}")
 
-        with tab2:
+        if unmatched_tab == "未匹配实物资产":
             if not physical_data:
                 st.warning("⚠️ 暂无实物台账数据")
             else:
@@ -4406,8 +6331,7 @@ def all_data_view_page():
                     return
 
                 # 修复：正确筛选未匹配的实物资产
-                unmatched_physical = [p for p in physical_data if
-                                      str(p.get("固定资产编码", "")).strip() not in physical_to_financial_mapping]
+                unmatched_physical = get_unmatched_records("physical", index_bundle, physical_data)
 
                 if unmatched_physical:  # ✅ 添加：判断是否有未匹配数据
                     df = pd.DataFrame(unmatched_physical)  # ✅ 添加：创建DataFrame
@@ -4427,16 +6351,8 @@ def all_data_view_page():
                     default_columns = ["固定资产编码", "固定资产名称", "固定资产类型", "固定资产原值", "累计折旧", "资产净值", "存放部门", "保管人", "使用状态"]
                     display_columns = [col for col in default_columns if col in available_columns]
 
-                    # 格式化显示
-                    display_df = df[display_columns].copy()
-                    # 格式化所有金额字段
-                    for amount_col in ["固定资产原值", "资产价值", "累计折旧", "资产净值"]:
-                        if amount_col in display_df.columns:
-                            display_df[amount_col] = display_df[amount_col].apply(
-                                lambda x: f"¥{x:,.2f}" if isinstance(x, (int, float)) else (
-                                    f"¥0.00" if pd.isna(x) or x == "" else str(x)))
-
-                    st.dataframe(display_df, use_container_width=True)
+                    paginated_dataframe(df[display_columns], key="unmatched_physical_table",
+                                        currency_columns=["固定资产原值", "资产价值", "累计折旧", "资产净值"])
 
                     # 统计信息
                     col1, col2, col3, col4 = st.columns(4)
@@ -4495,6 +6411,16 @@ def all_data_view_page():
                             # 📊 显示计算结果
                             st.metric("未匹配资产总价值", f"¥{total_value:,.2f}")
 
+                            # 核算筛选 + 去重口径（与实物台账明细一致）
+                            unmatched_valuation = get_physical_valuation(
+                                physical_data, rows=get_unmatched_rows("physical", index_bundle))
+                            valuation_caption = f"核算去重口径：¥{unmatched_valuation['dedup_total']:,.2f}"
+                            if unmatched_valuation["duplicate_count"] > 0:
+                                valuation_caption += f" | 去重{unmatched_valuation['duplicate_count']}条"
+                            if unmatched_valuation["dedup_non_accounting"] > 0:
+                                valuation_caption += f" | 已排除{unmatched_valuation['dedup_non_accounting']}条非核算"
+                            st.caption(valuation_caption)
+
                             # ✅ 成功处理的情况
                             if processed_count > 0:
                                 success_rate = (processed_count / len(unmatched_physical)) * 100
@@ -4635,20 +6561,9 @@ def all_data_view_page():
                         st.metric("实物资产匹配率", f"{match_rate:.1f}%")
 
                     # 导出未匹配实物资产
-                    if st.button("📥 导出未匹配实物资产", key="export_unmatched_physical"):
-                        try:
-                            output = io.BytesIO()
-                            df[display_columns].to_excel(output, index=False, engine='openpyxl')
-                            output.seek(0)
-                            st.download_button(
-                                label="下载Excel文件",
-                                data=output,
-                                file_name=f"未匹配实物资产_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                key="download_unmatched_physical"
-                            )
-                        except Exception as e:
-                            st.error(f"导出失败: {str(e)}")
+                    excel_export_button("📥 导出未匹配实物资产", "未匹配实物资产", (search_term,),
+                                        lambda: {'Sheet1': df[display_columns]}, "未匹配实物资产",
+                                        key="export_unmatched_physical")
                 else:  # ✅ 修复：正确的缩进，与if unmatched_physical对齐
                     st.success("✅ 所有实物资产都已匹配")
 
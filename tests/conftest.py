@@ -0,0 +1,19 @@
+"""测试共用的 fixture：在临时目录中加载 asset system.py（本地存储模式）"""
+import importlib.util
+from pathlib import Path
+
+import pytest
+import streamlit as st
+
+APP_PATH = Path(__file__).resolve().parent.parent / "asset system.py"
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    st.cache_resource.clear()
+    spec = importlib.util.spec_from_file_location("asset_system", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, "save_data_to_github", lambda data, filename, cleaned=False: False)
+    return module
@@ -0,0 +1,117 @@
+"""IndexBundle 持久化往返与增量保存（追加/更新/删除）的测试：结果须与全量重建一致"""
+import pickle
+import random
+
+import pytest
+
+NAME_TERMS = ["电脑", "空调", "投影", "桌", "dell"]
+FINANCIAL_CODES = [f"ZC{i:03d}+{j}" for i in range(6) for j in range(2)]
+PHYSICAL_CODES = [f"GD{i:03d}" for i in range(10)]
+
+
+def bundle_summary(bundle):
+    """索引包的可比较视图（与内部存储布局无关）"""
+    summary = {"counts": bundle.counts}
+    for side in ("financial", "physical"):
+        key_index = getattr(bundle, f"{side}_keys")
+        summary[f"{side}_keys"] = {key: key_index.positions(key).tolist() for key in key_index}
+        summary[f"{side}_rows"] = key_index.row_count
+        for name in (f"matched_{side}", f"unmatched_{side}", f"matched_{side}_rows"):
+            summary[name] = getattr(bundle, name)
+        names = getattr(bundle, f"{side}_names")
+        summary[f"{side}_names"] = {term: names.search(term).tolist() for term in NAME_TERMS}
+    summary["financial_to_physical"] = {
+        code: sorted(bundle.mapping.physical_of(code)) for code in FINANCIAL_CODES}
+    summary["physical_to_financial"] = {
+        code: sorted(bundle.mapping.financial_of(code)) for code in PHYSICAL_CODES}
+    summary["asset_numbers"] = {number: sorted(codes) for number, codes in bundle.asset_numbers.groups.items()}
+    return summary
+
+
+def random_datasets(rng):
+    names = ["笔记本电脑", "空调", "投影仪", "电脑桌", "Dell 显示器", ""]
+    financial_data = [{"资产编号+序号": rng.choice(FINANCIAL_CODES + [""]), "资产名称": rng.choice(names)}
+                      for _ in range(rng.randint(0, 12))]
+    physical_data = [{"固定资产编码": rng.choice(PHYSICAL_CODES + [""]), "固定资产名称": rng.choice(names)}
+                     for _ in range(rng.randint(0, 12))]
+    mapping_data = [{"资产编号+序号": rng.choice(FINANCIAL_CODES), "固定资产编码": rng.choice(PHYSICAL_CODES)}
+                    for _ in range(rng.randint(0, 12))]
+    return financial_data, physical_data, mapping_data
+
+
+def current_datasets(app):
+    return [app.load_data(filename) for filename in app.DATASET_FILES]
+
+
+def assert_live_bundle_matches_full_build(app):
+    live_bundle = app.get_live_index_bundle()["bundle"]
+    datasets = current_datasets(app)
+    assert live_bundle.version == app.get_dataset_version()
+    assert bundle_summary(live_bundle) == bundle_summary(app.IndexBundle.build(*datasets))
+    app.wait_for_stats_snapshot(live_bundle.version)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_state_round_trip(app, seed):
+    bundle = app.IndexBundle.build(*random_datasets(random.Random(seed)), version="v1")
+    restored = app.IndexBundle.from_state(pickle.loads(pickle.dumps(bundle.to_state())))
+    assert restored.version == "v1"
+    assert restored.is_config_current()
+    assert bundle_summary(restored) == bundle_summary(bundle)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_save_matches_full_build(app, monkeypatch, seed):
+    rng = random.Random(seed)
+    financial_data, physical_data, mapping_data = random_datasets(rng)
+    # 主键唯一时更新导入才能走增量路径
+    financial_data = list({record["资产编号+序号"]: record for record in financial_data}.values())
+    for data, filename in zip((financial_data, physical_data, mapping_data), app.DATASET_FILES):
+        app.save_data(data, filename)
+    monkeypatch.setattr(app, "refresh_index_bundle", lambda *args: pytest.fail("回退为全量重建"))
+
+    extra_financial, extra_physical, extra_mapping = random_datasets(rng)
+    app.append_records(app.load_data(app.FINANCIAL_DATA_FILE),
+                       [{"资产编号+序号": "ZC900+1", "资产名称": "投影仪"}], app.FINANCIAL_DATA_FILE)
+    assert_live_bundle_matches_full_build(app)
+
+    app.append_records(app.load_data(app.PHYSICAL_DATA_FILE), extra_physical, app.PHYSICAL_DATA_FILE)
+    assert_live_bundle_matches_full_build(app)
+
+    app.append_records(app.load_data(app.MAPPING_DATA_FILE), extra_mapping, app.MAPPING_DATA_FILE)
+    assert_live_bundle_matches_full_build(app)
+
+    updates = [{"资产编号+序号": record["资产编号+序号"], "资产名称": "电脑桌"}
+               for record in extra_financial if record["资产编号+序号"]]
+    app.upsert_records(app.load_data(app.FINANCIAL_DATA_FILE), updates, app.FINANCIAL_DATA_FILE, "资产编号+序号")
+    assert_live_bundle_matches_full_build(app)
+
+    deleted_codes = set(rng.sample(PHYSICAL_CODES, 3))
+    app.delete_records(app.load_data(app.PHYSICAL_DATA_FILE), app.PHYSICAL_DATA_FILE,
+                       lambda record: record.get("固定资产编码") in deleted_codes)
+    assert_live_bundle_matches_full_build(app)
+
+    deleted_codes = set(rng.sample(FINANCIAL_CODES, 4))
+    app.delete_records(app.load_data(app.MAPPING_DATA_FILE), app.MAPPING_DATA_FILE,
+                       lambda record: record.get("资产编号+序号") in deleted_codes)
+    assert_live_bundle_matches_full_build(app)
+
+    app.delete_records(app.load_data(app.FINANCIAL_DATA_FILE), app.FINANCIAL_DATA_FILE,
+                       lambda record: record.get("资产编号+序号") in deleted_codes)
+    assert_live_bundle_matches_full_build(app)
+
+
+def test_incremental_save_leaves_published_bundle_unchanged(app):
+    app.save_data([{"资产编号+序号": "ZC000+1", "资产名称": "电脑"}], app.FINANCIAL_DATA_FILE)
+    app.save_data([{"固定资产编码": "GD000", "固定资产名称": "电脑"}], app.PHYSICAL_DATA_FILE)
+    app.save_data([], app.MAPPING_DATA_FILE)
+    published = app.get_live_index_bundle()["bundle"]
+    before = bundle_summary(published)
+
+    app.append_records([], [{"资产编号+序号": "ZC000+1", "固定资产编码": "GD000"}], app.MAPPING_DATA_FILE)
+    app.append_records(app.load_data(app.FINANCIAL_DATA_FILE), [{"资产编号+序号": "ZC001+1", "资产名称": "空调"}],
+                       app.FINANCIAL_DATA_FILE)
+
+    assert bundle_summary(published) == before
+    assert app.get_live_index_bundle()["bundle"] is not published
+    assert_live_bundle_matches_full_build(app)
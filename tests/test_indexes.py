@@ -0,0 +1,182 @@
+"""MappingIndex / KeyIndex / NameSearchIndex 与朴素实现的对照测试"""
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+CODES = ["", " ", "A1", "A2", " A3 ", "A3", "B1", None]
+
+
+def random_mapping(rng, size):
+    return [{"资产编号+序号": rng.choice(CODES), "固定资产编码": rng.choice(CODES + ["P1", "P2"])}
+            for _ in range(size)]
+
+
+def naive_mapping(mapping_data):
+    """原列表实现：去除首尾空白、跳过空值，按首次出现顺序去重"""
+    financial_to_physical, physical_to_financial = {}, {}
+    for record in mapping_data:
+        financial_code = str(record.get("资产编号+序号") or "").strip()
+        physical_code = str(record.get("固定资产编码") or "").strip()
+        if not financial_code or not physical_code:
+            continue
+        physical_codes = financial_to_physical.setdefault(financial_code, [])
+        if physical_code not in physical_codes:
+            physical_codes.append(physical_code)
+        financial_codes = physical_to_financial.setdefault(physical_code, [])
+        if financial_code not in financial_codes:
+            financial_codes.append(financial_code)
+    return financial_to_physical, physical_to_financial
+
+
+def mapping_pairs(mapping_data):
+    """映射记录 -> 有效的 (财务编号, 实物编码) 对"""
+    pairs = []
+    for record in mapping_data:
+        pair = tuple(str(record.get(field) or "").strip() for field in ("资产编号+序号", "固定资产编码"))
+        if all(pair):
+            pairs.append(pair)
+    return pairs
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_mapping_index_matches_naive_mapping(app, seed):
+    rng = random.Random(seed)
+    mapping_data = random_mapping(rng, rng.randint(0, 30))
+    index = app.MappingIndex.from_records(mapping_data)
+    financial_to_physical, physical_to_financial = naive_mapping(mapping_data)
+
+    assert dict(index.financial_to_physical) == financial_to_physical
+    assert dict(index.physical_to_financial) == physical_to_financial
+    assert index.edge_count == sum(len(codes) for codes in financial_to_physical.values())
+
+    queries = [rng.choice(CODES + ["P1", "X9"]) or "" for _ in range(10)]
+    joined = index.join_physical(queries)
+    expected = [(position, str(code).strip(), physical_code) for position, code in enumerate(queries)
+                for physical_code in financial_to_physical.get(str(code).strip(), [])]
+    assert list(joined.itertuples(index=False, name=None)) == expected
+
+    joined = index.join_financial(queries)
+    expected = [(position, str(code).strip(), financial_code) for position, code in enumerate(queries)
+                for financial_code in physical_to_financial.get(str(code).strip(), [])]
+    assert list(joined.itertuples(index=False, name=None)) == expected
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_mapping_index_incremental_matches_rebuild(app, seed):
+    rng = random.Random(seed)
+    mapping_data = random_mapping(rng, rng.randint(0, 20))
+    index = app.MappingIndex.from_records(mapping_data)
+
+    added = random_mapping(rng, rng.randint(0, 10))
+    removed = rng.sample(range(len(mapping_data)), rng.randint(0, len(mapping_data)))
+    index.add_pairs(mapping_pairs(added))
+    index.drop_pairs(mapping_pairs([mapping_data[i] for i in removed]))
+    index.compact()
+
+    remaining = [r for i, r in enumerate(mapping_data) if i not in set(removed)] + added
+    financial_to_physical, physical_to_financial = naive_mapping(remaining)
+    assert {code: sorted(codes) for code, codes in index.financial_to_physical.items()} == \
+        {code: sorted(codes) for code, codes in financial_to_physical.items()}
+    assert {code: sorted(codes) for code, codes in index.physical_to_financial.items()} == \
+        {code: sorted(codes) for code, codes in physical_to_financial.items()}
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_key_index_matches_pandas(app, seed):
+    rng = random.Random(seed)
+    keys = [rng.choice(["", "A", "B", " C ", "D", None]) for _ in range(rng.randint(0, 25))]
+    records = [{"固定资产编码": key} for key in keys]
+    index = app.KeyIndex.from_records(records, "固定资产编码")
+    codes = pd.Series([str(key).strip() if key is not None else "" for key in keys], dtype=object)
+    non_blank = codes[codes != ""]
+
+    for key in ["A", "B", "C", "D", "E", ""]:
+        assert index.positions(key).tolist() == non_blank.index[non_blank == key].tolist()
+    assert sorted(index) == sorted(set(non_blank))
+    assert index.duplicate_counts == {key: count for key, count in non_blank.value_counts().items() if count > 1}
+
+    mask = np.array([rng.random() < 0.6 for _ in keys], dtype=bool)
+    rows = np.flatnonzero(mask)
+    subset = codes[mask]
+    assert index.first_positions(rows).tolist() == subset.drop_duplicates().index.tolist()
+    assert index.duplicate_positions(rows).tolist() == subset[subset.duplicated(keep=False)].index.tolist()
+
+
+def test_key_index_append_delete_matches_rebuild(app):
+    rng = random.Random(7)
+    for _ in range(50):
+        keys = [rng.choice(["", "A", "B", "C"]) for _ in range(rng.randint(0, 15))]
+        index = app.KeyIndex.from_keys(keys)
+        added = [rng.choice(["", "A", "Z"]) for _ in range(rng.randint(0, 5))]
+        index.append(added)
+        keys += added
+        deleted = sorted(rng.sample(range(len(keys)), min(len(keys), 3)))
+        index.delete(deleted)
+        keys = [key for position, key in enumerate(keys) if position not in deleted]
+
+        restored = app.KeyIndex.from_state(index.to_state())
+        expected = app.KeyIndex.from_keys(keys)
+        for key in set(keys) | {"Z"}:
+            assert restored.positions(key).tolist() == expected.positions(key).tolist()
+        assert restored.row_count == len(keys)
+
+
+NAMES = ["笔记本电脑", "电脑", "台式电脑主机", "空调", "电脑桌", "Dell 电脑", "", "空调"]
+
+
+def naive_search(names, term):
+    """名称包含查询词的行号：完全匹配 > 前缀匹配 > 包含，其次名称越短越靠前，最后按行号"""
+    term = term.lower()
+    hits = [(0 if name == term else 1 if name.startswith(term) else 2, len(name), position)
+            for position, name in enumerate(n.lower() for n in names) if term in name]
+    return [position for *_, position in sorted(hits)]
+
+
+@pytest.mark.parametrize("term", ["电脑", "电", "脑桌", "空调", "dell", "DELL 电", "笔记本电脑", "投影仪", "台式电脑主"])
+def test_name_search_without_pinyin(app, monkeypatch, term):
+    monkeypatch.setattr(app, "PINYIN_AVAILABLE", False)
+    index = app.NameSearchIndex.from_records([{"资产名称": name} for name in NAMES], "资产名称")
+    assert index.search(term).tolist() == naive_search(NAMES, term)
+
+    # 增量追加后与重建结果一致
+    index.append(["电脑包", "空调"])
+    assert index.search(term).tolist() == naive_search(NAMES + ["电脑包", "空调"], term)
+    assert app.NameSearchIndex.from_state(index.to_state()).search(term).tolist() == \
+        naive_search(NAMES + ["电脑包", "空调"], term)
+
+
+FAKE_PINYIN = {"电": "dian", "脑": "nao", "空": "kong", "调": "tiao", "桌": "zhuo"}
+
+
+def fake_lazy_pinyin(text, style=None):
+    syllables = [FAKE_PINYIN.get(char, char) for char in text]
+    return [syllable[0] for syllable in syllables] if style == "first_letter" else syllables
+
+
+def test_name_search_with_pinyin(app, monkeypatch):
+    monkeypatch.setattr(app, "PINYIN_AVAILABLE", True)
+    monkeypatch.setattr(app, "lazy_pinyin", fake_lazy_pinyin, raising=False)
+    monkeypatch.setattr(app, "Style", SimpleNamespace(FIRST_LETTER="first_letter"), raising=False)
+    names = ["电脑", "空调", "电脑桌"]
+    index = app.NameSearchIndex.from_records([{"资产名称": name} for name in names], "资产名称")
+
+    assert index.is_current()
+    assert index.search("diannao").tolist() == [0, 2]
+    assert index.search("DN").tolist() == [0, 2]
+    assert index.search("kt").tolist() == [1]
+    assert index.search("naoz").tolist() == [2]
+    assert index.search("电脑").tolist() == [0, 2]
+
+    # 拼音支持状态变化后索引需要重建
+    monkeypatch.setattr(app, "PINYIN_AVAILABLE", False)
+    assert not index.is_current()
+
+
+def test_name_search_with_real_pypinyin(app):
+    pytest.importorskip("pypinyin")
+    index = app.NameSearchIndex.from_records([{"资产名称": "电脑"}, {"资产名称": "空调"}], "资产名称")
+    assert index.search("diannao").tolist() == [0]
+    assert index.search("kt").tolist() == [1]
@@ -0,0 +1,112 @@
+"""统计快照与原数据统计页逐条计算口径的对照测试"""
+import random
+
+import pandas as pd
+import pytest
+
+ACCOUNTING_VALUES = ["是", "否", "Y", " 是 ", "", "N"]
+
+
+def random_datasets(rng):
+    financial_codes = [f"ZC{i:03d}+1" for i in range(15)]
+    physical_codes = [f"GD{i:03d}" for i in range(15)]
+    financial_data = [{"资产编号+序号": code, "资产价值": round(rng.uniform(100, 5000), 2),
+                       "累计折旧": round(rng.uniform(0, 100), 2),
+                       "净额": rng.choice([0, round(rng.uniform(0, 4000), 2)])}
+                      for code in rng.sample(financial_codes, 10)]
+    # 实物台账含重复编码、非核算资产；原值只取正数（快照只累计大于0的原值）
+    physical_data = [{"固定资产编码": rng.choice(physical_codes), "固定资产原值": round(rng.uniform(100, 5000), 2),
+                      "累计折旧": round(rng.uniform(0, 100), 2), "是否核算": rng.choice(ACCOUNTING_VALUES)}
+                     for _ in range(12)]
+    # 映射关系含对端不存在的记录
+    mapping_data = [{"资产编号+序号": rng.choice(financial_codes), "固定资产编码": rng.choice(physical_codes)}
+                    for _ in range(10)]
+    return financial_data, physical_data, mapping_data
+
+
+def reference_totals(app, data_list, is_financial):
+    """原差异分析页的 calculate_totals"""
+    original_key = "资产价值" if is_financial else "固定资产原值"
+    total_original = sum(app.safe_get_value(item, original_key, 0) for item in data_list)
+    total_depreciation = sum(app.safe_get_value(item, "累计折旧", 0) for item in data_list)
+    total_net = sum(app.safe_get_value(item, "净额", 0) for item in data_list) if is_financial else 0
+    if total_net == 0:
+        total_net = max(0, total_original - total_depreciation)
+    return {"original": total_original, "depreciation": total_depreciation, "net": total_net,
+            "count": len(data_list)}
+
+
+def reference_statistics(app, financial_data, physical_data, mapping_data):
+    """原数据统计页的逐条计算：差异分析汇总 + 实物资产核算筛选、去重后的价值"""
+    financial_index = {str(f.get("资产编号+序号", "")).strip() for f in financial_data}
+    physical_index = {str(p.get("固定资产编码", "")).strip() for p in physical_data}
+    matched_financial_codes, matched_physical_codes = set(), set()
+    for record in mapping_data:
+        financial_code = str(record.get("资产编号+序号", "")).strip()
+        physical_code = str(record.get("固定资产编码", "")).strip()
+        if financial_code in financial_index and physical_code in physical_index:
+            matched_financial_codes.add(financial_code)
+            matched_physical_codes.add(physical_code)
+
+    def split(data, key_field, matched_codes):
+        matched = [record for record in data if str(record.get(key_field, "")).strip() in matched_codes]
+        unmatched = [record for record in data if str(record.get(key_field, "")).strip() not in matched_codes]
+        return matched, unmatched
+
+    result = {}
+    for side, data, key_field, matched_codes in (
+            ("financial", financial_data, "资产编号+序号", matched_financial_codes),
+            ("physical", physical_data, "固定资产编码", matched_physical_codes)):
+        matched, unmatched = split(data, key_field, matched_codes)
+        is_financial = side == "financial"
+        result[side] = {"all": reference_totals(app, data, is_financial),
+                        "matched": reference_totals(app, matched, is_financial),
+                        "unmatched": reference_totals(app, unmatched, is_financial)}
+
+    physical_df = pd.DataFrame(physical_data)
+    accounting = physical_df[physical_df["是否核算"].astype(str).str.strip().isin(app.ACCOUNTING_FLAGS)]
+    deduped = accounting.drop_duplicates(subset=["固定资产编码"], keep="first")
+    result["physical_valuation"] = {
+        "total_value": sum(app.safe_get_value(row.to_dict(), "固定资产原值") for _, row in deduped.iterrows()),
+        "original_count": len(physical_df),
+        "deduped_count": len(deduped),
+        "duplicate_count": len(accounting) - len(deduped),
+        "non_accounting_count": len(physical_df) - len(accounting),
+    }
+    return result
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_snapshot_matches_reference_statistics(app, seed):
+    financial_data, physical_data, mapping_data = random_datasets(random.Random(seed))
+    bundle = app.IndexBundle.build(financial_data, physical_data, mapping_data)
+    snapshot = app.build_stats_snapshot(bundle, financial_data, physical_data)
+    expected = reference_statistics(app, financial_data, physical_data, mapping_data)
+
+    for side in ("financial", "physical"):
+        for group in ("all", "matched", "unmatched"):
+            totals = {key: snapshot[side][group][key] for key in ("original", "depreciation", "net", "count")}
+            assert totals == pytest.approx(expected[side][group]), (side, group)
+    assert snapshot["physical_valuation"] == pytest.approx(expected["physical_valuation"])
+
+    # 资产立方体合计与汇总一致
+    for side in ("financial", "physical"):
+        total = app.rollup_cube(snapshot["cubes"][side], by=())
+        assert total["资产数量"].iloc[0] == expected[side]["all"]["count"]
+        assert total["总价值"].iloc[0] == pytest.approx(expected[side]["all"]["original"])
+        assert total["已匹配"].iloc[0] == expected[side]["matched"]["count"]
+
+
+def test_snapshot_written_at_save_time(app):
+    financial_data, physical_data, mapping_data = random_datasets(random.Random(0))
+    for data, filename in zip((financial_data, physical_data, mapping_data), app.DATASET_FILES):
+        app.save_data(data, filename)
+
+    version = app.get_dataset_version()
+    app.wait_for_stats_snapshot(version)
+    snapshot = app.load_stats_snapshot()
+    expected = reference_statistics(app, financial_data, physical_data, mapping_data)
+    assert snapshot["version"] == version
+    assert snapshot["financial"]["all"] == pytest.approx(expected["financial"]["all"])
+    assert snapshot["physical"]["all"] == pytest.approx(expected["physical"]["all"])
+    assert snapshot["physical_valuation"] == pytest.approx(expected["physical_valuation"])
@@ -0,0 +1,23 @@
+"""upsert_records 增量更新索引包的回归测试"""
+import pytest
+
+
+def test_upsert_updates_names_of_replaced_rows(app, monkeypatch):
+    app.save_data([{"资产编号+序号": "A1+1", "资产名称": "电脑"},
+                   {"资产编号+序号": "A2+1", "资产名称": "空调"}], app.FINANCIAL_DATA_FILE)
+    app.save_data([], app.PHYSICAL_DATA_FILE)
+    app.save_data([], app.MAPPING_DATA_FILE)
+    # 之后的更新导入必须走增量路径
+    monkeypatch.setattr(app, "refresh_index_bundle", lambda *args: pytest.fail("回退为全量重建"))
+
+    app.upsert_records(app.load_data(app.FINANCIAL_DATA_FILE),
+                       [{"资产编号+序号": "A2+1", "资产名称": "投影仪"},
+                        {"资产编号+序号": "A3+1", "资产名称": "空调"}],
+                       app.FINANCIAL_DATA_FILE, "资产编号+序号")
+
+    financial_data = app.load_data(app.FINANCIAL_DATA_FILE)
+    bundle = app.get_index_bundle(financial_data, app.load_data(app.PHYSICAL_DATA_FILE),
+                                  app.load_data(app.MAPPING_DATA_FILE))
+    assert [record["资产名称"] for record in financial_data] == ["电脑", "投影仪", "空调"]
+    assert bundle.financial_names.search("投影仪").tolist() == [1]
+    assert bundle.financial_names.search("空调").tolist() == [2]